@@ -1,4 +1,10 @@
+import logging
+import os
+
 from celery import Celery
+from celery.signals import worker_init
+
+logger = logging.getLogger(__name__)
 
 # 1. 定义中间人 (Broker) 和 结果存储 (Backend) 的地址
 # 都是指向我们要运行的 Redis
@@ -19,3 +25,17 @@ celery_app.conf.update(
 # Celery 会自动去这些文件夹里找有没有标了 @task 的函数
 # 我们明天会在 worker 文件夹里写具体的 Blender 任务
 celery_app.conf.imports = ["app.worker.tasks"]
+
+
+# 5. 分割模型预加载 (IMAGE_DXF_SEG_PRELOAD=fork)
+# worker_init 在 prefork 池 fork 子进程之前于主进程触发, 子进程共享同一份权重
+@worker_init.connect
+def _preload_segmentation_model(**_kwargs):
+    if os.getenv("IMAGE_DXF_SEG_PRELOAD", "").strip().lower() != "fork":
+        return
+    from worker.segmentation import preload_for_fork
+
+    try:
+        preload_for_fork()
+    except Exception as e:
+        logger.warning("segmentation model preload failed; workers load their own: %s", e)
@@ -131,7 +131,7 @@ def _select_targets(msp: Modelspace, target_description: str) -> list[DXFEntity]
     if not desc:
         return []
     if "墙" in desc or "wall" in desc.lower():
-        walls = [e for e in msp if str(getattr(e.dxf, "layer", "")).upper() == "WALL"]
+        walls = [e for e in msp if str(getattr(e.dxf, "layer", "")).upper() in ("WALL", "WALL_AXIS")]
         if not walls:
             return []
         lowered = desc.lower()
@@ -2,12 +2,12 @@ from datetime import datetime
 from pathlib import Path
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 
 from app.core.deps import get_current_user
 from app.models.user import User
 from app.modules.engineering.schemas import ModifyCADRequest, ModifyCADResponse, UploadCadResponse, UploadImageConvertedResponse
-from app.modules.engineering.services import get_svg_preview, modify_cad_structure
+from app.modules.engineering.services import dxf_to_svg_preview, get_svg_preview, modify_cad_structure
 
 
 router = APIRouter()
@@ -17,6 +17,12 @@ def _backend_dir() -> Path:
     return Path(__file__).resolve().parents[3]
 
 
+def _conversion_cache():
+    from worker.conversion_cache import get_conversion_cache
+
+    return get_conversion_cache(_backend_dir() / "var" / "image_dxf_cache")
+
+
 @router.get("/ping")
 def ping():
     return {"status": "ok"}
@@ -44,7 +50,11 @@ def upload(file: UploadFile = File(...), current_user: User = Depends(get_curren
 
 
 @router.post("/upload/image", response_model=UploadImageConvertedResponse)
-def upload_image(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+def upload_image(
+    file: UploadFile = File(...),
+    debug: bool | None = Query(None, description="强制开启/关闭调试图；不传则按 IMAGE_DXF_DEBUG_ARTIFACTS / 采样率决定"),
+    current_user: User = Depends(get_current_user),
+):
     content_type = (file.content_type or "").lower()
     if not content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="仅支持 image/* 上传")
@@ -66,29 +76,53 @@ def upload_image(file: UploadFile = File(...), current_user: User = Depends(get_
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"文件保存失败: {e}")
 
-    try:
-        from worker.image_to_dxf import ImageClarityError, convert_image_to_dxf
-
-        convert_image_to_dxf(str(img_path), str(dxf_path))
-    except ImageClarityError:
-        raise HTTPException(status_code=422, detail="图片清晰度不足")
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"矢量化失败: {e}")
-
-    svg_preview = get_svg_preview(str(dxf_path))
+    from worker.image_context import ImageContext
+
+    # The upload stays in memory: it is decoded and hashed once for the cache key and the conversion.
+    image = ImageContext.from_bytes(content, path=img_path)
+
+    # Debug runs always convert so their artifacts exist; everything else goes through the cache.
+    cache = _conversion_cache() if not debug else None
+    entry = None
+    if cache is not None:
+        from worker.conversion_cache import conversion_key, model_cacheable
+
+        cache_key = conversion_key(content, image_digest=image.digest())
+        entry = cache.lookup(cache_key)
+
+    result = None
+    if entry is not None:
+        cache.materialize(entry, dxf_path)
+        svg_preview = entry.svg_preview
+    else:
+        try:
+            from worker.image_to_dxf import ImageClarityError, convert_image_to_dxf
+
+            options = {} if debug is None else {"debug": debug}
+            result = convert_image_to_dxf(str(img_path), str(dxf_path), image=image, **options)
+        except ImageClarityError:
+            raise HTTPException(status_code=422, detail="图片清晰度不足")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"矢量化失败: {e}")
+
+        doc = getattr(result, "doc", None)
+        svg_preview = dxf_to_svg_preview(doc) if doc is not None else get_svg_preview(str(dxf_path))
+        # Only results that would come out the same next time: not an OpenCV stand-in for a failed segmentation.
+        if cache is not None and getattr(result, "cacheable", True) and model_cacheable():
+            cache.store(cache_key, dxf_path=dxf_path, svg_preview=svg_preview, meta={"session_id": session_id})
     static_root = (backend_dir / "static").resolve()
     try:
         rel = dxf_path.resolve().relative_to(static_root).as_posix()
     except Exception:
         raise HTTPException(status_code=400, detail="生成的 DXF 不在静态目录下，无法下载")
     dxf_url = f"/static/{rel}"
-    debug_root = (backend_dir / "static" / "debug" / session_id).resolve()
     debug_images: list[str] = []
-    for name in ("debug_step1_gray.png", "debug_step2_ai_mask.png", "debug_step3_opencv_edges.png"):
-        if (debug_root / name).exists():
-            debug_images.append(f"/static/debug/{session_id}/{name}")
+    scheduled = getattr(result, "debug_artifacts", None)
+    if scheduled is not None:
+        # Written in the background; the URLs may 404 for a moment after the response.
+        debug_images = [f"/static/debug/{session_id}/{Path(p).name}" for p in scheduled]
     return UploadImageConvertedResponse(
         status="converted",
         dxf_file_path=str(dxf_path),
@@ -96,9 +130,39 @@ def upload_image(file: UploadFile = File(...), current_user: User = Depends(get_
         svg_preview=svg_preview,
         session_id=session_id,
         debug_images=debug_images,
+        cached=entry is not None,
     )
 
 
+@router.get("/upload/image/cache")
+def image_conversion_cache_stats(current_user: User = Depends(get_current_user)):
+    from worker.class_map_cache import get_class_map_cache
+
+    maps = get_class_map_cache()
+    class_maps = maps.stats() if maps is not None else None
+    cache = _conversion_cache()
+    if cache is None:
+        return {"enabled": False, "class_maps": class_maps}
+    return {"enabled": True, **cache.stats(), "class_maps": class_maps}
+
+
+@router.get("/upload/image/model")
+def image_segmentation_model_status(current_user: User = Depends(get_current_user)):
+    from worker.seg_batching import current_batcher
+    from worker.segmentation import get_model_registry
+    from worker.speculative import current_speculation_stats
+
+    models = get_model_registry().status()
+    batcher = current_batcher()
+    speculation = current_speculation_stats()
+    return {
+        "ready": any(m["state"] == "ready" for m in models),
+        "models": models,
+        "batching": batcher.stats() if batcher is not None else None,
+        "speculation": speculation.stats() if speculation is not None else None,
+    }
+
+
 @router.post("/modify", response_model=ModifyCADResponse)
 def modify(req: ModifyCADRequest, current_user: User = Depends(get_current_user)):
     svg_preview, _ = modify_cad_structure(dxf_file_path=req.dxf_file_path, user_prompt=req.user_prompt)
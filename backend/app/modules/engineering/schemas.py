@@ -61,3 +61,4 @@ class UploadImageConvertedResponse(BaseModel):
     svg_preview: str = Field(description="转换后的 SVG 预览字符串")
     session_id: str = Field(description="本次转换会话 ID")
     debug_images: list[str] = Field(default_factory=list, description="算法调试图片 URL 列表")
+    cached: bool = Field(default=False, description="是否命中转换缓存（命中时不重新运行矢量化）")
@@ -132,35 +132,45 @@ def _entity_color_index(doc, e) -> int | None:
         return None
 
 
-def _iter_segments(doc, msp) -> Iterable[tuple[tuple[float, float], tuple[float, float], str, int | None]]:
+def _iter_segments(
+    doc, msp
+) -> Iterable[tuple[tuple[float, float], tuple[float, float], str, int | None, float]]:
+    """Every straight segment as (p1, p2, layer, color, width); width is 0.0 unless the DXF gives one.
+
+    LWPOLYLINE segments carry their start width (WALL_AXIS centrelines store the wall thickness there).
+    """
     for e in msp.query("LINE"):
         s = e.dxf.start
         t = e.dxf.end
         layer = (getattr(e.dxf, "layer", "") or "").upper()
         color = _entity_color_index(doc, e)
-        yield (float(s.x), float(s.y)), (float(t.x), float(t.y)), layer, color
+        yield (float(s.x), float(s.y)), (float(t.x), float(t.y)), layer, color, 0.0
 
     for e in msp.query("LWPOLYLINE"):
         layer = (getattr(e.dxf, "layer", "") or "").upper()
         color = _entity_color_index(doc, e)
         try:
-            pts = list(e.get_points("xy"))
+            pts = [(float(x), float(y), float(sw or 0.0)) for x, y, sw in e.get_points("xys")]
         except Exception:
             continue
         if len(pts) < 2:
             continue
+        try:
+            const_width = float(getattr(e.dxf, "const_width", 0.0) or 0.0)
+        except Exception:
+            const_width = 0.0
         for i in range(len(pts) - 1):
-            x1, y1 = pts[i]
-            x2, y2 = pts[i + 1]
-            yield (float(x1), float(y1)), (float(x2), float(y2)), layer, color
+            x1, y1, sw = pts[i]
+            x2, y2, _ = pts[i + 1]
+            yield (x1, y1), (x2, y2), layer, color, sw or const_width
         try:
             closed = bool(getattr(e, "closed", False))
         except Exception:
             closed = False
         if closed:
-            x1, y1 = pts[-1]
-            x2, y2 = pts[0]
-            yield (float(x1), float(y1)), (float(x2), float(y2)), layer, color
+            x1, y1, sw = pts[-1]
+            x2, y2, _ = pts[0]
+            yield (x1, y1), (x2, y2), layer, color, sw or const_width
 
     for e in msp.query("POLYLINE"):
         layer = (getattr(e.dxf, "layer", "") or "").upper()
@@ -173,25 +183,25 @@ def _iter_segments(doc, msp) -> Iterable[tuple[tuple[float, float], tuple[float,
             continue
         pts = [(float(v.dxf.location.x), float(v.dxf.location.y)) for v in verts]
         for i in range(len(pts) - 1):
-            yield pts[i], pts[i + 1], layer, color
+            yield pts[i], pts[i + 1], layer, color, 0.0
         try:
             closed = bool(getattr(e, "is_closed", False) or getattr(e.dxf, "flags", 0) & 1)
         except Exception:
             closed = False
         if closed:
-            yield pts[-1], pts[0], layer, color
+            yield pts[-1], pts[0], layer, color, 0.0
 
 
-def _iter_wall_axes(doc, msp) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+def _iter_wall_axes(doc, msp) -> list[tuple[tuple[float, float], tuple[float, float], float]]:
     allow_layers = _parse_set_env("DXF_WALL_LAYERS")
     ignore_layers = _parse_set_env("DXF_IGNORE_LAYERS")
     allow_colors = _parse_int_set_env("DXF_WALL_COLORS")
     min_len = float(os.getenv("DXF_MIN_SEGMENT_LEN", "0.0"))
-    axes: list[tuple[tuple[float, float], tuple[float, float]]] = []
+    axes: list[tuple[tuple[float, float], tuple[float, float], float]] = []
     layer_counts: dict[str, int] = {}
     color_counts: dict[int, int] = {}
     total = 0
-    for (p1, p2, layer, color) in _iter_segments(doc, msp):
+    for (p1, p2, layer, color, width) in _iter_segments(doc, msp):
         total += 1
         if layer:
             layer_counts[layer] = layer_counts.get(layer, 0) + 1
@@ -207,7 +217,7 @@ def _iter_wall_axes(doc, msp) -> list[tuple[tuple[float, float], tuple[float, fl
         x2, y2 = p2
         if min_len > 0.0 and math.hypot(x2 - x1, y2 - y1) < min_len:
             continue
-        axes.append((p1, p2))
+        axes.append((p1, p2, width))
     if os.getenv("DXF_DEBUG_STATS", "").strip().lower() in ("1", "true", "yes"):
         top_layers = sorted(layer_counts.items(), key=lambda kv: kv[1], reverse=True)[:10]
         top_colors = sorted(color_counts.items(), key=lambda kv: kv[1], reverse=True)[:10]
@@ -426,13 +436,16 @@ def main():
     doc = ezdxf.readfile(str(input_path))
     msp = doc.modelspace()
     raw_axes = _iter_wall_axes(doc, msp)
-    lines = [((x1 * scale, y1 * scale), (x2 * scale, y2 * scale)) for (x1, y1), (x2, y2) in raw_axes]
+    lines = [((x1 * scale, y1 * scale), (x2 * scale, y2 * scale)) for (x1, y1), (x2, y2), _ in raw_axes]
+    widths = [w * scale for _, _, w in raw_axes]
     bounds = _bounds_from_lines(lines)
     wall_height = 2.8
     wall_thickness = 0.2
     walls = []
-    for p1, p2 in lines:
-        wall = _create_wall(bpy, p1=p1, p2=p2, thickness=wall_thickness, height=wall_height)
+    for (p1, p2), width in zip(lines, widths):
+        # Centrelines carry their measured wall thickness; outlines fall back to a fixed one.
+        thickness = width if width > 0.0 else wall_thickness
+        wall = _create_wall(bpy, p1=p1, p2=p2, thickness=thickness, height=wall_height)
         if wall is not None:
             walls.append(wall)
     if os.getenv("WALL_BOOLEAN_UNION", "").strip().lower() in ("1", "true", "yes"):
@@ -1,4 +1,5 @@
 # 文件位置: backend/main.py
+import logging
 import sys
 import os
 
@@ -63,6 +64,25 @@ app.include_router(api_router, prefix="/api/v1")
 app.include_router(visual_router, prefix="/api/v1/visual")
 app.include_router(engineering_router, prefix="/api/v1/engineering")
 
+# ==========================================
+# 7. 预热分割模型 (可选)
+#    1/true/yes: 后台线程预热, 不阻塞启动
+#    fork: 在主进程同步加载 (不做推理), 供 gunicorn --preload 等 fork 出的 worker 共享权重
+# ==========================================
+_seg_preload = os.getenv("IMAGE_DXF_SEG_PRELOAD", "").strip().lower()
+if _seg_preload == "fork":
+    from worker.segmentation import preload_for_fork
+
+    # 加载失败不影响启动: worker 各自按需加载, 失败状态见 GET /upload/image/model
+    try:
+        preload_for_fork()
+    except Exception as e:
+        logging.getLogger(__name__).warning("segmentation model preload failed; workers load their own: %s", e)
+elif _seg_preload in ("1", "true", "yes"):
+    from worker.segmentation import get_model_registry
+
+    get_model_registry().warm_up_in_background()
+
 if __name__ == "__main__":
     import uvicorn
     # 统一使用 8002 端口
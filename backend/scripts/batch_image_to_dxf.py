@@ -0,0 +1,36 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Convert a directory or manifest of plan images to DXF")
+    parser.add_argument("source", help="image directory, or a manifest (JSONL with image/dxf, or one path per line)")
+    parser.add_argument("--out-dir", default="", help="where DXFs go (default: <source>_dxf)")
+    parser.add_argument("--results", default="", help="JSONL results file (default: <out-dir>/results.jsonl)")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, 0 = one per CPU")
+    parser.add_argument("--recursive", action="store_true", help="include images in subdirectories")
+    parser.add_argument("--no-resume", action="store_true", help="reconvert images already recorded as ok")
+    args = parser.parse_args()
+
+    from worker.batch import collect_items, print_progress, run_batch
+
+    src = Path(args.source)
+    if not src.exists():
+        raise SystemExit(f"批量转换源不存在: {src}")
+    out_dir = Path(args.out_dir) if args.out_dir else src.with_name(f"{src.stem}_dxf")
+    results = Path(args.results) if args.results else out_dir / "results.jsonl"
+
+    items = collect_items(src, out_dir, recursive=args.recursive)
+    summary = run_batch(
+        items, results_path=results, workers=args.workers, resume=not args.no_resume, on_record=print_progress
+    )
+    print(json.dumps(summary.as_dict(), ensure_ascii=False, indent=2))
+    if summary.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
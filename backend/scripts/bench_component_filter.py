@@ -0,0 +1,83 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+def _legacy_filter(mask, *, min_area: int, thin_px: int, long_px: int):
+    """The old per-component loop, kept here only as the benchmark baseline."""
+    keep = mask.copy()
+    num, labels, stats, _ = cv2.connectedComponentsWithStats(keep, connectivity=8)
+    for i in range(1, num):
+        w = int(stats[i, cv2.CC_STAT_WIDTH])
+        h = int(stats[i, cv2.CC_STAT_HEIGHT])
+        area = int(stats[i, cv2.CC_STAT_AREA])
+        if area < min_area or (min(w, h) <= thin_px and max(w, h) >= long_px):
+            keep[labels == i] = 0
+    return keep
+
+
+def _speckled_plan(h: int, w: int, components: int, *, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((h, w), np.uint8)
+    step = max(200, min(h, w) // 6)
+    for y in range(step, h - step, step):
+        cv2.line(mask, (step // 2, y), (w - step // 2, y), 255, 9)
+    for x in range(step, w - step, step):
+        cv2.line(mask, (x, step // 2), (x, h - step // 2), 255, 9)
+    xs = rng.integers(0, w, components)
+    ys = rng.integers(0, h, components)
+    rs = rng.integers(1, 4, components)
+    for x, y, r in zip(xs, ys, rs):
+        cv2.circle(mask, (int(x), int(y)), int(r), 255, -1)
+    return mask
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Benchmark connected-component speckle filtering")
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--components", default="10,100,1000,5000,20000")
+    parser.add_argument("--band-rows", type=int, default=512)
+    parser.add_argument("--legacy-max", type=int, default=1000, help="skip the per-component loop above this count")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    from worker.image_to_dxf import _remove_small_and_thin_components
+
+    kw = dict(min_area=50, thin_px=4, long_px=250)
+    print(f"image={args.width}x{args.height} band_rows={args.band_rows}")
+    print(f"{'components':>10} {'legacy_ms':>10} {'lut_ms':>8} {'banded_ms':>10} {'match':>6}")
+    for n in [int(x) for x in args.components.split(",") if x.strip()]:
+        mask = _speckled_plan(args.height, args.width, n, seed=n)
+        lut = _remove_small_and_thin_components(mask, **kw)
+        banded = _remove_small_and_thin_components(mask, band_rows=args.band_rows, **kw)
+        lut_ms = _best_ms(lambda: _remove_small_and_thin_components(mask, **kw), args.repeat)
+        banded_ms = _best_ms(
+            lambda: _remove_small_and_thin_components(mask, band_rows=args.band_rows, **kw), args.repeat
+        )
+        match = np.array_equal(lut, banded)
+        legacy = "-"
+        if n <= args.legacy_max:
+            t0 = time.perf_counter()
+            ref = _legacy_filter(mask, **kw)
+            legacy = f"{(time.perf_counter() - t0) * 1000.0:.1f}"
+            match = match and np.array_equal(ref, lut)
+        print(f"{n:10d} {legacy:>10} {lut_ms:8.1f} {banded_ms:10.1f} {'yes' if match else 'NO':>6}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
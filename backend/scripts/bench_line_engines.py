@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _synthetic_plan(side: int, *, seed: int) -> np.ndarray:
+    """Gray Manhattan floor plan: thick outer walls, thinner partitions with door gaps, a diagonal wall, labels."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img = np.full((side, int(side * 1.4)), 255, np.uint8)
+    h, w = img.shape
+    m = side // 20
+    t_out = max(4, side // 150)
+    t_in = max(2, side // 300)
+    cv2.rectangle(img, (m, m), (w - m, h - m), 0, t_out)
+    for x in np.sort(rng.uniform(m * 3, w - m * 3, 4)).astype(int):
+        cv2.line(img, (int(x), m), (int(x), h - m), 0, t_in)
+    for y in np.sort(rng.uniform(m * 3, h - m * 3, 3)).astype(int):
+        cv2.line(img, (m, int(y)), (w - m, int(y)), 0, t_in)
+    door = max(12, side // 40)
+    for _ in range(12):
+        x, y = int(rng.integers(m * 2, w - m * 2)), int(rng.integers(m * 2, h - m * 2))
+        if rng.random() < 0.5:
+            img[max(0, y - door) : y + door, x - t_in * 2 : x + t_in * 2] = 255
+        else:
+            img[y - t_in * 2 : y + t_in * 2, max(0, x - door) : x + door] = 255
+    cv2.line(img, (w - m * 6, m), (w - m, m * 6), 0, t_in)
+    for _ in range(20):
+        x, y = int(rng.integers(m * 2, w - m * 6)), int(rng.integers(m * 2, h - m))
+        cv2.putText(img, "ROOM", (x, y), cv2.FONT_HERSHEY_SIMPLEX, side / 1500.0, 0, max(1, side // 1000))
+    return img
+
+
+def _run(gray, engine: str) -> dict:
+    from worker.image_to_dxf import _default_detect_params, _merged_segments, _run_detection_ladder
+    from worker.stages import StageGraph
+
+    os.environ["IMAGE_DXF_LINE_ENGINE"] = engine
+    graph = StageGraph()
+    t0 = time.perf_counter()
+    selected, _ = _run_detection_ladder(gray, params=_default_detect_params(), graph=graph)
+    t1 = time.perf_counter()
+    segs = _merged_segments(graph, selected) if selected.raw_count else np.zeros((0, 4))
+    t2 = time.perf_counter()
+    totals = graph.stage_totals()
+    return {
+        "rung": selected.name,
+        "raw": selected.raw_count,
+        "merged": int(segs.shape[0]),
+        "detect_ms": (t1 - t0) * 1000.0,
+        "merge_ms": (t2 - t1) * 1000.0,
+        "lines_ms": sum(totals.get(k, 0.0) for k in ("rle", "canny", "hough")),
+        "segs": segs,
+    }
+
+
+def _coverage(segs: np.ndarray, ref: np.ndarray, *, tol: float) -> float:
+    """Share of ``ref`` length whose sample points lie within ``tol`` px of some segment in ``segs``."""
+    if ref.shape[0] == 0:
+        return 1.0
+    if segs.shape[0] == 0:
+        return 0.0
+    import cv2
+
+    x_max = int(max(segs[:, [0, 2]].max(), ref[:, [0, 2]].max())) + 2
+    y_max = int(max(segs[:, [1, 3]].max(), ref[:, [1, 3]].max())) + 2
+    canvas = np.zeros((y_max, x_max), np.uint8)
+    for x1, y1, x2, y2 in np.round(segs).astype(int):
+        cv2.line(canvas, (x1, y1), (x2, y2), 255, 2 * int(tol) + 1)
+    hit = total = 0
+    for x1, y1, x2, y2 in ref:
+        n = max(2, int(np.hypot(x2 - x1, y2 - y1)))
+        xs = np.clip(np.round(np.linspace(x1, x2, n)).astype(int), 0, x_max - 1)
+        ys = np.clip(np.round(np.linspace(y1, y2, n)).astype(int), 0, y_max - 1)
+        hit += int(np.count_nonzero(canvas[ys, xs]))
+        total += n
+    return hit / float(total)
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Compare the hough and rle line engines on plans")
+    parser.add_argument("images", nargs="*", help="plan images (default: synthetic plans of --sizes)")
+    parser.add_argument("--sizes", default="1000,2000,4000", help="synthetic plan heights in px")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tol", type=float, default=3.0, help="px distance for the coverage columns")
+    args = parser.parse_args()
+
+    import cv2
+
+    cases = []
+    for path in args.images:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise SystemExit(f"无法读取图片: {path}")
+        cases.append((Path(path).name, gray))
+    if not cases:
+        for side in (int(x) for x in args.sizes.split(",") if x.strip()):
+            cases.append((f"synthetic-{side}", _synthetic_plan(side, seed=args.seed)))
+
+    print(
+        f"{'image':>18} {'mpx':>5} {'engine':>6} {'rung':>10} {'raw':>6} {'merged':>6} "
+        f"{'lines_ms':>9} {'detect_ms':>10} {'merge_ms':>9} {'speedup':>8} {'covers':>7} {'covered':>8}"
+    )
+    for name, gray in cases:
+        rows = {}
+        for engine in ("hough", "rle"):
+            best = None
+            for _ in range(max(1, args.repeat)):
+                row = _run(gray, engine)
+                if best is None or row["detect_ms"] + row["merge_ms"] < best["detect_ms"] + best["merge_ms"]:
+                    best = row
+            rows[engine] = best
+        base = rows["hough"]["detect_ms"] + rows["hough"]["merge_ms"]
+        for engine, r in rows.items():
+            other = rows["rle" if engine == "hough" else "hough"]["segs"]
+            # covers: how much of the other engine's output this one reproduces; covered: the converse.
+            covers = _coverage(r["segs"], other, tol=args.tol)
+            covered = _coverage(other, r["segs"], tol=args.tol)
+            speedup = base / max(1e-9, r["detect_ms"] + r["merge_ms"])
+            print(
+                f"{name:>18} {gray.size / 1e6:5.1f} {engine:>6} {r['rung']:>10} {r['raw']:6d} {r['merged']:6d} "
+                f"{r['lines_ms']:9.1f} {r['detect_ms']:10.1f} {r['merge_ms']:9.1f} {speedup:7.2f}x "
+                f"{covers:7.1%} {covered:8.1%}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _synthetic_segments(n: int, *, seed: int) -> np.ndarray:
+    """Hough-like raw segments: fragmented Manhattan walls plus diagonal clutter."""
+    rng = np.random.default_rng(seed)
+    size = max(400.0, 60.0 * float(np.sqrt(n)))
+    walls = max(4, n // 12)
+    wall_pos = rng.uniform(0.0, size, walls)
+    wall_vertical = rng.random(walls) < 0.5
+
+    out = np.empty((n, 4), dtype=np.float64)
+    for k in range(n):
+        if rng.random() < 0.9:
+            w = int(rng.integers(walls))
+            a = float(rng.uniform(0.0, size))
+            length = float(rng.uniform(10.0, 120.0))
+            off = float(wall_pos[w] + rng.normal(0.0, 1.5))
+            tilt = float(rng.normal(0.0, 1.0)) * length / 57.3
+            if wall_vertical[w]:
+                out[k] = [off, a, off + tilt, a + length]
+            else:
+                out[k] = [a, off, a + length, off + tilt]
+        else:
+            x, y = rng.uniform(0.0, size, 2)
+            t = float(rng.uniform(0.0, np.pi))
+            length = float(rng.uniform(10.0, 60.0))
+            out[k] = [x, y, x + length * np.cos(t), y + length * np.sin(t)]
+    return np.round(out).astype(np.int32).reshape(-1, 1, 4)
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Benchmark the Hough segment merge engines")
+    parser.add_argument("--sizes", default="100,250,500,1000,2000,5000,10000,20000")
+    parser.add_argument("--pairwise-max", type=int, default=2000, help="skip the O(n^2) engine above this size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from worker.image_to_dxf import _merge_lines_pairwise
+    from worker.line_merge import merge_lines_bucketed
+
+    kw = dict(angle_tol_deg=5.0, dist_tol_px=10.0, gap_tol_px=25.0, min_len_px=10.0)
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+
+    print(f"{'raw':>7} {'merged':>7} {'bucket_ms':>10} {'pairwise_ms':>12} {'speedup':>8} {'match':>6}")
+    for n in sizes:
+        lines = _synthetic_segments(n, seed=args.seed)
+
+        best = float("inf")
+        out = None
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            out = merge_lines_bucketed(lines, **kw)
+            best = min(best, time.perf_counter() - t0)
+        bucket_ms = best * 1000.0
+
+        pairwise_ms = None
+        match = "-"
+        if n <= args.pairwise_max:
+            t0 = time.perf_counter()
+            ref = _merge_lines_pairwise(lines, **kw)
+            pairwise_ms = (time.perf_counter() - t0) * 1000.0
+            match = "yes" if ref.shape == out.shape and np.allclose(ref, out, atol=1e-6) else "NO"
+
+        pw = f"{pairwise_ms:12.1f}" if pairwise_ms is not None else f"{'-':>12}"
+        sp = f"{pairwise_ms / bucket_ms:7.1f}x" if pairwise_ms is not None else f"{'-':>8}"
+        print(f"{n:7d} {out.shape[0]:7d} {bucket_ms:10.1f} {pw} {sp} {match:>6}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
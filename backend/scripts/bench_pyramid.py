@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _run(gray, factor: int) -> dict:
+    from worker.image_to_dxf import _default_detect_params, _merged_segments, _run_detection_ladder
+    from worker.stages import StageGraph
+
+    graph = StageGraph()
+    t0 = time.perf_counter()
+    selected, _ = _run_detection_ladder(gray, params=_default_detect_params(), graph=graph, pyramid=factor)
+    t1 = time.perf_counter()
+    segs = _merged_segments(graph, selected, gray) if selected.raw_count else np.zeros((0, 4))
+    t2 = time.perf_counter()
+    return {
+        "rung": selected.name,
+        "raw": selected.raw_count,
+        "merged": int(segs.shape[0]),
+        "detect_ms": (t1 - t0) * 1000.0,
+        "merge_ms": (t2 - t1) * 1000.0,
+        "segs": segs,
+        "edges": selected.edges,
+    }
+
+
+def _endpoint_error(segs: np.ndarray, edges) -> np.ndarray:
+    """Distance (px) from every segment endpoint to the nearest full-resolution edge pixel."""
+    import cv2
+
+    if segs.shape[0] == 0:
+        return np.zeros(0)
+    dist = cv2.distanceTransform(cv2.bitwise_not(edges), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    h, w = dist.shape
+    pts = np.rint(segs.reshape(-1, 2)).astype(int)
+    pts[:, 0] = np.clip(pts[:, 0], 0, w - 1)
+    pts[:, 1] = np.clip(pts[:, 1], 0, h - 1)
+    return dist[pts[:, 1], pts[:, 0]]
+
+
+def _on_edges(segs: np.ndarray, edges, *, tol: float) -> float:
+    """Share of the sample points along ``segs`` within ``tol`` px of a full-resolution edge pixel."""
+    import cv2
+
+    if segs.shape[0] == 0:
+        return 0.0
+    dist = cv2.distanceTransform(cv2.bitwise_not(edges), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    h, w = dist.shape
+    hit = total = 0
+    for x1, y1, x2, y2 in segs:
+        n = max(2, int(np.hypot(x2 - x1, y2 - y1)))
+        xs = np.clip(np.rint(np.linspace(x1, x2, n)).astype(int), 0, w - 1)
+        ys = np.clip(np.rint(np.linspace(y1, y2, n)).astype(int), 0, h - 1)
+        hit += int(np.count_nonzero(dist[ys, xs] <= tol))
+        total += n
+    return hit / float(total)
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Compare full-resolution and pyramid line detection on plans")
+    parser.add_argument("images", nargs="*", help="plan images (default: synthetic plans of --sizes)")
+    parser.add_argument("--sizes", default="2000,4000", help="synthetic plan heights in px")
+    parser.add_argument("--factors", default="2,3,4", help="pyramid factors to compare with full resolution")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tol", type=float, default=3.0, help="px distance for the coverage columns")
+    args = parser.parse_args()
+
+    import cv2
+
+    from scripts.bench_line_engines import _coverage, _synthetic_plan
+
+    os.environ.setdefault("IMAGE_DXF_LINE_ENGINE", "hough")
+    cases = []
+    for path in args.images:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise SystemExit(f"无法读取图片: {path}")
+        cases.append((Path(path).name, gray))
+    if not cases:
+        for side in (int(x) for x in args.sizes.split(",") if x.strip()):
+            cases.append((f"synthetic-{side}", _synthetic_plan(side, seed=args.seed)))
+    factors = [1] + [int(x) for x in args.factors.split(",") if x.strip()]
+
+    print(
+        f"{'image':>18} {'mpx':>5} {'factor':>6} {'rung':>10} {'raw':>6} {'merged':>6} {'detect_ms':>10} "
+        f"{'merge_ms':>9} {'speedup':>8} {'covers':>7} {'covered':>8} {'on_edge':>8} {'end_p50':>8} {'end_p95':>8}"
+    )
+    for name, gray in cases:
+        rows = {}
+        for factor in factors:
+            best = None
+            for _ in range(max(1, args.repeat)):
+                row = _run(gray, factor)
+                if best is None or row["detect_ms"] + row["merge_ms"] < best["detect_ms"] + best["merge_ms"]:
+                    best = row
+            rows[factor] = best
+        ref = rows[1]
+        base = ref["detect_ms"] + ref["merge_ms"]
+        for factor, r in rows.items():
+            # covers: how much of the full-resolution output this reproduces; covered: the converse.
+            covers = _coverage(r["segs"], ref["segs"], tol=args.tol)
+            covered = _coverage(ref["segs"], r["segs"], tol=args.tol)
+            # Lines and endpoints against the full-resolution edges: the full-resolution row is the baseline.
+            edges = ref["edges"]
+            on_edge = _on_edges(r["segs"], edges, tol=args.tol) if edges is not None else 0.0
+            err = _endpoint_error(r["segs"], edges) if edges is not None else np.zeros(0)
+            p50, p95 = (np.percentile(err, 50), np.percentile(err, 95)) if err.size else (0.0, 0.0)
+            speedup = base / max(1e-9, r["detect_ms"] + r["merge_ms"])
+            print(
+                f"{name:>18} {gray.size / 1e6:5.1f} {factor:6d} {r['rung']:>10} {r['raw']:6d} {r['merged']:6d} "
+                f"{r['detect_ms']:10.1f} {r['merge_ms']:9.1f} {speedup:7.2f}x {covers:7.1%} {covered:8.1%} "
+                f"{on_edge:8.1%} {p50:8.2f} {p95:8.2f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
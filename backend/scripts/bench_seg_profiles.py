@@ -0,0 +1,184 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _corpus(root: Path) -> list[Path]:
+    from worker.batch import IMAGE_SUFFIXES
+
+    return sorted(p for p in root.iterdir() if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def _wall_iou(pred: np.ndarray, ref: np.ndarray) -> float:
+    union = int(np.count_nonzero(pred | ref))
+    return 1.0 if union == 0 else float(np.count_nonzero(pred & ref)) / float(union)
+
+
+def _reference_mask(ref_dir: Path, image: Path, shape: tuple[int, int]) -> np.ndarray | None:
+    import cv2
+
+    for path in (ref_dir / f"{image.stem}.npy", ref_dir / f"{image.stem}.png"):
+        if not path.exists():
+            continue
+        mask = np.load(path) if path.suffix == ".npy" else cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            return None
+        if mask.shape != shape:
+            mask = cv2.resize(mask.astype(np.uint8), (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+        return mask > 0
+    return None
+
+
+def _weights_for(encoder_name: str, names: list[str]) -> str | None:
+    from worker.weight_store import get_weight_store
+
+    entries = get_weight_store().entries()
+    for name in names:
+        entry = entries.get(name)
+        if entry is not None and entry.encoder_name == encoder_name:
+            return name
+    return None
+
+
+def run_profile(profile: str, images: list[str], opts: dict) -> dict:
+    """Segment every image with one profile; runs in its own process so peak RSS is per profile."""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import resource
+
+    import torch
+
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import _ai_wall_mask_is_usable
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    torch.set_num_threads(max(1, opts["threads"]))
+    config = SegmentationConfig(encoder_weights=opts["encoder_weights"], threads=opts["threads"]).with_profile(profile)
+    config = replace(config, weights=_weights_for(config.encoder_name, opts["weights"]))
+    row = {"profile": profile, "encoder": config.encoder_name, "max_side": config.max_side, "images": len(images)}
+
+    torch.manual_seed(0)
+    t0 = time.perf_counter()
+    try:
+        model = LocalSegmentationModel(device="cpu", config=config)
+    except Exception as e:
+        return {**row, "error": str(e), "fallback_rate": 1.0}
+    row["load_s"] = time.perf_counter() - t0
+    row["weights"] = model.weights_source
+    row["params_m"] = sum(p.numel() for p in model.model.parameters()) / 1e6
+    model.predict(np.zeros((64, 64, 3), np.uint8))
+
+    latencies, ious = [], []
+    usable = errors = 0
+    for path in images:
+        ctx = ImageContext.from_path(path)
+        t0 = time.perf_counter()
+        try:
+            class_map = model.predict(ctx)
+        except RuntimeError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+        wall = class_map == 1
+        usable += bool(_ai_wall_mask_is_usable(wall.astype(np.uint8) * 255))
+        if opts["save_masks"]:
+            np.save(Path(opts["save_masks"]) / f"{Path(path).stem}.npy", wall)
+        if opts["ref_dir"]:
+            ref = _reference_mask(Path(opts["ref_dir"]), Path(path), wall.shape)
+            if ref is not None:
+                ious.append(_wall_iou(wall, ref))
+
+    ok = len(latencies)
+    lat_ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    row.update(
+        p50_ms=float(np.percentile(lat_ms, 50)) if ok else None,
+        p95_ms=float(np.percentile(lat_ms, 95)) if ok else None,
+        images_per_s=ok / float(np.sum(latencies)) if ok else 0.0,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        wall_iou=float(np.mean(ious)) if ious else None,
+        usable_rate=usable / ok if ok else 0.0,
+        fallback_rate=(errors + ok - usable) / max(1, len(images)),
+        errors=errors,
+    )
+    return row
+
+
+def _fmt(v, spec: str) -> str:
+    return "-" if v is None else format(v, spec)
+
+
+def main():
+    sys.path.insert(0, str(BACKEND_DIR))
+    from worker.segmentation import DEFAULT_PROFILE, SEGMENTATION_PROFILES
+
+    parser = argparse.ArgumentParser(description="Compare segmentation profiles on a local corpus of plans")
+    parser.add_argument("corpus", help="directory of plan images")
+    parser.add_argument("--profiles", default=",".join(SEGMENTATION_PROFILES))
+    parser.add_argument(
+        "--masks", default="", help="reference WALL masks (<stem>.png, non-zero = wall); default: --reference output"
+    )
+    parser.add_argument("--reference", default=DEFAULT_PROFILE, help="profile whose WALL mask is the IoU reference")
+    parser.add_argument("--weights", default="", help="weight store names; each profile uses the first matching encoder")
+    parser.add_argument("--encoder-weights", default="none", help="used without stored weights; 'none' is offline")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--json", default="", help="also write the rows to this JSON file")
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    unknown = [p for p in profiles + [args.reference] if p not in SEGMENTATION_PROFILES]
+    if unknown:
+        raise SystemExit(f"未知 profile: {', '.join(unknown)}（可选: {', '.join(SEGMENTATION_PROFILES)}）")
+    images = [str(p) for p in _corpus(Path(args.corpus))]
+    if not images:
+        raise SystemExit(f"目录中没有图片: {args.corpus}")
+
+    opts = {
+        "threads": args.threads,
+        "weights": [w.strip() for w in args.weights.split(",") if w.strip()],
+        "encoder_weights": None if args.encoder_weights.lower() in ("", "none") else args.encoder_weights,
+        "ref_dir": args.masks,
+        "save_masks": "",
+    }
+    rows = []
+    # One fresh process per profile: peak RSS and thread pools do not leak between profiles.
+    pool = ProcessPoolExecutor(1, mp_context=get_context("spawn"), max_tasks_per_child=1)
+    with tempfile.TemporaryDirectory() as tmp, pool:
+        if not args.masks:
+            ref = pool.submit(run_profile, args.reference, images, {**opts, "save_masks": tmp}).result()
+            if "error" in ref:
+                raise SystemExit(f"参考 profile {args.reference} 加载失败: {ref['error']}")
+            opts["ref_dir"] = tmp
+        for profile in profiles:
+            rows.append(pool.submit(run_profile, profile, images, opts).result())
+
+    ref_name = args.masks or f"{args.reference} (model)"
+    print(f"{len(images)} images, WALL IoU reference: {ref_name}")
+    print(
+        f"{'profile':>18} {'params':>7} {'load_s':>7} {'p50_ms':>8} {'p95_ms':>8} {'img/s':>6} "
+        f"{'rss_mb':>7} {'iou':>6} {'usable':>7} {'fallbk':>7}"
+    )
+    for r in rows:
+        if "error" in r:
+            print(f"{r['profile']:>18} load failed: {r['error']}")
+            continue
+        print(
+            f"{r['profile']:>18} {r['params_m']:6.1f}M {r['load_s']:7.2f} {_fmt(r['p50_ms'], '8.1f')} "
+            f"{_fmt(r['p95_ms'], '8.1f')} {r['images_per_s']:6.2f} {r['peak_rss_mb']:7.0f} "
+            f"{_fmt(r['wall_iou'], '6.3f')} {r['usable_rate']:7.1%} {r['fallback_rate']:7.1%}"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
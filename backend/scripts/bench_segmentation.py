@@ -0,0 +1,82 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _synthetic_plan(h: int, w: int, *, seed: int) -> np.ndarray:
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w, 3), 255, np.uint8)
+    m = max(8, min(h, w) // 12)
+    cv2.rectangle(img, (m, m), (w - m, h - m), (0, 0, 0), max(2, min(h, w) // 150))
+    for _ in range(12):
+        if rng.random() < 0.5:
+            x = int(rng.integers(m, w - m))
+            cv2.line(img, (x, m), (x, h - m), (0, 0, 0), max(2, min(h, w) // 250))
+        else:
+            y = int(rng.integers(m, h - m))
+            cv2.line(img, (m, y), (w - m, y), (0, 0, 0), max(2, min(h, w) // 250))
+    return img
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Benchmark segmentation inference backends on CPU")
+    parser.add_argument("--backends", default="eager,torchscript,onnx,onnx+dynamic,onnx+static")
+    parser.add_argument("--image", default="", help="image to segment (default: synthetic plan)")
+    parser.add_argument("--size", default="1536x2048", help="synthetic image HxW")
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads per model")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--encoder-weights", default="none", help="'imagenet' downloads weights; 'none' is offline")
+    args = parser.parse_args()
+
+    import cv2
+    import torch
+
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    if args.image:
+        img = cv2.imread(args.image, cv2.IMREAD_COLOR)
+        if img is None:
+            raise SystemExit(f"图片不存在: {args.image}")
+    else:
+        h, w = (int(v) for v in args.size.lower().split("x"))
+        img = _synthetic_plan(h, w, seed=0)
+    weights = None if args.encoder_weights.lower() in ("", "none") else args.encoder_weights
+
+    ref = None
+    print(f"{'backend':>14} {'load_s':>7} {'ms/img':>9} {'img/s':>7} {'img/s/core':>10} {'agree':>7}")
+    for spec in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        backend, _, quantize = spec.partition("+")
+        config = SegmentationConfig(
+            max_side=args.max_side,
+            encoder_weights=weights,
+            backend=backend,
+            quantize=quantize or None,
+            threads=args.threads,
+        )
+        torch.manual_seed(0)
+        t0 = time.perf_counter()
+        model = LocalSegmentationModel(device="cpu", config=config)
+        load_s = time.perf_counter() - t0
+
+        out = model.predict(img)
+        best = float("inf")
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            model.predict(img)
+            best = min(best, time.perf_counter() - t0)
+        if ref is None:
+            ref = out
+        agree = float(np.mean(out == ref))
+        ips = 1.0 / best
+        print(f"{spec:>14} {load_s:7.2f} {best * 1000:9.1f} {ips:7.2f} {ips / max(1, args.threads):10.2f} {agree:7.4f}")
+
+
+if __name__ == "__main__":
+    main()
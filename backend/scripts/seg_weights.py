@@ -0,0 +1,96 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+
+def _state_dict_from_file(path: Path) -> dict:
+    if path.suffix == ".safetensors":
+        from safetensors.torch import load_file
+
+        return load_file(str(path))
+    import torch
+
+    obj = torch.load(str(path), map_location="cpu", weights_only=True)
+    for key in ("state_dict", "model_state_dict", "model"):
+        if isinstance(obj, dict) and isinstance(obj.get(key), dict):
+            obj = obj[key]
+            break
+    return {k.removeprefix("module."): v for k, v in obj.items()}
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    parser = argparse.ArgumentParser(description="Manage the offline segmentation weight store")
+    parser.add_argument("--root", default="", help="store directory (default: IMAGE_DXF_SEG_WEIGHTS_DIR or backend/var/seg_weights)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("list", help="show registered weights")
+    p_verify = sub.add_parser("verify", help="check files against the manifest checksums")
+    p_verify.add_argument("names", nargs="*")
+
+    p_add = sub.add_parser("add", help="register a checkpoint (.pth/.pt/.safetensors) as safetensors")
+    p_add.add_argument("name")
+    p_add.add_argument("checkpoint")
+    p_add.add_argument("--scope", choices=("full", "encoder"), default="full")
+    p_add.add_argument("--encoder", default="resnet34")
+    p_add.add_argument("--classes", type=int, default=4)
+    p_add.add_argument("--note", default="")
+
+    p_snap = sub.add_parser("snapshot", help="download pretrained encoder weights once and store the full model")
+    p_snap.add_argument("name")
+    p_snap.add_argument("--encoder", default="resnet34")
+    p_snap.add_argument("--encoder-weights", default="imagenet")
+    p_snap.add_argument("--classes", type=int, default=4)
+    p_snap.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from worker.weight_store import WeightStoreError, get_weight_store
+
+    store = get_weight_store(Path(args.root) if args.root else None)
+
+    if args.cmd == "list":
+        for name, e in sorted(store.entries().items()):
+            print(f"{name:<24} {e.scope:<8} {e.encoder_name:<16} {e.num_classes:>3} {e.size / 1e6:8.1f} MB  {e.sha256[:12]}  {e.note}")
+        return
+
+    if args.cmd == "verify":
+        names = args.names or sorted(store.entries())
+        failed = 0
+        for name in names:
+            t0 = time.perf_counter()
+            try:
+                store.verify(store.resolve(name))
+                print(f"[ok] {name} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+            except WeightStoreError as e:
+                failed += 1
+                print(f"[fail] {name}: {e}")
+        if failed:
+            raise SystemExit(1)
+        return
+
+    if args.cmd == "add":
+        state = _state_dict_from_file(Path(args.checkpoint))
+        entry = store.register(
+            args.name, state, scope=args.scope, encoder_name=args.encoder, num_classes=args.classes, note=args.note
+        )
+    else:
+        import segmentation_models_pytorch as smp
+        import torch
+
+        torch.manual_seed(args.seed)
+        model = smp.DeepLabV3Plus(
+            encoder_name=args.encoder, encoder_weights=args.encoder_weights, classes=args.classes, activation=None
+        )
+        entry = store.register(
+            args.name,
+            model.state_dict(),
+            encoder_name=args.encoder,
+            num_classes=args.classes,
+            note=f"{args.encoder_weights} encoder, seed {args.seed} decoder",
+        )
+    print(f"{entry.name}: {store.path_for(entry)} sha256={entry.sha256}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import pytest
+
+
+def _write_rooms(tmp_path: Path) -> Path:
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    src = tmp_path / "scans"
+    src.mkdir()
+    for i in range(2):
+        img = np.full((240, 320, 3), 255, np.uint8)
+        cv2.rectangle(img, (40 + 10 * i, 40), (280, 200), (0, 0, 0), 3)
+        cv2.imwrite(str(src / f"room{i}.png"), img)
+    (src / "broken.png").write_bytes(b"not an image")
+    (src / "notes.txt").write_text("ignored", encoding="utf-8")
+    return src
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_streams_records_and_resumes(tmp_path: Path, monkeypatch, workers: int):
+    src = _write_rooms(tmp_path)
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "0")
+
+    from worker.batch import collect_items, run_batch
+
+    out_dir = tmp_path / "out"
+    items = collect_items(src, out_dir)
+    assert [it.image.name for it in items] == ["broken.png", "room0.png", "room1.png"]
+    assert [it.dxf for it in items] == [out_dir / "broken.dxf", out_dir / "room0.dxf", out_dir / "room1.dxf"]
+
+    results = out_dir / "results.jsonl"
+    seen = []
+    summary = run_batch(items, results_path=results, workers=workers, on_record=seen.append)
+
+    rows = [json.loads(line) for line in results.read_text(encoding="utf-8").splitlines()]
+    assert rows == seen
+    by_name = {Path(r["image"]).name: r for r in rows}
+    assert by_name["broken.png"]["status"] == "error"
+    for name in ("room0.png", "room1.png"):
+        assert by_name[name]["status"] == "ok"
+        assert by_name[name]["wall_segments"] >= 4
+        assert by_name[name]["megapixels"] == pytest.approx(0.0768)
+        assert Path(by_name[name]["dxf"]).exists()
+    assert (summary.total, summary.ok, summary.failed, summary.skipped) == (3, 2, 1, 0)
+    assert summary.failures == [str(src / "broken.png")]
+    assert summary.images_per_s > 0
+
+    again = run_batch(items, results_path=results, workers=workers)
+    assert (again.ok, again.failed, again.skipped) == (0, 1, 2)
+    assert len(results.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_collect_items_from_manifest(tmp_path: Path):
+    from worker.batch import collect_items
+
+    (tmp_path / "a").mkdir()
+    manifest = tmp_path / "list.jsonl"
+    manifest.write_text(
+        "# legacy scans\n"
+        '{"image": "a/plan.png", "dxf": "custom/plan.dxf"}\n'
+        "a/plan.png\n"
+        "b/plan.png\n",
+        encoding="utf-8",
+    )
+    items = collect_items(manifest, tmp_path / "out")
+    assert [(it.image, it.dxf) for it in items] == [
+        (tmp_path / "a" / "plan.png", tmp_path / "custom" / "plan.dxf"),
+        (tmp_path / "a" / "plan.png", tmp_path / "out" / "plan.dxf"),
+        (tmp_path / "b" / "plan.png", tmp_path / "out" / "plan_1.dxf"),
+    ]
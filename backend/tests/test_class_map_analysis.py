@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+
+def _class_map():
+    class_map = np.zeros((240, 320), np.uint8)
+    cv2.rectangle(class_map, (40, 40), (280, 200), 1, 6)
+    class_map[35:45, 100:140] = 2
+    return class_map
+
+
+def test_analysis_memoizes_masks_counts_and_contours():
+    from worker.class_map_analysis import ClassMapAnalysis
+
+    class_map = _class_map()
+    analysis = ClassMapAnalysis(class_map)
+    assert [analysis.pixels(c) for c in range(4)] == np.bincount(class_map.ravel(), minlength=4).tolist()
+    assert analysis.contours(3)[0] == [] and (3, 1) in analysis._contours
+
+    wall = analysis.mask(1)
+    assert wall is analysis.mask(1) and set(np.unique(wall).tolist()) == {0, 255}
+    contours, areas = analysis.contours(1)
+    assert analysis.contours(1)[0] is contours
+    assert len(contours) == 1 and areas[0] == pytest.approx(cv2.contourArea(contours[0]))
+    closed, _ = analysis.contours(1, close_kernel=7)
+    assert closed is not contours and analysis.contours(1, close_kernel=1)[0] is contours
+
+
+def test_usability_check_shares_the_emitters_analysis(tmp_path, monkeypatch):
+    pytest.importorskip("ezdxf")
+    from worker.class_map_analysis import ClassMapAnalysis
+    from worker.image_to_dxf import _ai_wall_mask_is_usable, _dxf_from_class_map
+
+    class_map = _class_map()
+    wall = (class_map == 1).astype(np.uint8) * 255
+    analysis = ClassMapAnalysis(class_map)
+    assert _ai_wall_mask_is_usable(analysis) is _ai_wall_mask_is_usable(wall) is True
+    assert not _ai_wall_mask_is_usable(np.zeros_like(wall))
+
+    calls = []
+    real = cv2.findContours
+    monkeypatch.setattr(cv2, "findContours", lambda *a, **k: calls.append(1) or real(*a, **k))
+    shared = _dxf_from_class_map(
+        class_map=class_map, h=240, w=320, mm_per_px=10.0, out_path=tmp_path / "a.dxf", analysis=analysis
+    )
+    # WALL after closing and WINDOW; the raw WALL contours were already found by the check, DOOR is absent.
+    assert len(calls) == 2
+
+    fresh = _dxf_from_class_map(class_map=class_map, h=240, w=320, mm_per_px=10.0, out_path=tmp_path / "b.dxf")
+    assert shared.layer_segments == fresh.layer_segments and shared.bounds == fresh.bounds
+    assert shared.layer_entities["WINDOW"] == 1
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+def test_class_map_cache_round_trips_as_read_only_memmap_and_evicts_lru(tmp_path: Path):
+    from worker.class_map_cache import ClassMapCache, class_map_key
+
+    cache = ClassMapCache(tmp_path, max_bytes=2 * 10_000 + 400)
+    maps = {name: np.full((100, 100), i, np.uint8) for i, name in enumerate("abc")}
+    keys = {name: class_map_key(f"digest-{name}", "model-v1") for name in maps}
+    assert class_map_key("digest-a", "model-v2") != keys["a"]
+
+    cache.put(keys["a"], maps["a"])
+    cache.put(keys["b"], maps["b"])
+    got = cache.get(keys["a"])
+    assert isinstance(got, np.memmap) and not got.flags.writeable
+    assert np.array_equal(got, maps["a"])
+
+    old = cache._path(keys["b"]).stat().st_mtime - 100
+    os.utime(cache._path(keys["b"]), (old, old))
+    cache.put(keys["c"], maps["c"])
+    assert cache.get(keys["b"]) is None
+    assert cache.get(keys["a"]) is not None and cache.get(keys["c"]) is not None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_revectorizing_with_new_wall_params_reuses_cached_class_map(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    pytest.importorskip("ezdxf")
+
+    import worker.segmentation as seg
+    from worker.image_to_dxf import convert_image_to_dxf
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+
+    class_map = np.zeros((240, 320), np.uint8)
+    class_map[40:200, 40:280] = 1
+    class_map[60:180, 60:260] = 0
+    calls = []
+
+    class _Model:
+        def predict(self, image):
+            calls.append(image)
+            return class_map.copy()
+
+    monkeypatch.setattr(seg, "get_segmentation_model", lambda **_k: _Model())
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "1")
+    monkeypatch.setenv("IMAGE_DXF_CLASSMAP_CACHE_DIR", str(tmp_path / "maps"))
+    monkeypatch.delenv("IMAGE_DXF_SEG_BATCHING", raising=False)
+
+    first = convert_image_to_dxf(png_path, tmp_path / "a.dxf")
+    monkeypatch.setenv("IMAGE_DXF_WALL_EPS_FRAC", "0.05")
+    second = convert_image_to_dxf(png_path, tmp_path / "b.dxf")
+
+    assert len(calls) == 1
+    assert "hough" not in first.timings_ms and "hough" not in second.timings_ms
+    assert first.segments("WALL") >= 4 and second.segments("WALL") >= 4
+    assert len(list((tmp_path / "maps").glob("*/*.npy"))) == 1
+
+
+def test_random_init_fallback_fills_neither_cache(tmp_path: Path, monkeypatch):
+    pytest.importorskip("cv2")
+
+    import worker.segmentation as seg
+    from worker.conversion_cache import model_cacheable
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import _segment
+
+    class _Model:
+        weights_source = "random-init"
+
+        def predict(self, image):
+            return np.zeros(image.gray.shape, np.uint8)
+
+    model = _Model()
+    monkeypatch.setattr(seg, "get_segmentation_model", lambda **_k: model)
+    monkeypatch.setenv("IMAGE_DXF_CLASSMAP_CACHE_DIR", str(tmp_path / "maps"))
+    monkeypatch.delenv("IMAGE_DXF_SEG_BATCHING", raising=False)
+
+    ctx = ImageContext.from_array(np.full((64, 80, 3), 255, np.uint8))
+    _segment(ctx)
+    assert not list((tmp_path / "maps").glob("*/*.npy"))
+    model.weights_source = "imagenet"
+    _segment(ctx)
+    assert len(list((tmp_path / "maps").glob("*/*.npy"))) == 1
+
+    registry = seg.SegmentationModelRegistry()
+    monkeypatch.setattr(seg, "get_model_registry", lambda: registry)
+    assert model_cacheable()
+    registry._status[registry._key(None, None)] = seg.ModelStatus(state="ready", weights="random-init")
+    assert not model_cacheable()
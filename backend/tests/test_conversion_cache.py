@@ -0,0 +1,51 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+
+
+def _entry(cache, key: str, tmp_path: Path, size: int = 1000):
+    dxf = tmp_path / f"{key[:6]}.dxf"
+    dxf.write_bytes(b"0" * size)
+    cache.store(key, dxf_path=dxf, svg_preview="<svg/>")
+
+
+def test_conversion_key_tracks_bytes_and_output_settings():
+    from worker.conversion_cache import conversion_key
+
+    env = {"IMAGE_DXF_USE_LOCAL_SEG": "0", "IMAGE_DXF_MM_PER_PX": "10"}
+    base = conversion_key(b"png", environ=env)
+    assert conversion_key(b"png", environ=dict(env)) == base
+    assert conversion_key(b"png", environ=env, image_digest=hashlib.sha256(b"png").hexdigest()) == base
+    assert conversion_key(b"jpg", environ=env) != base
+    assert conversion_key(b"png", environ={**env, "IMAGE_DXF_MM_PER_PX": "5"}) != base
+    assert conversion_key(b"png", environ={**env, "IMAGE_DXF_DEBUG_ARTIFACTS": "1"}) == base
+    assert conversion_key(b"png", environ={**env, "IMAGE_DXF_USE_LOCAL_SEG": "1"}) != base
+
+
+def test_cache_evicts_by_size_lru_and_age(tmp_path: Path):
+    from worker.conversion_cache import ConversionCache
+
+    cache = ConversionCache(tmp_path / "cache", max_bytes=2500, max_age_s=3600)
+    keys = [f"{i:02x}" + "a" * 62 for i in range(3)]
+    _entry(cache, keys[0], tmp_path)
+    _entry(cache, keys[1], tmp_path)
+    old = time.time() - 60
+    os.utime(cache.root / keys[0][:2] / keys[0], (old, old))
+    os.utime(cache.root / keys[1][:2] / keys[1], (old - 10, old - 10))
+    assert cache.lookup(keys[1]) is not None  # refreshes keys[1]
+    _entry(cache, keys[2], tmp_path)
+
+    assert cache.lookup(keys[0]) is None
+    assert cache.lookup(keys[1]) is not None and cache.lookup(keys[2]) is not None
+    assert cache.stats()["evictions"] == 1
+
+    stale = time.time() - 7200
+    os.utime(cache.root / keys[2][:2] / keys[2], (stale, stale))
+    assert cache.lookup(keys[2]) is None
+    cache.evict()
+    assert not (cache.root / keys[2][:2] / keys[2]).exists()
+
+    hit = cache.lookup(keys[1])
+    dest = cache.materialize(hit, tmp_path / "session" / "converted.dxf")
+    assert dest.read_bytes() == hit.dxf_path.read_bytes()
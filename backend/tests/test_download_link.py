@@ -40,7 +40,7 @@ def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TestClient:
 
 
 def test_upload_image_returns_static_dxf_url_and_downloadable(client: TestClient):
-    def _fake_convert_image_to_dxf(image_path: str, output_dxf_path: str):
+    def _fake_convert_image_to_dxf(image_path: str, output_dxf_path: str, image=None):
         p = Path(output_dxf_path)
         p.parent.mkdir(parents=True, exist_ok=True)
         p.write_bytes(b"0\nSECTION\n2\nENTITIES\n0\nLINE\n8\nWALL\n10\n0\n20\n0\n11\n1000\n21\n0\n0\nENDSEC\n0\nEOF\n")
@@ -51,12 +51,14 @@ def test_upload_image_returns_static_dxf_url_and_downloadable(client: TestClient
                 session_id = p.parts[i + 1]
                 break
         static_root = next((parent for parent in [p] + list(p.parents) if parent.name.lower() == "static"), None)
+        artifacts = []
         if session_id and static_root:
             debug_dir = static_root / "debug" / session_id
             debug_dir.mkdir(parents=True, exist_ok=True)
             for name in ("debug_step1_gray.png", "debug_step2_ai_mask.png", "debug_step3_opencv_edges.png"):
                 (debug_dir / name).write_bytes(b"\x89PNG\r\n\x1a\n")
-        return p
+                artifacts.append(debug_dir / name)
+        return SimpleNamespace(path=p, debug_artifacts=artifacts)
 
     fake_worker = ModuleType("worker.image_to_dxf")
     fake_worker.ImageClarityError = type("ImageClarityError", (RuntimeError,), {})
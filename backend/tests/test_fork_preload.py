@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+smp = pytest.importorskip("segmentation_models_pytorch")
+pytest.importorskip("safetensors")
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork") or not Path("/proc/self/smaps_rollup").exists(),
+    reason="needs fork() and /proc/<pid>/smaps_rollup",
+)
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Runs in a fresh interpreter: a pytest process has already run torch work, which is
+# exactly the parent state the preload hook exists to avoid.
+_PARENT = r"""
+import json, os, sys
+import numpy as np
+import torch
+
+torch.set_num_threads(2)
+from worker.segmentation import get_segmentation_model, preload_for_fork
+from worker.seg_batching import get_segmentation_batcher
+
+def memory_mb():
+    kb = {}
+    for line in open("/proc/self/smaps_rollup"):
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            kb[parts[0].rstrip(":")] = int(parts[1])
+    return kb["Rss"] / 1024, (kb["Private_Clean"] + kb["Private_Dirty"]) / 1024
+
+model = preload_for_fork()
+params = list(model.model.state_dict().values())
+print(json.dumps({
+    "parent": True,
+    "weights_mb": sum(t.numel() * t.element_size() for t in params) / 2**20,
+    "shared": all(t.is_shared() for t in params),
+}), flush=True)
+
+img = np.full((128, 160, 3), 255, np.uint8)
+img[30:90, 40:44] = 0
+children = []
+for _ in range(3):
+    pid = os.fork()
+    if pid == 0:
+        direct = get_segmentation_model().predict(img)
+        batched = get_segmentation_batcher().predict(img)
+        rss, private = memory_mb()
+        print(json.dumps({
+            "rss_mb": rss,
+            "private_mb": private,
+            "reused": get_segmentation_model() is model,
+            "threads": torch.get_num_threads(),
+            "batched_equal": bool(np.array_equal(direct, batched)),
+        }), flush=True)
+        os._exit(0)
+    children.append(pid)
+for pid in children:
+    _, status = os.waitpid(pid, 0)
+    assert status == 0, status
+"""
+
+
+def test_preloaded_model_is_shared_across_forked_workers(tmp_path: Path):
+    from worker.weight_store import get_weight_store
+
+    torch.manual_seed(0)
+    model = smp.DeepLabV3Plus(encoder_name="resnet34", encoder_weights=None, classes=4, activation=None)
+    get_weight_store(tmp_path).register("fork-test", model.state_dict())
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "IMAGE_DXF_SEG_WEIGHTS_DIR": str(tmp_path),
+        "IMAGE_DXF_SEG_WEIGHTS": "fork-test",
+        "IMAGE_DXF_SEG_THREADS": "2",
+    }
+    proc = subprocess.run(
+        [sys.executable, "-c", _PARENT], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert proc.returncode == 0, proc.stderr
+    rows = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+    parent, workers = rows[0], rows[1:]
+
+    assert parent["shared"] and parent["weights_mb"] > 50
+    assert len(workers) == 3
+    for w in workers:
+        assert w["reused"] and w["batched_equal"] and w["threads"] == 2
+        # The weights are mapped into every worker, but none of them owns a copy:
+        # private memory is the worker's own heap and activations (a worker that
+        # builds or copies the model instead lands well above the weight size).
+        assert w["rss_mb"] > parent["weights_mb"]
+        assert w["private_mb"] < parent["weights_mb"], w
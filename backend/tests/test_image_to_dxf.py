@@ -32,3 +32,343 @@ def test_image_to_dxf_creates_lines(tmp_path: Path):
     line_count = len(list(msp.query("LINE")))
     assert 1 <= line_count <= 64
 
+
+
+def test_component_filter_banded_matches_whole_image():
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    from worker.image_to_dxf import _remove_small_and_thin_components
+
+    rng = np.random.default_rng(0)
+    mask = np.zeros((300, 400), np.uint8)
+    cv2.rectangle(mask, (20, 20), (380, 280), 255, 6)
+    cv2.line(mask, (40, 150), (360, 151), 255, 2)
+    for x, y in rng.integers(0, 300, (200, 2)):
+        if abs(int(y) - 151) < 10:
+            continue
+        cv2.circle(mask, (int(x), int(y)), int(rng.integers(1, 6)), 255, -1)
+
+    whole = _remove_small_and_thin_components(mask, min_area=50, thin_px=4, long_px=250)
+    assert whole[20, 200] == 255
+    assert whole[151, 200] == 0
+    for band_rows in (1, 17, 64):
+        banded = _remove_small_and_thin_components(mask, min_area=50, thin_px=4, long_px=250, band_rows=band_rows)
+        assert np.array_equal(banded, whole)
+
+
+def test_parallel_ladder_selects_same_rung_as_sequential(monkeypatch):
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    from worker.image_to_dxf import _default_detect_params, _run_detection_ladder
+
+    gray = np.full((240, 320), 255, np.uint8)
+    cv2.rectangle(gray, (40, 40), (280, 200), 0, 3)
+    monkeypatch.setenv("IMAGE_DXF_MIN_RAW_LINES", "1000")
+
+    monkeypatch.setenv("IMAGE_DXF_PARALLEL_LADDER", "0")
+    seq, seq_runs = _run_detection_ladder(gray, params=_default_detect_params())
+    monkeypatch.setenv("IMAGE_DXF_PARALLEL_LADDER", "1")
+    par, par_runs = _run_detection_ladder(gray, params=_default_detect_params())
+
+    assert par.name == seq.name
+    assert par.raw_count == seq.raw_count
+    assert {r.name for r in par_runs} == {"default", "aggressive", "strict"}
+    assert {r.name for r in seq_runs} == {"default", "aggressive"}
+    assert all(r.elapsed_ms >= 0.0 for r in par_runs)
+
+
+def test_stage_graph_shares_intermediates_within_conversion(tmp_path: Path):
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import image_to_dxf
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+    dxf_path = tmp_path / "static" / "engineering" / "sessions" / "s1" / "room.dxf"
+
+    ctx = ImageContext.from_path(png_path)
+    image_to_dxf(dxf_path=dxf_path, image=ctx)
+
+    graph = ctx.graph
+    records = graph.records()
+    assert len({(r.stage, r.key) for r in records}) == len(records)
+    decode = [r for r in records if r.stage == "decode"]
+    assert len(decode) == 1
+    assert any(r.stage == "blur" and r.hits >= 1 for r in records)
+    assert {"gray", "threshold", "canny", "hough", "emit"} <= set(graph.stage_totals())
+
+
+def test_stage_graph_waiters_see_the_latest_attempt_not_stale_errors_or_cancels():
+    import threading
+    import time
+
+    from worker.stages import StageCancelled, StageGraph, cancel_scope
+
+    graph = StageGraph()
+    started, release = threading.Event(), threading.Event()
+    results: dict[str, object] = {}
+
+    def slow(value):
+        def fn():
+            started.set()
+            release.wait(5)
+            return value
+
+        return fn
+
+    def call(name, fn, scope=None):
+        try:
+            if scope is None:
+                results[name] = graph.run("mask", (), fn)
+            else:
+                with cancel_scope(scope):
+                    results[name] = graph.run("mask", (), fn)
+        except BaseException as e:
+            results[name] = e
+
+    def fail():
+        raise ValueError("first attempt")
+
+    # A failed attempt is not replayed to the waiters of a recompute that succeeds.
+    with pytest.raises(ValueError):
+        graph.run("mask", (), fail)
+    owner = threading.Thread(target=call, args=("owner", slow("ok")))
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=call, args=("waiter", lambda: "waiter"))
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == {"owner": "ok", "waiter": "ok"}
+
+    # A cancelled owner (here in a nested stage) raises; a waiter outside its scope computes the node itself.
+    graph.evict(("mask",))
+    started.clear()
+    release.clear()
+    cancel = threading.Event()
+
+    def nested():
+        started.set()
+        release.wait(5)
+        return graph.run("gray", (), lambda: "gray")
+
+    owner = threading.Thread(target=call, args=("owner", nested, cancel))
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=call, args=("waiter", lambda: "recomputed"))
+    waiter.start()
+    time.sleep(0.05)
+    cancel.set()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert isinstance(results["owner"], StageCancelled) and results["waiter"] == "recomputed"
+    assert graph.run("mask", (), fail) == "recomputed"
+
+
+def test_convert_image_to_dxf_decodes_source_once(tmp_path: Path, monkeypatch):
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    from worker.image_to_dxf import convert_image_to_dxf
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+    dxf_path = tmp_path / "static" / "engineering" / "sessions" / "s1" / "room.dxf"
+
+    calls = []
+    real_imread = cv2.imread
+    monkeypatch.setattr(cv2, "imread", lambda *a, **k: calls.append(a[0]) or real_imread(*a, **k))
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "0")
+    convert_image_to_dxf(png_path, dxf_path)
+
+    assert calls == [str(png_path)]
+    assert dxf_path.exists()
+
+
+def test_convert_image_to_dxf_validates_in_memory(tmp_path: Path, monkeypatch):
+    try:
+        import cv2
+        import ezdxf
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy/ezdxf not available")
+
+    from worker.image_to_dxf import convert_image_to_dxf
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+    dxf_path = tmp_path / "static" / "engineering" / "sessions" / "s1" / "room.dxf"
+
+    def _no_readfile(*_a, **_k):
+        raise AssertionError("DXF was re-read from disk")
+
+    monkeypatch.setattr(ezdxf, "readfile", _no_readfile)
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "0")
+    result = convert_image_to_dxf(png_path, dxf_path)
+
+    assert Path(result) == dxf_path and dxf_path.exists()
+    assert result.segments("WALL") >= 4
+    assert result.layer_entities["WALL"] == len(result.doc.modelspace().query('*[layer=="WALL"]'))
+    x0, y0, x1, y1 = result.bounds
+    assert 0.0 <= x0 < x1 <= 320 * 10.0 and 0.0 <= y0 < y1 <= 240 * 10.0
+    assert {"decode", "hough", "emit"} <= set(result.timings_ms)
+
+
+def test_debug_artifacts_are_opt_in_and_reuse_pipeline_edges(tmp_path: Path, monkeypatch):
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    from worker.debug_artifacts import get_debug_writer
+    from worker.image_to_dxf import convert_image_to_dxf
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "0")
+    monkeypatch.delenv("IMAGE_DXF_DEBUG_ARTIFACTS", raising=False)
+    monkeypatch.delenv("IMAGE_DXF_DEBUG_SAMPLE_RATE", raising=False)
+
+    off = convert_image_to_dxf(png_path, tmp_path / "static" / "engineering" / "sessions" / "off" / "a.dxf")
+    assert off.debug_artifacts == []
+    assert not (tmp_path / "static" / "debug" / "off").exists()
+
+    on = convert_image_to_dxf(png_path, tmp_path / "static" / "engineering" / "sessions" / "on" / "a.dxf", debug=True)
+    assert [p.name for p in on.debug_artifacts] == [
+        "debug_step1_gray.png",
+        "debug_step2_ai_mask.png",
+        "debug_step3_opencv_edges.png",
+    ]
+    assert get_debug_writer().flush(timeout=30)
+    edges = cv2.imread(str(on.debug_artifacts[2]), cv2.IMREAD_GRAYSCALE)
+    assert np.array_equal(edges, on.intermediates["edges"])
+
+
+def test_debug_writer_keeps_a_path_pending_until_its_last_queued_write(tmp_path: Path, monkeypatch):
+    try:
+        import cv2
+        import numpy as np
+    except Exception:
+        pytest.skip("opencv/numpy not available")
+
+    import threading
+    import time
+
+    from worker.debug_artifacts import DebugArtifactWriter
+
+    gate = threading.Semaphore(0)
+    imwrite = cv2.imwrite
+
+    def gated_imwrite(path, image):
+        gate.acquire()
+        return imwrite(path, image)
+
+    monkeypatch.setattr(cv2, "imwrite", gated_imwrite)
+    writer = DebugArtifactWriter()
+    path = tmp_path / "debug_step1_gray.png"
+    assert writer.submit(path, np.zeros((8, 8), np.uint8)) and writer.submit(path, np.full((8, 8), 255, np.uint8))
+
+    gate.release()
+    deadline = time.monotonic() + 10
+    while writer.written < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.written == 1 and writer.is_pending(path) and not writer.flush(timeout=0.05)
+
+    gate.release()
+    assert writer.flush(timeout=10) and not writer.is_pending(path)
+    assert cv2.imread(str(path), cv2.IMREAD_GRAYSCALE).min() == 255
+
+
+def _plan_class_map():
+    import cv2
+    import numpy as np
+
+    full = np.zeros((800, 1200), np.uint8)
+    cv2.rectangle(full, (100, 100), (1100, 700), 1, 16)
+    cv2.line(full, (600, 100), (600, 700), 1, 12)
+    full[92:108, 300:420] = 2
+    full[400:480, 1092:1108] = 3
+    small = cv2.resize(full, (300, 200), interpolation=cv2.INTER_NEAREST)
+    return small, cv2.resize(small, (1200, 800), interpolation=cv2.INTER_NEAREST)
+
+
+def test_native_grid_emission_matches_upsampled_class_map(tmp_path: Path):
+    pytest.importorskip("cv2")
+    pytest.importorskip("ezdxf")
+
+    from worker.image_to_dxf import _dxf_from_class_map
+
+    small, upsampled = _plan_class_map()
+    ref = _dxf_from_class_map(class_map=upsampled, h=800, w=1200, mm_per_px=10.0, out_path=tmp_path / "full.dxf")
+    native = _dxf_from_class_map(class_map=small, h=800, w=1200, mm_per_px=10.0, out_path=tmp_path / "native.dxf")
+
+    assert native.layer_entities == ref.layer_entities
+    assert native.layer_segments == ref.layer_segments
+    # Vertices are placed within half an inference cell (4 source px here) of the upsampled result.
+    for a, b in zip(native.bounds, ref.bounds):
+        assert abs(a - b) <= 2 * 10.0
+    windows = list(native.doc.modelspace().query('INSERT[layer=="WINDOW"]'))
+    assert len(windows) == 1 and windows[0].dxf.xscale == pytest.approx(120 * 10.0, abs=40.0)
+
+
+def test_convert_on_native_grid_upsamples_only_for_debug(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+
+    import worker.segmentation as seg
+    from worker.debug_artifacts import get_debug_writer
+    from worker.image_to_dxf import convert_image_to_dxf
+
+    small, upsampled = _plan_class_map()
+    png_path = tmp_path / "plan.png"
+    cv2.imwrite(str(png_path), np.where(upsampled == 1, 0, 255).astype(np.uint8))
+    calls = []
+
+    class _Model:
+        def predict(self, image, *, native=False):
+            calls.append(native)
+            return small.copy() if native else upsampled.copy()
+
+    monkeypatch.setattr(seg, "get_segmentation_model", lambda **_k: _Model())
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "1")
+    monkeypatch.setenv("IMAGE_DXF_SEG_NATIVE_GRID", "1")
+    monkeypatch.setenv("IMAGE_DXF_CLASSMAP_CACHE", "0")
+    monkeypatch.delenv("IMAGE_DXF_SEG_BATCHING", raising=False)
+
+    out_dir = tmp_path / "static" / "engineering" / "sessions"
+    result = convert_image_to_dxf(png_path, out_dir / "s1" / "plan.dxf", debug=True)
+
+    assert calls == [True]
+    assert "hough" not in result.timings_ms and result.segments("WALL") >= 4
+    assert result.image_shape == (800, 1200)
+    assert get_debug_writer().flush(timeout=30)
+    mask = cv2.imread(str(result.debug_artifacts[1]), cv2.IMREAD_GRAYSCALE)
+    assert mask.shape == (800, 1200) and np.array_equal(mask > 0, upsampled == 1)
@@ -37,7 +37,9 @@ def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TestClient:
 def test_upload_image_converts_to_dxf_and_returns_svg(client: TestClient):
     png_path = _ensure_test_png()
     with open(png_path, "rb") as f:
-        resp = client.post("/api/v1/engineering/upload/image", files={"file": (png_path.name, f, "image/png")})
+        resp = client.post(
+            "/api/v1/engineering/upload/image?debug=true", files={"file": (png_path.name, f, "image/png")}
+        )
 
     assert resp.status_code == 200, resp.text
     data = resp.json()
@@ -56,6 +58,9 @@ def test_upload_image_converts_to_dxf_and_returns_svg(client: TestClient):
     assert dxf_path.exists()
     assert dxf_path.suffix.lower() == ".dxf"
     debug_dir = dxf_path.parents[3] / "debug" / data["session_id"]
+    from worker.debug_artifacts import get_debug_writer
+
+    assert get_debug_writer().flush(timeout=30)
     for name in ("debug_step1_gray.png", "debug_step2_ai_mask.png", "debug_step3_opencv_edges.png"):
         assert (debug_dir / name).exists()
 
@@ -74,3 +79,73 @@ def test_upload_image_converts_to_dxf_and_returns_svg(client: TestClient):
                 if bool(getattr(e, "closed", False)) and len(pts) >= 3:
                     seg_count += 1
     assert seg_count >= 4
+
+
+def test_upload_same_image_twice_hits_conversion_cache(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    import cv2
+
+    def _no_reread(*_a, **_k):
+        raise AssertionError("upload read back from disk")
+
+    # The upload is converted from the bytes already in memory.
+    monkeypatch.setattr(cv2, "imread", _no_reread)
+    png_path = _ensure_test_png()
+    first = client.post(
+        "/api/v1/engineering/upload/image", files={"file": (png_path.name, png_path.read_bytes(), "image/png")}
+    )
+    second = client.post(
+        "/api/v1/engineering/upload/image", files={"file": (png_path.name, png_path.read_bytes(), "image/png")}
+    )
+    assert first.status_code == 200 and second.status_code == 200, (first.text, second.text)
+    a, b = first.json(), second.json()
+    assert a["cached"] is False and b["cached"] is True
+    assert a["session_id"] != b["session_id"]
+    assert b["svg_preview"] == a["svg_preview"]
+    assert b["debug_images"] == []
+    assert Path(b["dxf_file_path"]).read_bytes() == Path(a["dxf_file_path"]).read_bytes()
+
+    stats = client.get("/api/v1/engineering/upload/image/cache").json()
+    assert stats["enabled"] and stats["hits"] == 1 and stats["misses"] == 1 and stats["stores"] == 1
+
+
+def test_opencv_stand_in_for_failed_segmentation_is_not_cached(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    import worker.image_to_dxf as m
+
+    def _overloaded(*_a, **_k):
+        raise RuntimeError("segmentation queue full")
+
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "1")
+    monkeypatch.setattr(m, "_segment", _overloaded)
+    png_path = _ensure_test_png()
+    for _ in range(2):
+        resp = client.post(
+            "/api/v1/engineering/upload/image", files={"file": (png_path.name, png_path.read_bytes(), "image/png")}
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["cached"] is False
+
+    stats = client.get("/api/v1/engineering/upload/image/cache").json()
+    assert stats["stores"] == 0 and stats["misses"] == 2
+
+
+def test_segmentation_model_status_endpoint(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    import worker.segmentation as seg
+    import worker.speculative as spec
+
+    registry = seg.SegmentationModelRegistry()
+    monkeypatch.setattr(seg, "get_model_registry", lambda: registry)
+    monkeypatch.setattr(spec, "_stats", None)
+    assert client.get("/api/v1/engineering/upload/image/model").json() == {
+        "ready": False,
+        "models": [],
+        "batching": None,
+        "speculation": None,
+    }
+
+    monkeypatch.setattr(seg, "LocalSegmentationModel", lambda **_k: SimpleNamespace(device="cpu"))
+    registry.get()
+    data = client.get("/api/v1/engineering/upload/image/model").json()
+    assert data["ready"] is True
+    assert data["models"][0]["model"] == seg.model_version() and data["models"][0]["state"] == "ready"
@@ -0,0 +1,47 @@
+import pytest
+
+
+def _random_segments(n: int, seed: int):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 600, n)
+    y = rng.uniform(0, 600, n)
+    length = rng.uniform(5, 150, n)
+    base = np.where(rng.random(n) < 0.5, 0.0, 90.0)
+    ang = np.where(rng.random(n) < 0.9, base + rng.normal(0, 2, n), rng.uniform(0, 180, n))
+    t = np.radians(ang)
+    segs = np.stack([x, y, x + length * np.cos(t), y + length * np.sin(t)], axis=1)
+    return np.round(segs).astype(np.int32).reshape(-1, 1, 4)
+
+
+@pytest.mark.parametrize(
+    "kw",
+    [
+        dict(angle_tol_deg=5.0, dist_tol_px=10.0, gap_tol_px=25.0, min_len_px=10.0),
+        dict(angle_tol_deg=20.0, dist_tol_px=4.0, gap_tol_px=40.0, min_len_px=3.0),
+        dict(angle_tol_deg=60.0, dist_tol_px=10.0, gap_tol_px=5.0, min_len_px=10.0),
+    ],
+)
+def test_bucketed_merge_matches_pairwise(kw):
+    np = pytest.importorskip("numpy")
+
+    from worker.image_to_dxf import _merge_lines_pairwise
+    from worker.line_merge import merge_lines_bucketed
+
+    for seed in range(3):
+        lines = _random_segments(250, seed)
+        ref = _merge_lines_pairwise(lines, **kw)
+        out = merge_lines_bucketed(lines, **kw)
+        assert out.shape == ref.shape
+        assert np.allclose(out, ref, atol=1e-6)
+
+
+def test_label_pairs_uses_smallest_member_as_label():
+    np = pytest.importorskip("numpy")
+
+    from worker.line_merge import label_pairs
+
+    labels = label_pairs(7, [5, 3, 6], [3, 1, 4])
+    assert labels.tolist() == [0, 1, 2, 1, 4, 1, 4]
+    assert np.array_equal(label_pairs(3, [], []), np.arange(3))
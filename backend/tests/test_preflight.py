@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+
+def test_preflight_rejects_hopeless_inputs_and_routes_the_rest():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.preflight import PreflightLimits, assess
+
+    limits = PreflightLimits()
+    plan = np.full((1200, 1600), 255, np.uint8)
+    cv2.rectangle(plan, (200, 200), (1400, 1000), 0, 6)
+    cv2.line(plan, (800, 200), (800, 1000), 0, 6)
+
+    ok = assess(plan, limits)
+    assert ok.verdict == "ok" and ok.reason is None
+    assert ok.scale == 4 and max(ok.thumb_shape) <= limits.max_side
+    assert ok.straightness > 0.9 and ok.line_density == pytest.approx(ok.foreground, rel=0.1)
+    assert (ok.path, ok.rung) == ("opencv", "default")
+
+    blank = np.full((1200, 1600), 250, np.uint8)
+    speck = blank.copy()
+    speck[600:604, 800:804] = 0
+    noise = np.random.default_rng(0).integers(0, 256, (600, 800), np.uint8)
+    smudge = cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 20), None, 0, 255, cv2.NORM_MINMAX) // 8 + 100
+    for img in (blank, speck, smudge):
+        assert assess(img, limits).rejected
+
+    # A diagonal drawing: accepted, but left to segmentation; a page mostly covered in ink starts strict.
+    diag = np.full((600, 800), 255, np.uint8)
+    for k in range(6):
+        cv2.line(diag, (50 + 100 * k, 550), (250 + 100 * k, 50), 0, 2)
+    slanted = assess(diag, limits)
+    assert (slanted.verdict, slanted.path) == ("ok", "ml")
+    inked = np.full((600, 800), 255, np.uint8)
+    inked[:, :350] = 0
+    cv2.rectangle(inked, (400, 100), (750, 500), 0, 4)
+    assert assess(inked, limits).rung == "strict"
+
+    # Hairlines on a large clean scan keep their full contrast in the thumbnail.
+    large = np.full((7000, 10000), 255, np.uint8)
+    for x in range(500, 9600, 900):
+        cv2.line(large, (x, 500), (x, 6500), 0, 1)
+    for y in range(500, 6600, 900):
+        cv2.line(large, (500, y), (9500, y), 0, 1)
+    big = assess(large, limits)
+    assert big.verdict == "ok" and big.scale == 20 and big.contrast > 200
+
+    report = assess(plan, limits).as_dict()
+    assert report["verdict"] == "ok" and isinstance(report["thumb_shape"], list)
+
+
+def test_convert_rejects_before_segmentation_and_records_the_preflight(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    import worker.image_to_dxf as m
+    from worker.batch import convert_one
+
+    def _no_segment(*_a, **_k):
+        raise AssertionError("segmentation ran")
+
+    monkeypatch.setattr(m, "_segment", _no_segment)
+    monkeypatch.setenv("IMAGE_DXF_PREFLIGHT", "1")
+
+    blank = tmp_path / "blank.png"
+    cv2.imwrite(str(blank), np.full((240, 320, 3), 255, np.uint8))
+    with pytest.raises(m.ImageRejectedError) as info:
+        m.convert_image_to_dxf(blank, tmp_path / "blank.dxf")
+    assert isinstance(info.value, m.ImageClarityError)
+    assert info.value.preflight["verdict"] == "reject" and info.value.preflight["contrast"] == 0.0
+
+    record = convert_one(str(blank), str(tmp_path / "blank2.dxf"))
+    assert record["status"] == "unclear" and record["preflight"]["reason"] == str(info.value)
+
+    # Routing sends a clean rectilinear drawing straight to OpenCV.
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 3)
+    room = tmp_path / "room.png"
+    cv2.imwrite(str(room), img)
+    monkeypatch.setenv("IMAGE_DXF_PREFLIGHT_ROUTE", "1")
+    result = m.convert_image_to_dxf(room, tmp_path / "room.dxf")
+    assert result.preflight["path"] == "opencv"
+    assert result.wall_segments() >= 4 and "preflight" in result.timings_ms
+
+    # Without the gate a blank page runs the whole ladder and its contour fallback traces the page.
+    monkeypatch.setenv("IMAGE_DXF_PREFLIGHT", "0")
+    monkeypatch.setenv("IMAGE_DXF_USE_LOCAL_SEG", "0")
+    ungated = m.convert_image_to_dxf(blank, tmp_path / "blank3.dxf")
+    assert ungated.preflight is None and "preflight" not in ungated.timings_ms
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+
+def test_refine_segment_snaps_a_coarse_candidate_onto_the_full_resolution_face():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.pyramid import downsample, refine_segment, to_full_resolution
+
+    gray = np.full((200, 400), 255, np.uint8)
+    gray[100:110, 50:351] = 0  # faces at y = 99.5 / 109.5, ends at x = 49.5 / 350.5
+
+    small = downsample(gray, 3)
+    assert small.shape == (66, 133)
+    assert to_full_resolution(np.array([[0, 0, 1, 1]]), 3).tolist() == [[1.0, 1.0, 4.0, 4.0]]
+
+    # A candidate one coarse pixel off the upper face, short of both ends and slightly tilted.
+    seg = refine_segment(gray, np.array([56.0, 97.0, 344.0, 98.5]), band=3, blur_kernel=3, canny_low=25, canny_high=75)
+    x1, y1, x2, y2 = seg
+    assert abs(y1 - y2) < 0.5 and 98.0 <= (y1 + y2) / 2 <= 101.0
+    assert abs(x1 - 50) <= 2.0 and abs(x2 - 350) <= 2.0
+
+    # Nothing at full resolution near it: the candidate is kept as it is.
+    lone = np.array([60.0, 30.0, 300.0, 30.0])
+    assert refine_segment(gray, lone, band=3, blur_kernel=3, canny_low=25, canny_high=75).tolist() == lone.tolist()
+
+
+def test_pyramid_detection_matches_full_resolution_walls(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import image_to_dxf
+
+    img = np.full((600, 840), 255, np.uint8)
+    cv2.rectangle(img, (10, 10), (830, 590), 0, 3)  # drawing frame
+    cv2.rectangle(img, (80, 80), (760, 520), 0, 14)
+    cv2.line(img, (420, 80), (420, 520), 0, 14)
+    cv2.line(img, (80, 300), (420, 300), 0, 14)
+    png = tmp_path / "plan.png"
+    cv2.imwrite(str(png), img)
+
+    monkeypatch.setenv("IMAGE_DXF_PYRAMID_MIN_MPX", "0")
+    walls = {}
+    for factor in (1, 2):
+        monkeypatch.setenv("IMAGE_DXF_PYRAMID", str(factor))
+        ctx = ImageContext.from_path(png)
+        result = image_to_dxf(dxf_path=tmp_path / f"p{factor}.dxf", image=ctx)
+        walls[factor] = np.array(
+            [(*e.dxf.start.vec2, *e.dxf.end.vec2) for e in result.doc.modelspace().query("LINE[layer=='WALL']")]
+        )
+        assert ("pyramid" in ctx.graph.stage_totals()) == (factor > 1)
+        # The frame is found on the coarse image and the crop lands on the same walls.
+        assert result.bounds is not None
+
+    def near(seg, others, tol_mm=30.0):
+        a = np.array([seg[:2], (seg[:2] + seg[2:]) / 2, seg[2:]])
+        for o in others:
+            p, q = o[:2], o[2:]
+            d = q - p
+            t = np.clip(((a - p) @ d) / max(1e-9, d @ d), 0.0, 1.0)
+            if np.all(np.hypot(*(a - (p + t[:, None] * d)).T) <= tol_mm):
+                return True
+        return False
+
+    # Every long coarse-to-fine wall lies on a full-resolution one within 3 px (10 mm/px), ends included.
+    full, coarse = walls[1], walls[2]
+    long_coarse = [s for s in coarse if np.hypot(*(s[2:] - s[:2])) > 1500.0]
+    assert len(long_coarse) >= 6
+    assert all(near(s, full) for s in long_coarse)
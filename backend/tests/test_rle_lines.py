@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+
+
+def _plan(cv2, np):
+    img = np.full((400, 560), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (520, 360), 0, 8)
+    cv2.line(img, (300, 40), (300, 360), 0, 4)
+    cv2.line(img, (40, 200), (300, 200), 0, 4)
+    cv2.line(img, (320, 340), (500, 220), 0, 4)
+    return img
+
+
+def test_rle_walls_are_rectangles_and_diagonals_are_left_over():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.rle_lines import axis_wall_rects, rle_wall_lines
+
+    mask = np.zeros((120, 200), np.uint8)
+    mask[20:28, 10:190] = 255
+    mask[19, 60:120] = 255  # ragged edge row: folded into the wall, not a wall of its own
+    mask[28:100, 150:153] = 255
+    cv2.line(mask, (20, 110), (120, 40), 255, 2)
+
+    horizontal, vertical = axis_wall_rects(mask, min_len=25)
+    assert [10, 190, 20, 28] in horizontal.tolist()
+    assert len(horizontal) == 1
+    assert vertical.tolist() == [[150, 153, 20, 100]]
+
+    segs, leftover = rle_wall_lines(mask, min_len=25)
+    assert segs.shape[1:] == (1, 4) and segs.dtype == np.int32
+    assert {tuple(s) for s in segs.reshape(-1, 4).tolist()} >= {(10, 20, 189, 20), (10, 27, 189, 27), (150, 20, 150, 99)}
+    # Only the diagonal (minus where it crosses the wall) is left for Hough.
+    diagonal = cv2.line(np.zeros_like(mask), (20, 110), (120, 40), 255, 2)
+    assert not (leftover & ~diagonal).any()
+    assert np.count_nonzero(leftover[30:]) == np.count_nonzero(diagonal[30:])
+
+
+def test_rle_engine_emits_the_same_walls_as_hough(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import image_to_dxf
+
+    png = tmp_path / "plan.png"
+    cv2.imwrite(str(png), _plan(cv2, np))
+
+    # The outer wall would otherwise be taken for a drawing frame and cropped away.
+    monkeypatch.setenv("IMAGE_DXF_CROP_FRAME", "0")
+    walls = {}
+    for engine in ("hough", "rle"):
+        monkeypatch.setenv("IMAGE_DXF_LINE_ENGINE", engine)
+        ctx = ImageContext.from_path(png)
+        result = image_to_dxf(dxf_path=tmp_path / f"{engine}.dxf", image=ctx)
+        walls[engine] = np.array(
+            [(*e.dxf.start.vec2, *e.dxf.end.vec2) for e in result.doc.modelspace().query("LINE[layer=='WALL']")]
+        )
+        assert ("rle" in ctx.graph.stage_totals()) == (engine == "rle")
+
+    hough, rle = walls["hough"], walls["rle"]
+    assert len(rle) == len(hough)
+
+    def near(seg, others, tol_mm=120.0):
+        a = np.array([seg[:2], (seg[:2] + seg[2:]) / 2, seg[2:]])
+        for o in others:
+            p, q = o[:2], o[2:]
+            d = q - p
+            t = np.clip(((a - p) @ d) / max(1e-9, d @ d), 0.0, 1.0)
+            if np.all(np.hypot(*(a - (p + t[:, None] * d)).T) <= tol_mm):
+                return True
+        return False
+
+    # Every wall is matched within a wall thickness (10 mm/px); the run-length walls reach
+    # through T-junctions where Hough's edges stop at the crossing wall's face.
+    long_rle = [s for s in rle if np.hypot(*(s[2:] - s[:2])) > 1000.0]
+    assert len(long_rle) == 7  # six axis-aligned walls from the runs, the diagonal from Hough
+    assert all(near(s, hough) for s in long_rle)
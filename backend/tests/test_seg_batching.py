@@ -0,0 +1,112 @@
+import threading
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+class _FakeModel:
+    """prepare/infer/restore stand-in: each request is (h, w, value) and infers to its value."""
+
+    def __init__(self, gate: threading.Event | None = None):
+        self.batches = []
+        self.gate = gate
+
+    def prepare(self, image):
+        h, w, value = image
+        return torch.full((1, 3, h, w), float(value)), (h, w)
+
+    def infer(self, x):
+        if self.gate is not None:
+            self.gate.wait(timeout=10)
+        self.batches.append(tuple(x.shape))
+        return x[:, 0].numpy().astype(np.int64)
+
+    def restore(self, class_map_small, size):
+        assert class_map_small.shape == size
+        return class_map_small.astype(np.uint8)
+
+
+def _predict_concurrently(batcher, images):
+    out = [None] * len(images)
+
+    def _one(i):
+        out[i] = batcher.predict(images[i], timeout=10)
+
+    threads = [threading.Thread(target=_one, args=(i,)) for i in range(len(images))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def test_batcher_groups_by_bucket_and_scatters_cropped_maps():
+    from worker.seg_batching import SegmentationBatcher
+
+    model = _FakeModel()
+    batcher = SegmentationBatcher(model, max_batch=4, max_wait_ms=500, bucket=32)
+    images = [(64, 64, 1), (50, 64, 2), (64, 40, 3), (20, 20, 4), (64, 64, 5), (64, 64, 6)]
+    try:
+        out = _predict_concurrently(batcher, images)
+    finally:
+        batcher.close()
+
+    for (h, w, value), m in zip(images, out):
+        assert m.shape == (h, w) and np.all(m == value)
+    assert sorted(model.batches) == [(1, 3, 32, 32), (1, 3, 64, 64), (4, 3, 64, 64)]
+    stats = batcher.stats()
+    assert stats["requests"] == 6 and stats["batches"] == 3 and stats["mean_batch_size"] == 2.0
+    assert stats["queue_depth"] == 0
+
+
+def test_batcher_rejects_when_queue_is_full():
+    from worker.seg_batching import SegmentationBatcher, SegmentationQueueFull
+
+    gate = threading.Event()
+    batcher = SegmentationBatcher(_FakeModel(gate), max_batch=1, max_wait_ms=0, max_queue=1)
+    try:
+        first = batcher.submit((32, 32, 1))
+        for _ in range(200):
+            if batcher.stats()["queue_depth"] == 0:
+                break
+            threading.Event().wait(0.01)
+        second = batcher.submit((32, 32, 2))
+        with pytest.raises(SegmentationQueueFull):
+            batcher.submit((32, 32, 3))
+        gate.set()
+        assert int(first.result(timeout=10)[0, 0]) == 1
+        assert int(second.result(timeout=10)[0, 0]) == 2
+        assert batcher.stats()["rejected"] == 1
+    finally:
+        gate.set()
+        batcher.close()
+
+
+def test_batched_class_maps_match_single_predict():
+    pytest.importorskip("segmentation_models_pytorch")
+    import cv2
+
+    from worker.seg_batching import SegmentationBatcher
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    model = LocalSegmentationModel(device="cpu", config=SegmentationConfig(max_side=64, encoder_weights=None))
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(3):
+        img = np.full((128, 128, 3), 255, np.uint8)
+        x0, y0 = (int(v) for v in rng.integers(5, 40, 2))
+        cv2.rectangle(img, (x0, y0), (120 - x0 // 2, 120 - y0 // 2), (0, 0, 0), 3)
+        images.append(img)
+
+    batcher = SegmentationBatcher(model, max_batch=3, max_wait_ms=500, bucket=32)
+    try:
+        out = _predict_concurrently(batcher, images)
+    finally:
+        batcher.close()
+    assert batcher.stats()["batches"] == 1
+    for img, m in zip(images, out):
+        ref = model.predict(img)
+        assert m.shape == ref.shape
+        assert float(np.mean(m == ref)) >= 0.999
@@ -0,0 +1,208 @@
+from pathlib import Path
+
+import pytest
+
+
+def test_predict_accepts_path_array_and_image_context(tmp_path: Path):
+    pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+    import cv2
+    import numpy as np
+
+    from worker.image_context import ImageContext
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    img = np.full((96, 128, 3), 255, np.uint8)
+    cv2.rectangle(img, (10, 10), (110, 80), (0, 0, 0), 3)
+    png_path = tmp_path / "room.png"
+    cv2.imwrite(str(png_path), img)
+
+    model = LocalSegmentationModel(device="cpu", config=SegmentationConfig(max_side=64, encoder_weights=None))
+    ref = model.predict(png_path)
+    assert ref.shape == (96, 128)
+    assert np.array_equal(model.predict(img), ref)
+    assert np.array_equal(model.predict(ImageContext.from_path(png_path)), ref)
+
+
+def test_model_registry_builds_once_and_backs_off_after_failure(monkeypatch):
+    import threading
+
+    import worker.segmentation as seg
+
+    built = []
+
+    class _FakeModel:
+        def __init__(self, *, device=None, config=None):
+            built.append(config)
+            if config.num_classes == 99:
+                raise RuntimeError("weights unavailable")
+            self.device = device or "cpu"
+
+    monkeypatch.setattr(seg, "LocalSegmentationModel", _FakeModel)
+    registry = seg.SegmentationModelRegistry(retry_after_s=3600)
+
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1 and all(m is got[0] for m in got)
+
+    broken = seg.SegmentationConfig(num_classes=99)
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="weights unavailable"):
+            registry.get(config=broken)
+    assert len(built) == 2
+
+    states = {s["model"]: s for s in registry.status()}
+    assert states[seg.model_version()]["state"] == "ready"
+    assert states[seg.model_version()]["load_ms"] is not None
+    assert states[seg.model_version(broken)]["state"] == "failed"
+    assert states[seg.model_version(broken)]["error"] == "weights unavailable"
+
+
+def test_model_registry_warm_up_runs_a_forward_pass():
+    pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+
+    from worker.segmentation import SegmentationConfig, SegmentationModelRegistry
+
+    registry = SegmentationModelRegistry()
+    config = SegmentationConfig(max_side=64, encoder_weights=None)
+    status = registry.warm_up(device="cpu", config=config)
+    assert status.state == "ready" and status.device == "cpu"
+    assert status.warmup_ms is not None
+    assert registry.get(device="cpu", config=config) is registry.get(device="cpu", config=config)
+
+
+@pytest.mark.parametrize(
+    "backend,quantize,min_agreement",
+    # int8 against eager on the same seeded weights: 98.6% of pixels agree for both modes (the map has three classes).
+    [("torchscript", None, 0.999), ("onnx", None, 0.999), ("onnx", "dynamic", 0.98), ("onnx", "static", 0.98)],
+)
+def test_cpu_backends_match_eager_class_maps(backend, quantize, min_agreement):
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+    import cv2
+    import numpy as np
+
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig, model_version
+
+    img = np.full((96, 128, 3), 255, np.uint8)
+    cv2.rectangle(img, (10, 10), (110, 80), (0, 0, 0), 3)
+    cv2.line(img, (60, 10), (60, 80), (0, 0, 0), 2)
+
+    base = dict(max_side=64, encoder_weights=None)
+    torch.manual_seed(0)
+    eager = LocalSegmentationModel(device="cpu", config=SegmentationConfig(**base))
+    torch.manual_seed(0)
+    config = SegmentationConfig(**base, backend=backend, quantize=quantize, threads=1)
+    fast = LocalSegmentationModel(device="cpu", config=config)
+
+    ref = eager.predict(img)
+    out = fast.predict(img)
+    assert out.shape == ref.shape and out.dtype == np.uint8
+    # The threshold only means something if predicting the majority class everywhere would miss it.
+    assert np.bincount(ref.ravel()).max() < 0.9 * ref.size
+    assert float(np.mean(out == ref)) >= min_agreement
+    assert model_version(config) != model_version(SegmentationConfig(**base))
+
+
+def test_quantization_requires_onnx_backend():
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    with pytest.raises(ValueError):
+        LocalSegmentationModel(config=SegmentationConfig(backend="torchscript", quantize="dynamic"))
+    with pytest.raises(ValueError):
+        LocalSegmentationModel(config=SegmentationConfig(backend="tensorrt"))
+
+
+def test_sliding_windows_match_full_resolution_inference():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+    import numpy as np
+
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    # A pointwise network sees no context, so blended windows must reproduce whole-image logits exactly.
+    torch.manual_seed(0)
+    pointwise = torch.nn.Conv2d(3, 4, kernel_size=1).eval()
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (200, 300, 3), dtype=np.uint8)
+
+    full = LocalSegmentationModel(device="cpu", config=SegmentationConfig(max_side=512, encoder_weights=None))
+    full.model = pointwise
+    ref = full.predict(img)
+
+    config = SegmentationConfig(max_side=64, encoder_weights=None, window=64, window_overlap=16, window_batch=3)
+    tiled = LocalSegmentationModel(device="cpu", config=config)
+    tiled.model = pointwise
+    calls = []
+    real_infer = tiled.infer
+    tiled.infer = lambda x, **kw: calls.append(tuple(x.shape)) or real_infer(x, **kw)
+
+    assert tiled.uses_windows(img.shape)
+    out = tiled.predict(img)
+    assert out.shape == (200, 300) and out.dtype == np.uint8
+    assert np.array_equal(out, ref)
+    # 4 window rows x 6 window columns, in batches of 3 within a row.
+    assert calls == [(3, 3, 64, 64)] * 8
+
+    small = np.full((48, 60, 3), 255, np.uint8)
+    assert not tiled.uses_windows(small.shape)
+    assert tiled.predict(small).shape == (48, 60)
+
+
+def test_sliding_windows_on_deeplab_keep_native_resolution():
+    pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+    import cv2
+    import numpy as np
+
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    img = np.full((300, 420, 3), 255, np.uint8)
+    cv2.rectangle(img, (20, 20), (400, 280), (0, 0, 0), 2)
+    config = SegmentationConfig(max_side=128, encoder_weights=None, window=128, window_overlap=32, window_max_side=320)
+    model = LocalSegmentationModel(device="cpu", config=config)
+    out = model.predict(img)
+    assert out.shape == (300, 420)
+    assert int(out.max()) < config.num_classes
+
+
+def test_profiles_select_encoder_and_resolution(monkeypatch):
+    from worker.segmentation import DEFAULT_PROFILE, SEGMENTATION_PROFILES, SegmentationConfig, model_version
+
+    monkeypatch.delenv("IMAGE_DXF_SEG_PROFILE", raising=False)
+    default = SegmentationConfig.from_env()
+    assert (default.encoder_name, default.max_side) == SEGMENTATION_PROFILES[DEFAULT_PROFILE]
+
+    monkeypatch.setenv("IMAGE_DXF_SEG_PROFILE", "mobilenet-512")
+    fast = SegmentationConfig.from_env()
+    assert (fast.encoder_name, fast.max_side) == ("mobilenet_v2", 512)
+    assert fast == SegmentationConfig().with_profile("mobilenet-512")
+    assert model_version(fast) != model_version(default)
+
+    monkeypatch.setenv("IMAGE_DXF_SEG_PROFILE", "no-such-profile")
+    assert SegmentationConfig.from_env() == default
+    with pytest.raises(ValueError):
+        SegmentationConfig().with_profile("no-such-profile")
+
+
+def test_native_predict_returns_the_inference_grid():
+    pytest.importorskip("torch")
+    pytest.importorskip("segmentation_models_pytorch")
+    import numpy as np
+
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig
+
+    img = np.full((96, 128, 3), 255, np.uint8)
+    img[20:24, 10:110] = 0
+    model = LocalSegmentationModel(device="cpu", config=SegmentationConfig(max_side=64, encoder_weights=None))
+    small = model.predict(img, native=True)
+    assert small.shape == (48, 64) and small.dtype == np.uint8
+    assert np.array_equal(model.restore(small, (96, 128)), model.predict(img))
@@ -0,0 +1,116 @@
+import time
+from pathlib import Path
+
+import pytest
+
+
+def _wait_for(cond, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return cond()
+
+
+def test_speculate_cancels_the_fallback_once_the_preferred_path_accepts():
+    from worker.speculative import SpeculationStats, speculate
+    from worker.stages import StageGraph
+
+    graph = StageGraph()
+    steps = []
+
+    def slow_fallback():
+        for i in range(500):
+            graph.run("step", (i,), lambda: steps.append(i) or time.sleep(0.005))
+        return "fallback"
+
+    def preferred(accept):
+        time.sleep(0.05)
+        accept()
+        return "preferred"
+
+    stats = SpeculationStats(preferred="ml", fallback="opencv")
+    abandoned = []
+    result, outcome = speculate(
+        preferred, slow_fallback, rejected=(ValueError,), stats=stats, on_abandoned=abandoned.append
+    )
+    assert result == "preferred" and outcome.winner == "preferred" and outcome.fallback_ms is None
+    assert _wait_for(lambda: stats.fallback_cancelled == 1 and len(abandoned) == 1)
+    assert len(steps) < 100
+
+    # Rejected before accepting: the speculative fallback result is used as it is.
+    def unusable(accept):
+        raise ValueError("mask unusable")
+
+    result, outcome = speculate(unusable, lambda: "opencv result", rejected=(ValueError,), stats=stats)
+    assert result == "opencv result" and outcome.winner == "fallback" and not outcome.fallback_rerun
+
+    # Failing after accepting: the cancelled fallback is run again, once the first run has stopped.
+    emit_graph = StageGraph()
+    runs = []
+
+    def emitting_fallback():
+        start = time.perf_counter()
+        try:
+            for i in range(20):
+                emit_graph.run("emit", (i,), lambda: time.sleep(0.01))
+            return "rerun"
+        finally:
+            runs.append((start, time.perf_counter()))
+
+    def late_failure(accept):
+        time.sleep(0.03)
+        accept()
+        raise ValueError("emit failed")
+
+    result, outcome = speculate(late_failure, emitting_fallback, rejected=(ValueError,), stats=stats)
+    assert result == "rerun" and outcome.fallback_rerun
+    assert len(runs) == 2 and runs[1][0] >= runs[0][1]
+
+    with pytest.raises(KeyError):
+        speculate(lambda accept: {}["missing"], lambda: "x", rejected=(ValueError,))
+
+    snap = stats.stats()
+    assert snap["requests"] == 3 and snap["wins"] == {"ml": 1, "opencv": 2}
+    assert snap["ml_win_rate"] == pytest.approx(1 / 3) and snap["fallback_reruns"] == 1
+
+
+def test_speculative_convert_picks_ml_when_usable_and_opencv_otherwise(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("ezdxf")
+
+    import worker.image_to_dxf as m
+    from worker.speculative import get_speculation_stats
+
+    img = np.full((240, 320, 3), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (280, 200), (0, 0, 0), 5)
+    png = tmp_path / "room.png"
+    cv2.imwrite(str(png), img)
+    walls = (img[..., 0] < 128).astype(np.uint8)
+
+    monkeypatch.setenv("IMAGE_DXF_SPECULATIVE", "1")
+    monkeypatch.setenv("IMAGE_DXF_CLASSMAP_CACHE", "0")
+    before = get_speculation_stats().stats()["wins"]
+
+    monkeypatch.setattr(m, "_segment", lambda ctx, native=False: np.zeros_like(walls))
+    out_path = tmp_path / "opencv" / "room.dxf"
+    result = m.convert_image_to_dxf(png, out_path)
+    assert result.speculation["winner"] == "opencv" and result.speculation["opencv_ms"] is not None
+    assert (result.method, result.fallback) == ("opencv", "unusable") and result.cacheable
+    assert Path(result) == out_path and out_path.exists()
+    assert not (out_path.parent / "room.opencv.dxf").exists()
+    assert result.segments("WALL") >= 4 and "hough" in result.timings_ms
+
+    monkeypatch.setattr(m, "_segment", lambda ctx, native=False: walls)
+    out_path = tmp_path / "ml" / "room.dxf"
+    result = m.convert_image_to_dxf(png, out_path)
+    assert result.speculation["winner"] == "ml" and (result.method, result.fallback) == ("ml", None)
+    assert Path(result) == out_path and out_path.exists()
+    assert result.wall_segments() >= 4 and "edges" not in result.intermediates
+    # The OpenCV side is stopped or finished in the background; its file never survives.
+    assert _wait_for(lambda: not (out_path.parent / "room.opencv.dxf").exists())
+
+    after = get_speculation_stats().stats()["wins"]
+    assert after["ml"] == before["ml"] + 1 and after["opencv"] == before["opencv"] + 1
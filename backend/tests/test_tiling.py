@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import pytest
+
+
+def _plan_image(h: int = 1100, w: int = 1500, seed: int = 0):
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w, 3), 255, np.uint8)
+    cv2.rectangle(img, (60, 60), (w - 60, h - 60), (0, 0, 0), 6)
+    for x in (400, 800, 1150):
+        cv2.line(img, (x, 60), (x, h - 60), (0, 0, 0), 4)
+    for y in (350, 700):
+        cv2.line(img, (60, y), (w - 60, y), (0, 0, 0), 4)
+    cv2.line(img, (200, 900), (1300, 180), (0, 0, 0), 3)
+    for _ in range(300):
+        cv2.circle(img, (int(rng.integers(0, w)), int(rng.integers(0, h))), int(rng.integers(1, 3)), (0, 0, 0), -1)
+    return img
+
+
+def test_otsu_from_histogram_matches_opencv():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.tiling import otsu_threshold_from_hist
+
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        img = np.clip(rng.normal(rng.uniform(60, 200), rng.uniform(10, 60), (120, 90)), 0, 255).astype(np.uint8)
+        img[rng.random(img.shape) < 0.2] = int(rng.integers(0, 255))
+        ref, _ = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        assert otsu_threshold_from_hist(np.bincount(img.ravel(), minlength=256)) == int(ref)
+
+
+@pytest.mark.parametrize("tile,workers,binarize", [(128, 0, True), (200, 2, True), (256, 0, False)])
+def test_tiled_mask_matches_whole_image(tile, workers, binarize, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+
+    from worker.image_to_dxf import _canny_hough_stages, _default_detect_params, _tiled_mask_stage
+    from worker.stages import StageGraph
+    from worker.tiling import tile_plan
+
+    monkeypatch.setenv("IMAGE_DXF_BINARIZE", "1" if binarize else "0")
+    gray = cv2.cvtColor(_plan_image(), cv2.COLOR_BGR2GRAY)
+    params = _default_detect_params()
+    _, ref, _, _ = _canny_hough_stages(gray, params=params, graph=StageGraph(), source=("gray",))
+
+    plan = tile_plan(gray.shape, max_mb=1, overlap=64, workers=workers, tile=tile)
+    _, out = _tiled_mask_stage(
+        StageGraph(),
+        gray,
+        source=("gray",),
+        blur_kernel=params.blur_kernel,
+        morph_close=params.morph_close,
+        morph_kernel=params.morph_kernel,
+        plan=plan,
+        detection=True,
+    )
+    assert plan.band_rows < gray.shape[0]
+    assert np.array_equal(out, ref)
+
+
+def test_tiled_image_to_dxf_matches_untiled(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    ezdxf = pytest.importorskip("ezdxf")
+
+    from worker.image_to_dxf import image_to_dxf
+
+    png_path = tmp_path / "plan.png"
+    cv2.imwrite(str(png_path), _plan_image())
+
+    def wall_lines(path: Path):
+        doc = ezdxf.readfile(str(path))
+        return np.array(
+            [[e.dxf.start.x, e.dxf.start.y, e.dxf.end.x, e.dxf.end.y] for e in doc.modelspace() if e.dxftype() == "LINE"]
+        )
+
+    monkeypatch.setenv("IMAGE_DXF_TILED", "0")
+    image_to_dxf(image_path=png_path, dxf_path=tmp_path / "full.dxf")
+    monkeypatch.setenv("IMAGE_DXF_TILED", "1")
+    monkeypatch.setenv("IMAGE_DXF_TILE_SIZE", "256")
+    image_to_dxf(image_path=png_path, dxf_path=tmp_path / "tiled.dxf")
+    monkeypatch.setenv("IMAGE_DXF_TILE_HOUGH", "tile")
+    result = image_to_dxf(image_path=png_path, dxf_path=tmp_path / "tile_hough.dxf")
+
+    full = wall_lines(tmp_path / "full.dxf")
+    assert len(full) > 0
+    assert np.array_equal(wall_lines(tmp_path / "tiled.dxf"), full)
+
+    tile_hough = wall_lines(tmp_path / "tile_hough.dxf")
+    assert "tiled_hough" in result.timings_ms
+    assert len(tile_hough) == len(full)
+    tol_mm = 3 * 10.0
+    for a, b in ((full, tile_hough), (tile_hough, full)):
+        for seg in a:
+            d = np.minimum(np.abs(b - seg).max(axis=1), np.abs(b - seg[[2, 3, 0, 1]]).max(axis=1))
+            assert d.min() <= tol_mm
+
+
+def test_window_starts_cover_length_and_end_flush():
+    from worker.tiling import window_starts
+
+    assert window_starts(50, 64, 48) == [0]
+    assert window_starts(64, 64, 48) == [0]
+    assert window_starts(200, 64, 48) == [0, 48, 96, 136]
+    for length in (65, 130, 1000):
+        starts = window_starts(length, 64, 48)
+        assert starts[-1] + 64 == length
+        assert all(b - a <= 48 for a, b in zip(starts, starts[1:]))
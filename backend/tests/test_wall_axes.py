@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import pytest
+
+
+def _wall_mask(cv2, np):
+    mask = np.zeros((240, 320), np.uint8)
+    cv2.rectangle(mask, (20, 20), (300, 220), 255, 9)
+    cv2.line(mask, (160, 20), (160, 220), 255, 5)
+    return mask
+
+
+def test_trace_wall_axes_squares_corners_and_measures_thickness():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("skimage")
+
+    from worker.wall_axes import trace_wall_axes
+
+    mask = _wall_mask(cv2, np)
+    axes = trace_wall_axes(mask, eps_px=1.5, min_len_px=20.0)
+    # The partition splits the outer loop at its two T-junctions: two C-shaped halves and the partition itself.
+    assert sorted(a.segment_count for a in axes) == [1, 3, 3]
+
+    outer_px = np.count_nonzero(mask[:120, 90])  # thickness of the outer wall as drawn
+    inner_px = np.count_nonzero(mask[120, 140:180])
+    for a in axes:
+        expected = inner_px if a.segment_count == 1 else outer_px
+        assert np.allclose(a.thickness, expected, atol=1.0)
+        # Every vertex is a square corner or a junction, on the drawn centreline.
+        for x, y in a.points:
+            assert min(abs(x - 20), abs(x - 160), abs(x - 300)) <= 1.5 or min(abs(y - 20), abs(y - 220)) <= 1.5
+
+    loop = np.zeros((120, 160), np.uint8)
+    cv2.rectangle(loop, (20, 20), (140, 100), 255, 7)
+    (ring,) = trace_wall_axes(loop)
+    assert ring.closed and ring.segment_count == 4
+    assert ring.length() == pytest.approx(2 * (120 + 80), rel=0.03)
+
+
+def test_axis_vectorization_emits_one_polyline_per_wall_with_widths(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("skimage")
+    pytest.importorskip("ezdxf")
+
+    from worker.image_to_dxf import _dxf_from_class_map
+
+    class_map = (_wall_mask(cv2, np) > 0).astype(np.uint8)
+    cv2.rectangle(class_map, (60, 60), (100, 70), 2, -1)
+
+    outline = _dxf_from_class_map(class_map=class_map, h=240, w=320, mm_per_px=10.0, out_path=tmp_path / "o.dxf")
+    monkeypatch.setenv("IMAGE_DXF_VECTORIZE", "axis")
+    axis = _dxf_from_class_map(class_map=class_map, h=240, w=320, mm_per_px=10.0, out_path=tmp_path / "a.dxf")
+
+    assert axis.segments("WALL") == 0 and axis.wall_segments() == axis.segments("WALL_AXIS") == 7
+    assert axis.layer_entities["WALL_AXIS"] == 3
+    assert axis.layer_entities.get("WINDOW") == outline.layer_entities.get("WINDOW") == 1
+
+    polylines = axis.doc.modelspace().query("LWPOLYLINE[layer=='WALL_AXIS']")
+    widths = sorted({round(w) for e in polylines for _, _, w in e.get_points("xys") if w})
+    assert widths == [70, 110]  # drawn thickness in px times 10 mm/px
+
+    # A half-resolution grid gives the same axes in source coordinates.
+    small = class_map[::2, ::2]
+    coarse = _dxf_from_class_map(class_map=small, h=240, w=320, mm_per_px=10.0, out_path=tmp_path / "c.dxf")
+    assert coarse.segments("WALL_AXIS") == 7
+    assert coarse.bounds == pytest.approx(axis.bounds, abs=25.0)
+
+
+def test_opencv_axis_mode_emits_about_half_the_wall_segments(tmp_path: Path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("skimage")
+
+    from worker.image_context import ImageContext
+    from worker.image_to_dxf import image_to_dxf
+
+    # Walls thicker than IMAGE_DXF_MERGE_DIST_TOL, so the outline keeps both faces of each.
+    img = np.full((400, 560), 255, np.uint8)
+    cv2.rectangle(img, (40, 40), (520, 360), 0, 16)
+    cv2.line(img, (300, 40), (300, 360), 0, 14)
+    cv2.line(img, (40, 200), (300, 200), 0, 14)
+    png = tmp_path / "plan.png"
+    cv2.imwrite(str(png), img)
+
+    monkeypatch.setenv("IMAGE_DXF_CROP_FRAME", "0")
+    outline = image_to_dxf(dxf_path=tmp_path / "outline.dxf", image=ImageContext.from_path(png))
+    monkeypatch.setenv("IMAGE_DXF_VECTORIZE", "axis")
+    ctx = ImageContext.from_path(png)
+    axis = image_to_dxf(dxf_path=tmp_path / "axis.dxf", image=ctx)
+
+    assert "axes" in ctx.graph.stage_totals()
+    assert axis.segments("WALL") == 0
+    assert axis.layer_entities["WALL_AXIS"] <= outline.layer_entities["WALL"] // 2
+    assert 0 < axis.segments("WALL_AXIS") <= outline.segments("WALL")
+    for e in axis.doc.modelspace().query("LWPOLYLINE[layer=='WALL_AXIS']"):
+        widths = [w for _, _, w in e.get_points("xys")]
+        assert all(130.0 <= w <= 190.0 for w in widths[: len(widths) - (0 if e.closed else 1)])
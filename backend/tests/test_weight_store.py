@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+smp = pytest.importorskip("segmentation_models_pytorch")
+pytest.importorskip("safetensors")
+
+ENCODER = "mobilenet_v2"
+
+
+def _source_model():
+    torch.manual_seed(0)
+    return smp.DeepLabV3Plus(encoder_name=ENCODER, encoder_weights=None, classes=4, activation=None).eval()
+
+
+def _image():
+    import cv2
+
+    img = np.full((96, 128, 3), 255, np.uint8)
+    cv2.rectangle(img, (10, 10), (110, 80), (0, 0, 0), 3)
+    return img
+
+
+def test_stored_weights_load_exactly_and_version_the_model(tmp_path: Path, monkeypatch):
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig, model_version
+    from worker.weight_store import get_weight_store
+
+    monkeypatch.setenv("IMAGE_DXF_SEG_WEIGHTS_DIR", str(tmp_path))
+    src = _source_model()
+    entry = get_weight_store().register("floorplan-v1", src.state_dict(), encoder_name=ENCODER)
+    assert entry.size == (tmp_path / "floorplan-v1.safetensors").stat().st_size
+
+    config = SegmentationConfig(max_side=64, encoder_name=ENCODER, encoder_weights="imagenet", weights="floorplan-v1")
+    model = LocalSegmentationModel(device="cpu", config=config)
+    assert model.weights_source == f"store:floorplan-v1@{entry.sha256[:12]}"
+    for k, v in src.state_dict().items():
+        assert torch.equal(model.model.state_dict()[k], v), k
+
+    ref = LocalSegmentationModel(device="cpu", config=SegmentationConfig(max_side=64, encoder_name=ENCODER, encoder_weights=None))
+    ref.model = src
+    assert np.array_equal(model.predict(_image()), ref.predict(_image()))
+    assert model_version(config).endswith(f":w=floorplan-v1@{entry.sha256[:12]}")
+
+
+def test_missing_or_corrupt_weights_fail_instead_of_degrading(tmp_path: Path, monkeypatch):
+    from worker.segmentation import LocalSegmentationModel, SegmentationConfig, SegmentationModelRegistry
+    from worker.weight_store import WeightStoreError, get_weight_store
+
+    monkeypatch.setenv("IMAGE_DXF_SEG_WEIGHTS_DIR", str(tmp_path))
+    store = get_weight_store()
+    store.register("encoder-only", _source_model().encoder.state_dict(), scope="encoder", encoder_name=ENCODER)
+
+    config = SegmentationConfig(max_side=64, encoder_name=ENCODER, weights="encoder-only")
+    assert LocalSegmentationModel(device="cpu", config=config).weights_source.startswith("store:encoder-only@")
+
+    with pytest.raises(WeightStoreError, match="未登记"):
+        LocalSegmentationModel(device="cpu", config=SegmentationConfig(encoder_name=ENCODER, weights="nope"))
+
+    path = tmp_path / "encoder-only.safetensors"
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    store._verified.clear()
+    with pytest.raises(WeightStoreError, match="校验失败"):
+        LocalSegmentationModel(device="cpu", config=config)
+
+    path.unlink()
+    registry = SegmentationModelRegistry()
+    with pytest.raises(RuntimeError, match="权重文件缺失"):
+        registry.get(device="cpu", config=config)
+    (status,) = registry.status()
+    assert status["state"] == "failed" and "权重文件缺失" in status["error"]
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    image: Path
+    dxf: Path
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    ok: int = 0
+    unclear: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed_s: float = 0.0
+    megapixels: float = 0.0
+    images_per_s: float = 0.0
+    mpx_per_s: float = 0.0
+    failures: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _unique_dxf_path(out_dir: Path, image: Path, base: Path | None, used: set[Path]) -> Path:
+    rel = image.relative_to(base) if base is not None else Path(image.name)
+    dxf = out_dir / rel.with_suffix(".dxf")
+    n = 1
+    while dxf in used:
+        dxf = out_dir / rel.with_name(f"{rel.stem}_{n}.dxf")
+        n += 1
+    used.add(dxf)
+    return dxf
+
+
+def collect_items(source: str | Path, out_dir: str | Path, *, recursive: bool = False) -> list[BatchItem]:
+    """Items for a directory of images or a manifest file.
+
+    A manifest is either JSONL (``{"image": ..., "dxf": ...}`` per line, ``dxf``
+    optional) or plain text with one image path per line; relative paths are
+    resolved against the manifest's directory. Images without an explicit ``dxf``
+    go to ``out_dir``, mirroring the source layout for directories.
+    """
+    src = Path(source)
+    out = Path(out_dir)
+    used: set[Path] = set()
+    items: list[BatchItem] = []
+    if src.is_dir():
+        pattern = "**/*" if recursive else "*"
+        for p in sorted(src.glob(pattern)):
+            if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES:
+                items.append(BatchItem(image=p, dxf=_unique_dxf_path(out, p, src, used)))
+        return items
+    if not src.is_file():
+        raise FileNotFoundError(f"批量转换源不存在: {src}")
+    base = src.parent
+    for lineno, raw in enumerate(src.read_text(encoding="utf-8").splitlines(), start=1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                row = json.loads(line)
+                image = Path(row["image"])
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"清单第 {lineno} 行格式错误: {e}") from e
+            dxf = Path(row["dxf"]) if row.get("dxf") else None
+        else:
+            image, dxf = Path(line), None
+        if not image.is_absolute():
+            image = base / image
+        if dxf is None:
+            dxf = _unique_dxf_path(out, image, None, used)
+        elif not dxf.is_absolute():
+            dxf = base / dxf
+        items.append(BatchItem(image=image, dxf=dxf))
+    return items
+
+
+def load_completed(results_path: str | Path) -> set[str]:
+    """Images that already converted successfully according to an earlier results file."""
+    done: set[str] = set()
+    p = Path(results_path)
+    if not p.exists():
+        return done
+    with p.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("status") == "ok" and Path(str(row.get("dxf", ""))).exists():
+                done.add(str(row.get("image")))
+    return done
+
+
+def _init_worker(torch_threads: int) -> None:
+    """Pool initializer: cap intra-op threads and warm the segmentation model (inherited when preloaded)."""
+    from worker.image_to_dxf import _env_bool
+
+    try:
+        import cv2
+
+        cv2.setNumThreads(max(1, torch_threads))
+    except Exception:
+        pass
+    if not _env_bool("IMAGE_DXF_USE_LOCAL_SEG", True):
+        return
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, torch_threads))
+        from worker.segmentation import get_model_registry
+
+        get_model_registry().warm_up()
+    except Exception as e:
+        logger.warning("segmentation model warm-up failed in worker %s: %s", os.getpid(), e)
+
+
+def _preload_shared_model() -> bool:
+    """Build the model once in this (parent) process so forked pool workers share its weights."""
+    from worker.image_to_dxf import _env_bool
+
+    if not _env_bool("IMAGE_DXF_USE_LOCAL_SEG", True) or "fork" not in multiprocessing.get_all_start_methods():
+        return False
+    try:
+        from worker.segmentation import preload_for_fork
+
+        return preload_for_fork() is not None
+    except Exception as e:
+        logger.warning("segmentation model preload failed; workers load their own: %s", e)
+        return False
+
+
+def convert_one(image: str, dxf: str) -> dict:
+    """Convert a single item and describe the outcome as one JSON-serializable record."""
+    from worker.image_to_dxf import ImageClarityError, ImageToDxfError, convert_image_to_dxf
+
+    record: dict = {"image": image, "dxf": dxf, "worker": os.getpid()}
+    t0 = time.perf_counter()
+    try:
+        result = convert_image_to_dxf(image, dxf, debug=False)
+        record["status"] = "ok"
+        record["wall_segments"] = result.wall_segments()
+        record["timings_ms"] = {k: round(v, 3) for k, v in result.timings_ms.items()}
+        if result.image_shape is not None:
+            record["megapixels"] = round(result.image_shape[0] * result.image_shape[1] / 1e6, 4)
+        record["method"] = result.method
+        if result.fallback is not None:
+            record["fallback"] = result.fallback
+        if result.preflight is not None:
+            record["preflight"] = result.preflight
+        if result.speculation is not None:
+            record["speculation"] = result.speculation
+    except ImageClarityError as e:
+        record["status"] = "unclear"
+        record["error"] = str(e)
+        if getattr(e, "preflight", None) is not None:
+            record["preflight"] = e.preflight
+    except ImageToDxfError as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - t0
+    record["elapsed_ms"] = round(elapsed * 1000.0, 3)
+    if "megapixels" in record and elapsed > 0:
+        record["mpx_per_s"] = round(record["megapixels"] / elapsed, 4)
+    return record
+
+
+def _iter_records(items: list[BatchItem], workers: int, torch_threads: int) -> Iterator[dict]:
+    jobs = ((str(it.image), str(it.dxf)) for it in items)
+    if workers <= 1:
+        _init_worker(torch_threads)
+        for job in jobs:
+            yield convert_one(*job)
+        return
+    ctx = multiprocessing.get_context("fork") if _preload_shared_model() else None
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(torch_threads,)
+    ) as pool:
+        pending: set = set()
+        for job in jobs:
+            pending.add(pool.submit(convert_one, *job))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+
+
+def run_batch(
+    items: Iterable[BatchItem],
+    *,
+    results_path: str | Path,
+    workers: int = 0,
+    resume: bool = True,
+    on_record: Callable[[dict], None] | None = None,
+) -> BatchSummary:
+    """Convert ``items`` on a process pool, appending one JSON record per image to ``results_path``.
+
+    Records are written as soon as each image finishes (completion order, not input
+    order). With ``resume``, images recorded as ``ok`` whose DXF still exists are
+    skipped, so an interrupted run can simply be started again. ``workers`` <= 0
+    uses one process per CPU; each worker keeps its own segmentation model loaded.
+    """
+    items = list(items)
+    results = Path(results_path)
+    results.parent.mkdir(parents=True, exist_ok=True)
+    summary = BatchSummary(total=len(items))
+
+    done = load_completed(results) if resume else set()
+    todo = [it for it in items if str(it.image) not in done]
+    summary.skipped = len(items) - len(todo)
+
+    cpus = os.cpu_count() or 1
+    n_workers = cpus if int(workers) <= 0 else int(workers)
+    n_workers = max(1, min(n_workers, len(todo) or 1))
+    torch_threads = max(1, cpus // n_workers)
+
+    t0 = time.perf_counter()
+    with results.open("a" if resume else "w", encoding="utf-8") as f:
+        for record in _iter_records(todo, n_workers, torch_threads):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            status = record["status"]
+            if status == "ok":
+                summary.ok += 1
+                summary.megapixels += float(record.get("megapixels", 0.0))
+            elif status == "unclear":
+                summary.unclear += 1
+                summary.failures.append(record["image"])
+            else:
+                summary.failed += 1
+                summary.failures.append(record["image"])
+            if on_record is not None:
+                on_record(record)
+    summary.elapsed_s = round(time.perf_counter() - t0, 3)
+    processed = summary.ok + summary.unclear + summary.failed
+    if summary.elapsed_s > 0:
+        summary.images_per_s = round(processed / summary.elapsed_s, 4)
+        summary.mpx_per_s = round(summary.megapixels / summary.elapsed_s, 4)
+    summary.megapixels = round(summary.megapixels, 4)
+    return summary
+
+
+def print_progress(record: dict) -> None:
+    status = record["status"]
+    tail = f"{record.get('wall_segments', 0)} wall segments" if status == "ok" else record.get("error", "")
+    print(f"[{status}] {record['image']} ({record['elapsed_ms']:.0f} ms) {tail}", file=sys.stderr, flush=True)
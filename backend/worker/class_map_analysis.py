@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class ClassMapAnalysis:
+    """Per-class masks, pixel counts and external contours of one class map, each computed once.
+
+    The ML branch asks several questions of the same map: is there any WALL, how
+    much, what do its contours look like (usability check), and then the WALL
+    contours after closing plus WINDOW/DOOR contours (DXF emission). Each class
+    mask is built by one comparison pass on first use and everything derived
+    from it (pixel count, contours with their ``contourArea``, closed contours)
+    is memoized, so no full-image pass is repeated across the check and the
+    emitter. Contours of a class with no pixels are never searched.
+    """
+
+    def __init__(self, class_map: np.ndarray) -> None:
+        self.class_map = np.asarray(class_map)
+        self._masks: dict[int, np.ndarray] = {}
+        self._pixels: dict[int, int] = {}
+        self._contours: dict[tuple[int, int], tuple[list, np.ndarray]] = {}
+        self._closed: dict[tuple[int, int], np.ndarray] = {}
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> ClassMapAnalysis:
+        """Analysis of a single binary mask, exposed as class 1."""
+        analysis = cls(mask)
+        analysis._masks[1] = mask if mask.dtype == np.uint8 else (mask > 0).astype(np.uint8) * 255
+        return analysis
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return int(self.class_map.shape[0]), int(self.class_map.shape[1])
+
+    def mask(self, cls: int) -> np.ndarray:
+        """uint8 0/255 mask of ``cls``."""
+        mask = self._masks.get(cls)
+        if mask is None:
+            if self.class_map.dtype == np.uint8:
+                import cv2
+
+                mask = cv2.compare(self.class_map, int(cls), cv2.CMP_EQ)
+            else:
+                mask = (self.class_map == cls).view(np.uint8) * np.uint8(255)
+            self._masks[cls] = mask
+        return mask
+
+    def pixels(self, cls: int) -> int:
+        count = self._pixels.get(cls)
+        if count is None:
+            count = int(np.count_nonzero(self.mask(cls))) if self.class_map.size else 0
+            self._pixels[cls] = count
+        return count
+
+    def ratio(self, cls: int) -> float:
+        h, w = self.shape
+        return float(self.pixels(cls)) / float(max(1, h * w))
+
+    def closed_mask(self, cls: int, *, close_kernel: int = 1) -> np.ndarray:
+        """Mask of ``cls`` after a ``close_kernel`` square closing (the mask itself when <= 1)."""
+        if close_kernel <= 1:
+            return self.mask(cls)
+        key = (int(cls), int(close_kernel))
+        mask = self._closed.get(key)
+        if mask is None:
+            import cv2
+
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (key[1], key[1]))
+            mask = cv2.morphologyEx(self.mask(cls), cv2.MORPH_CLOSE, kernel)
+            self._closed[key] = mask
+        return mask
+
+    def contours(self, cls: int, *, close_kernel: int = 1) -> tuple[list, np.ndarray]:
+        """External contours of ``cls`` (after a ``close_kernel`` square closing when > 1) and their areas."""
+        key = (int(cls), int(close_kernel) if close_kernel > 1 else 1)
+        found = self._contours.get(key)
+        if found is not None:
+            return found
+        import cv2
+
+        if self.pixels(cls) == 0:
+            found = ([], np.zeros(0, dtype=np.float64))
+        else:
+            mask = self.closed_mask(cls, close_kernel=key[1])
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours = list(contours)
+            found = (contours, np.array([cv2.contourArea(c) for c in contours], dtype=np.float64))
+        self._contours[key] = found
+        return found
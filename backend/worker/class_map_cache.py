@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ClassMapCache:
+    """Segmentation class maps on disk as uint8 ``.npy`` files, memory-mapped on read.
+
+    Files live in ``<root>/<key[:2]>/<key>.npy`` and are published with an atomic
+    rename. A hit refreshes the file's mtime; once the cache exceeds ``max_bytes``
+    the least recently used maps are deleted. Returned arrays are read-only
+    memory maps, so a hit costs page faults for the pixels actually touched.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.npy"
+
+    def get(self, key: str) -> np.ndarray | None:
+        path = self._path(key)
+        try:
+            class_map = np.load(path, mmap_mode="r", allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            class_map = None
+        with self._lock:
+            if class_map is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return class_map
+
+    def put(self, key: str, class_map: np.ndarray) -> None:
+        path = self._path(key)
+        if path.exists():
+            return
+        tmp = path.with_name(f".{key}.{uuid4().hex}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(class_map, dtype=np.uint8), allow_pickle=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("class map cache store failed for %s: %s", key[:12], e)
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def evict(self) -> int:
+        entries: list[tuple[float, int, Path]] = []
+        for p in self.root.glob("[0-9a-f][0-9a-f]/*.npy"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def class_map_key(image_digest: str, model_version: str) -> str:
+    return hashlib.sha256(f"{image_digest}:{model_version}".encode("utf-8")).hexdigest()
+
+
+_caches: dict[str, ClassMapCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_class_map_cache() -> ClassMapCache | None:
+    """The process-wide cache for ``IMAGE_DXF_CLASSMAP_CACHE_DIR``; None when ``IMAGE_DXF_CLASSMAP_CACHE=0``."""
+    if os.getenv("IMAGE_DXF_CLASSMAP_CACHE", "1").strip().lower() in ("0", "false", "no", "n", "off"):
+        return None
+    default_root = Path(__file__).resolve().parents[1] / "var" / "class_map_cache"
+    root = Path(os.getenv("IMAGE_DXF_CLASSMAP_CACHE_DIR", "").strip() or default_root).resolve()
+    raw = os.getenv("IMAGE_DXF_CLASSMAP_CACHE_MAX_MB", "").strip()
+    try:
+        max_mb = float(raw) if raw else 512.0
+    except ValueError:
+        max_mb = 512.0
+    with _caches_lock:
+        cache = _caches.get(str(root))
+        if cache is None:
+            cache = ClassMapCache(root, max_bytes=int(max_mb * 1024 * 1024))
+            _caches[str(root)] = cache
+        return cache
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+# Settings that change how a conversion runs or what it logs, not what it produces.
+_NON_OUTPUT_PREFIXES = (
+    "IMAGE_DXF_CACHE",
+    "IMAGE_DXF_CLASSMAP_CACHE",
+    "IMAGE_DXF_DEBUG",
+    "IMAGE_DXF_PARALLEL_LADDER",
+    "IMAGE_DXF_LADDER_WORKERS",
+    "IMAGE_DXF_TILE_WORKERS",
+    "IMAGE_DXF_SEG_PRELOAD",
+    "IMAGE_DXF_SEG_RETRY_S",
+    "IMAGE_DXF_SEG_THREADS",
+    "IMAGE_DXF_SEG_BATCH_",
+    "IMAGE_DXF_SEG_QUEUE",
+    "IMAGE_DXF_SEG_WINDOW_BATCH",
+    "IMAGE_DXF_SPECULATIVE",
+)
+_CODE_FILES = (
+    "image_to_dxf.py",
+    "image_context.py",
+    "class_map_analysis.py",
+    "class_map_cache.py",
+    "line_merge.py",
+    "preflight.py",
+    "pyramid.py",
+    "rle_lines.py",
+    "segmentation.py",
+    "seg_backends.py",
+    "seg_batching.py",
+    "speculative.py",
+    "stages.py",
+    "tiling.py",
+    "wall_axes.py",
+    "weight_store.py",
+)
+_DXF_NAME = "converted.dxf"
+_SVG_NAME = "preview.svg"
+_META_NAME = "meta.json"
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return float(default)
+    try:
+        return float(raw.strip())
+    except Exception:
+        return float(default)
+
+
+@lru_cache(maxsize=1)
+def _code_fingerprint() -> str:
+    """Hash of the converter sources, so a deploy that changes the pipeline starts a fresh cache."""
+    h = hashlib.sha256()
+    root = Path(__file__).resolve().parent
+    for name in _CODE_FILES:
+        p = root / name
+        if p.exists():
+            h.update(name.encode("utf-8"))
+            h.update(p.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def settings_fingerprint(environ: dict[str, str] | None = None) -> dict[str, str]:
+    """Every explicitly set ``IMAGE_DXF_*`` value that can affect the produced DXF."""
+    env = os.environ if environ is None else environ
+    return {
+        k: str(v).strip()
+        for k, v in sorted(env.items())
+        if k.startswith("IMAGE_DXF_") and not k.startswith(_NON_OUTPUT_PREFIXES)
+    }
+
+
+def model_version() -> str:
+    from worker.segmentation import model_version as seg_model_version
+
+    return seg_model_version()
+
+
+def model_cacheable() -> bool:
+    """False once this process's segmentation model has fallen back to random weights.
+
+    ``model_version`` names the configured weights, not the ones that loaded, so
+    conversions made by such a model are not stored under it.
+    """
+    from worker.segmentation import get_model_registry
+
+    return get_model_registry().weights() != "random-init"
+
+
+def conversion_key(
+    image_bytes: bytes, *, environ: dict[str, str] | None = None, image_digest: str | None = None
+) -> str:
+    """SHA-256 over the image bytes, the effective settings, the model version and the converter code.
+
+    ``image_digest`` is the hex SHA-256 of ``image_bytes`` when the caller already
+    has it (``ImageContext.digest``), so the upload is hashed only once.
+    """
+    settings = settings_fingerprint(environ)
+    use_ml = settings.get("IMAGE_DXF_USE_LOCAL_SEG", "1").lower() in ("1", "true", "yes", "y", "on")
+    h = hashlib.sha256()
+    h.update(bytes.fromhex(image_digest) if image_digest is not None else hashlib.sha256(image_bytes).digest())
+    h.update(
+        json.dumps(
+            {
+                "format": CACHE_FORMAT,
+                "code": _code_fingerprint(),
+                "model": model_version() if use_ml else None,
+                "settings": settings,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    key: str
+    dxf_path: Path
+    svg_preview: str
+    meta: dict
+
+
+class ConversionCache:
+    """Content-addressed store of finished image→DXF conversions.
+
+    Entries live in ``<root>/<key[:2]>/<key>/`` and are published with an atomic
+    rename, so concurrent writers of the same key are harmless. A hit refreshes
+    the entry's mtime, which drives least-recently-used eviction once the cache
+    exceeds ``max_bytes``; entries older than ``max_age_s`` are dropped regardless.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int, max_age_s: float) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.max_age_s = float(max_age_s)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        d = self._entry_dir(key)
+        entry = None
+        try:
+            if time.time() - d.stat().st_mtime <= self.max_age_s:
+                meta = json.loads((d / _META_NAME).read_text(encoding="utf-8"))
+                svg = (d / _SVG_NAME).read_text(encoding="utf-8")
+                if (d / _DXF_NAME).exists():
+                    entry = CacheEntry(key=key, dxf_path=d / _DXF_NAME, svg_preview=svg, meta=meta)
+                    os.utime(d)
+        except (OSError, ValueError):
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def store(self, key: str, *, dxf_path: Path, svg_preview: str, meta: dict | None = None) -> None:
+        final = self._entry_dir(key)
+        if final.exists():
+            return
+        tmp = self.root / ".tmp" / f"{key}.{uuid4().hex}"
+        try:
+            tmp.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(Path(dxf_path), tmp / _DXF_NAME)
+            (tmp / _SVG_NAME).write_text(svg_preview, encoding="utf-8")
+            (tmp / _META_NAME).write_text(
+                json.dumps({"created": time.time(), **(meta or {})}, ensure_ascii=False), encoding="utf-8"
+            )
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, final)
+        except OSError as e:
+            logger.warning("conversion cache store failed for %s: %s", key[:12], e)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def materialize(self, entry: CacheEntry, dest: Path) -> Path:
+        """Place the cached DXF at ``dest`` (hard link when possible, copy otherwise)."""
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(entry.dxf_path, dest)
+        return dest
+
+    def evict(self) -> int:
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        removed = 0
+        for shard in self.root.glob("[0-9a-f][0-9a-f]"):
+            for d in shard.iterdir():
+                try:
+                    mtime = d.stat().st_mtime
+                    size = sum(f.stat().st_size for f in d.iterdir())
+                except OSError:
+                    continue
+                if now - mtime > self.max_age_s:
+                    shutil.rmtree(d, ignore_errors=True)
+                    removed += 1
+                else:
+                    entries.append((mtime, size, d))
+        total = sum(size for _, size, _ in entries)
+        for _, size, d in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "max_bytes": self.max_bytes,
+                "max_age_s": self.max_age_s,
+            }
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+_caches: dict[str, ConversionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_conversion_cache(default_root: Path) -> ConversionCache | None:
+    """The process-wide cache for ``IMAGE_DXF_CACHE_DIR`` (or ``default_root``); None when disabled."""
+    if os.getenv("IMAGE_DXF_CACHE", "1").strip().lower() in ("0", "false", "no", "n", "off"):
+        return None
+    root = Path(os.getenv("IMAGE_DXF_CACHE_DIR", "").strip() or default_root).resolve()
+    with _caches_lock:
+        cache = _caches.get(str(root))
+        if cache is None:
+            cache = ConversionCache(
+                root,
+                max_bytes=int(_env_float("IMAGE_DXF_CACHE_MAX_MB", 1024.0) * 1024 * 1024),
+                max_age_s=_env_float("IMAGE_DXF_CACHE_MAX_AGE_H", 168.0) * 3600.0,
+            )
+            _caches[str(root)] = cache
+        return cache
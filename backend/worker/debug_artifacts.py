@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class DebugArtifactWriter:
+    """Writes debug PNGs on a background thread, off the conversion's critical path.
+
+    The queue is bounded: when the writer falls behind, new artifacts are dropped
+    rather than blocking the request. Submitted arrays are only read, so pipeline
+    intermediates can be handed over without copying.
+    """
+
+    def __init__(self, *, max_pending: int = 8) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._cond = threading.Condition()
+        # Queued writes per path: the same path can be queued again before its first write lands.
+        self._pending: dict[str, int] = {}
+        self._thread: threading.Thread | None = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, path: Path, image) -> bool:
+        key = str(path)
+        with self._cond:
+            self._start_locked()
+            try:
+                self._queue.put_nowait((Path(path), image))
+            except queue.Full:
+                self.dropped += 1
+                logger.warning("debug artifact queue full, dropping %s", key)
+                return False
+            self._pending[key] = self._pending.get(key, 0) + 1
+        return True
+
+    def is_pending(self, path: Path) -> bool:
+        with self._cond:
+            return str(path) in self._pending
+
+    def flush(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def _start_locked(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="debug-artifacts", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        import cv2
+
+        while True:
+            path, image = self._queue.get()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                ok = bool(cv2.imwrite(str(path), image))
+            except Exception as e:
+                ok = False
+                logger.warning("debug artifact write failed for %s: %s", path, e)
+            with self._cond:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                key = str(path)
+                if self._pending.get(key, 0) > 1:
+                    self._pending[key] -= 1
+                else:
+                    self._pending.pop(key, None)
+                self._cond.notify_all()
+            self._queue.task_done()
+
+
+_writer: DebugArtifactWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_debug_writer(*, max_pending: int = 8) -> DebugArtifactWriter:
+    """Process-wide writer; ``max_pending`` only applies when it is first created."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DebugArtifactWriter(max_pending=max_pending)
+        return _writer
+
+
+def _after_fork_in_child() -> None:
+    # Queued writes belong to the parent; the child starts with a fresh writer thread.
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from worker.stages import StageGraph
+
+
+class ImageContext:
+    """One decoded image for one conversion request.
+
+    The file (or buffer) is decoded at most once; ``gray`` and ``rgb`` are derived
+    lazily from the BGR ``color`` image through the request's ``StageGraph``, so
+    every consumer (debug output, segmentation, OpenCV vectorization) shares the
+    same arrays. ``rgb`` is a channel-reversed view, not a copy. All arrays are
+    shared and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str | Path | None = None,
+        data: bytes | None = None,
+        array: np.ndarray | None = None,
+        graph: StageGraph | None = None,
+    ) -> None:
+        if path is None and data is None and array is None:
+            raise ValueError("ImageContext needs a path, encoded bytes or an array")
+        self.path = Path(path) if path is not None else None
+        self._data = data
+        self._array = array
+        self.graph = graph or StageGraph()
+        self._digest: str | None = None
+        if self.path is not None:
+            self.name = str(self.path)
+        else:
+            self.name = f"{'bytes' if data is not None else 'array'}:{id(self):x}"
+
+    @classmethod
+    def from_path(cls, path: str | Path, *, graph: StageGraph | None = None) -> ImageContext:
+        return cls(path=path, graph=graph)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, *, path: str | Path | None = None, graph: StageGraph | None = None) -> ImageContext:
+        return cls(path=path, data=data, graph=graph)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, *, graph: StageGraph | None = None) -> ImageContext:
+        return cls(array=array, graph=graph)
+
+    @classmethod
+    def coerce(cls, image, *, graph: StageGraph | None = None) -> ImageContext:
+        if isinstance(image, ImageContext):
+            return image
+        if isinstance(image, np.ndarray):
+            return cls.from_array(image, graph=graph)
+        return cls.from_path(image, graph=graph)
+
+    @property
+    def decode_node(self) -> tuple:
+        return ("decode", self.name)
+
+    @property
+    def gray_node(self) -> tuple:
+        return ("gray", self.decode_node)
+
+    @property
+    def color(self) -> np.ndarray:
+        return self.graph.run("decode", (self.name,), self._decode)
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._array is not None and self._array.ndim == 2:
+            return self._array
+
+        def _gray():
+            import cv2
+
+            return cv2.cvtColor(self.color, cv2.COLOR_BGR2GRAY)
+
+        return self.graph.run("gray", (self.decode_node,), _gray)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.color[..., ::-1]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        src = self._array if self._array is not None else self.color
+        return int(src.shape[0]), int(src.shape[1])
+
+    def digest(self) -> str:
+        """SHA-256 of the encoded bytes (file or buffer), or of the raw pixels for array contexts."""
+        if self._digest is None:
+            h = hashlib.sha256()
+            if self._data is not None:
+                h.update(self._data)
+            elif self._array is not None:
+                arr = np.ascontiguousarray(self._array)
+                h.update(f"{arr.dtype}:{arr.shape}".encode("utf-8"))
+                h.update(memoryview(arr).cast("B"))
+            else:
+                with open(self.path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def _decode(self) -> np.ndarray:
+        import cv2
+
+        if self._array is not None:
+            arr = self._array
+            if arr.ndim == 2:
+                return cv2.cvtColor(arr, cv2.COLOR_GRAY2BGR)
+            if arr.ndim == 3 and arr.shape[2] == 4:
+                return cv2.cvtColor(arr, cv2.COLOR_BGRA2BGR)
+            return arr
+        if self._data is not None:
+            color = cv2.imdecode(np.frombuffer(self._data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        else:
+            color = cv2.imread(str(self.path), cv2.IMREAD_COLOR)
+        if color is None:
+            from worker.image_to_dxf import ImageToDxfError
+
+            raise ImageToDxfError(f"无法读取图片: {self.path or self.name}")
+        return color
@@ -1,8 +1,36 @@
+import contextvars
+import logging
 import os
-from dataclasses import dataclass
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
 from pathlib import Path
 from uuid import uuid4
 
+from worker.class_map_analysis import ClassMapAnalysis
+from worker.image_context import ImageContext
+from worker.preflight import PreflightLimits, PreflightReport, assess
+from worker.pyramid import downsample, refine_segments, to_full_resolution
+from worker.stages import StageGraph
+from worker.tiling import (
+    TilePlan,
+    canny_tile,
+    hough_tile,
+    iter_tiles,
+    map_tiles,
+    mask_tile,
+    otsu_threshold_from_hist,
+    stitch_seam_segments,
+    threshold_stats_tile,
+    tile_plan,
+    with_halo,
+)
+from worker.wall_axes import trace_wall_axes
+
+logger = logging.getLogger(__name__)
+
 
 def _ensure_deps():
     try:
@@ -58,6 +86,172 @@ class DetectParams:
     hough_threshold: int
     min_line: int
     max_gap: int
+    line_engine: str = "hough"
+
+
+def _line_engine() -> str:
+    """``IMAGE_DXF_LINE_ENGINE``: ``hough`` (Canny + HoughLinesP) or ``rle`` (run-length walls + Hough on the rest)."""
+    engine = os.getenv("IMAGE_DXF_LINE_ENGINE", "hough").strip().lower()
+    return engine if engine in ("hough", "rle") else "hough"
+
+
+def _vectorize_mode() -> str:
+    """``IMAGE_DXF_VECTORIZE``: ``outline`` (wall edges/contours on WALL) or ``axis`` (centrelines on WALL_AXIS)."""
+    mode = os.getenv("IMAGE_DXF_VECTORIZE", "outline").strip().lower()
+    return mode if mode in ("outline", "axis") else "outline"
+
+
+def _pyramid_factor(shape) -> int:
+    """``IMAGE_DXF_PYRAMID``: detect lines at 1/N resolution (N = 2..4) on large inputs.
+
+    Only inputs of at least ``IMAGE_DXF_PYRAMID_MIN_MPX`` megapixels use it; 0 or
+    1 (the default) keeps detection at full resolution.
+    """
+    factor = _env_int("IMAGE_DXF_PYRAMID", 0)
+    if factor <= 1:
+        return 1
+    h, w = int(shape[0]), int(shape[1])
+    if h * w < _env_float("IMAGE_DXF_PYRAMID_MIN_MPX", 8.0) * 1e6:
+        return 1
+    return min(4, factor)
+
+
+def _preflight_enabled() -> bool:
+    """``IMAGE_DXF_PREFLIGHT``: gate every conversion on thumbnail statistics first (default off)."""
+    return _env_bool("IMAGE_DXF_PREFLIGHT", False)
+
+
+def _preflight_routing() -> bool:
+    """``IMAGE_DXF_PREFLIGHT_ROUTE``: let the pre-flight pick ML vs OpenCV and the first ladder rung (default off)."""
+    return _preflight_enabled() and _env_bool("IMAGE_DXF_PREFLIGHT_ROUTE", False)
+
+
+def _preflight_limits() -> PreflightLimits:
+    d = PreflightLimits()
+    return PreflightLimits(
+        max_side=max(32, _env_int("IMAGE_DXF_PREFLIGHT_MAX_SIDE", d.max_side)),
+        min_contrast=_env_float("IMAGE_DXF_PREFLIGHT_MIN_CONTRAST", d.min_contrast),
+        min_sharpness=_env_float("IMAGE_DXF_PREFLIGHT_MIN_SHARPNESS", d.min_sharpness),
+        min_foreground=_env_float("IMAGE_DXF_PREFLIGHT_MIN_FOREGROUND", d.min_foreground),
+        min_line_density=_env_float("IMAGE_DXF_PREFLIGHT_MIN_LINE_DENSITY", d.min_line_density),
+        opencv_straightness=_env_float("IMAGE_DXF_PREFLIGHT_OPENCV_STRAIGHTNESS", d.opencv_straightness),
+        aggressive_contrast=_env_float("IMAGE_DXF_PREFLIGHT_AGGRESSIVE_CONTRAST", d.aggressive_contrast),
+        strict_foreground=_env_float("IMAGE_DXF_PREFLIGHT_STRICT_FOREGROUND", d.strict_foreground),
+    )
+
+
+def _preflight(ctx: ImageContext) -> PreflightReport:
+    """Pre-flight report for ``ctx``, computed once per request on its graph."""
+    limits = _preflight_limits()
+    return ctx.graph.run("preflight", (ctx.gray_node, limits), lambda: assess(ctx.gray, limits))
+
+
+def _pyramid_detect_params(params: DetectParams, factor: int) -> DetectParams:
+    """``params`` for the 1/``factor`` image: lengths, gaps and Hough votes shrink with it."""
+    return replace(
+        params,
+        hough_threshold=max(2, round(params.hough_threshold / factor)),
+        min_line=max(2, round(params.min_line / factor)),
+        max_gap=max(1, round(params.max_gap / factor)),
+    )
+
+
+def _default_detect_params() -> DetectParams:
+    return DetectParams(
+        blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL", 3),
+        morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE", True),
+        morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL", 3),
+        canny_low=_env_int("IMAGE_DXF_CANNY_LOW", 25),
+        canny_high=_env_int("IMAGE_DXF_CANNY_HIGH", 75),
+        hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD", 25),
+        min_line=_env_int("IMAGE_DXF_MIN_LINE", 10),
+        max_gap=_env_int("IMAGE_DXF_MAX_GAP", 25),
+        line_engine=_line_engine(),
+    )
+
+
+def _aggressive_detect_params(params: DetectParams) -> DetectParams:
+    return DetectParams(
+        blur_kernel=params.blur_kernel,
+        morph_close=params.morph_close,
+        morph_kernel=params.morph_kernel,
+        canny_low=_env_int("IMAGE_DXF_CANNY_LOW_AGG", 10),
+        canny_high=_env_int("IMAGE_DXF_CANNY_HIGH_AGG", 50),
+        hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD_AGG", 15),
+        min_line=_env_int("IMAGE_DXF_MIN_LINE_AGG", max(6, params.min_line // 2)),
+        max_gap=_env_int("IMAGE_DXF_MAX_GAP_AGG", max(35, params.max_gap)),
+        line_engine=params.line_engine,
+    )
+
+
+def _strict_detect_params(params: DetectParams) -> DetectParams:
+    return DetectParams(
+        blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL_STRICT", max(5, params.blur_kernel)),
+        morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE_STRICT", params.morph_close),
+        morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL_STRICT", params.morph_kernel),
+        canny_low=_env_int("IMAGE_DXF_CANNY_LOW_STRICT", 40),
+        canny_high=_env_int("IMAGE_DXF_CANNY_HIGH_STRICT", 120),
+        hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD_STRICT", 70),
+        min_line=_env_int("IMAGE_DXF_MIN_LINE_STRICT", 60),
+        max_gap=_env_int("IMAGE_DXF_MAX_GAP_STRICT", 12),
+        line_engine=params.line_engine,
+    )
+
+
+@dataclass
+class LadderRun:
+    name: str
+    params: DetectParams
+    mask: object
+    edges: object
+    lines: object
+    raw_count: int
+    elapsed_ms: float
+    lines_node: tuple = ()
+    # ``mask``/``edges`` are at 1/scale of the input resolution (pyramid mode); ``lines`` are always full resolution.
+    scale: int = 1
+
+
+@dataclass
+class ConversionResult:
+    """An emitted DXF kept in memory: the document plus what validation and previews need.
+
+    ``path`` is where the document was saved; ``__fspath__`` lets callers that only
+    want the file keep treating the result as a path. ``method`` is the path that
+    produced it (``ml`` or ``opencv``); ``fallback`` says why an OpenCV result
+    replaced the ML one: ``unusable`` when the wall mask failed the usability
+    check, ``failed`` when segmentation itself raised (``fallback_error``).
+    """
+
+    path: Path
+    doc: object
+    layer_entities: dict[str, int]
+    layer_segments: dict[str, int]
+    bounds: tuple[float, float, float, float] | None
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    intermediates: dict[str, object] = field(default_factory=dict)
+    debug_artifacts: list[Path] | None = None
+    image_shape: tuple[int, int] | None = None
+    preflight: dict | None = None
+    speculation: dict | None = None
+    method: str | None = None
+    fallback: str | None = None
+    fallback_error: str | None = None
+
+    @property
+    def cacheable(self) -> bool:
+        """False for an OpenCV stand-in after a segmentation failure, which may be transient (overload, cold model)."""
+        return self.fallback != "failed"
+
+    def segments(self, layer: str) -> int:
+        return int(self.layer_segments.get(layer.upper(), 0))
+
+    def wall_segments(self) -> int:
+        """Wall segments whatever the vectorization: outlines on WALL plus centrelines on WALL_AXIS."""
+        return self.segments("WALL") + self.segments("WALL_AXIS")
+
+    def __fspath__(self) -> str:
+        return str(self.path)
 
 
 class ImageToDxfError(RuntimeError):
@@ -68,7 +262,108 @@ class ImageClarityError(ImageToDxfError):
     pass
 
 
-def _remove_small_and_thin_components(mask, *, min_area: int, thin_px: int, long_px: int):
+class ImageRejectedError(ImageClarityError):
+    """Rejected by the pre-flight gate before any conversion work; ``preflight`` holds its statistics."""
+
+    def __init__(self, report: PreflightReport) -> None:
+        super().__init__(report.reason or "图片清晰度不足")
+        self.preflight = report.as_dict()
+
+
+def _component_drop_table(stats, *, min_area: int, thin_px: int, long_px: int):
+    import cv2
+    import numpy as np
+
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+    area = stats[:, cv2.CC_STAT_AREA]
+    drop = (area < min_area) | ((np.minimum(w, h) <= thin_px) & (np.maximum(w, h) >= long_px))
+    drop[0] = False
+    return drop
+
+
+def _banded_component_drop_tables(mask, *, band_rows: int, min_area: int, thin_px: int, long_px: int):
+    """Label the mask band by band and decide keep/drop per band-local label.
+
+    Components that cross a band seam are joined through their 8-connected pixels
+    on the two seam rows, so the decision is made on whole-image stats while only
+    one band's label image is alive at a time.
+    """
+    import cv2
+    import numpy as np
+
+    from worker.line_merge import label_pairs
+
+    hh, ww = int(mask.shape[0]), int(mask.shape[1])
+    bands: list[tuple[int, int, int, int]] = []
+    boxes: list = []
+    seam_a: list = []
+    seam_b: list = []
+    base = 0
+    prev_bottom = None
+    for y0 in range(0, hh, band_rows):
+        y1 = min(hh, y0 + band_rows)
+        num, labels, stats, _ = cv2.connectedComponentsWithStats(mask[y0:y1], connectivity=8)
+        top = np.where(labels[0] > 0, labels[0].astype(np.int64) + base, 0)
+        bottom = np.where(labels[-1] > 0, labels[-1].astype(np.int64) + base, 0)
+        if prev_bottom is not None:
+            for dx in (-1, 0, 1):
+                a = prev_bottom[max(0, -dx) : ww - max(0, dx)]
+                b = top[max(0, dx) : ww - max(0, -dx)]
+                both = (a > 0) & (b > 0)
+                seam_a.append(a[both])
+                seam_b.append(b[both])
+        prev_bottom = bottom
+        del labels
+
+        st = stats[1:].astype(np.int64)
+        boxes.append(
+            np.stack(
+                [
+                    st[:, cv2.CC_STAT_LEFT],
+                    st[:, cv2.CC_STAT_TOP] + y0,
+                    st[:, cv2.CC_STAT_LEFT] + st[:, cv2.CC_STAT_WIDTH],
+                    st[:, cv2.CC_STAT_TOP] + st[:, cv2.CC_STAT_HEIGHT] + y0,
+                    st[:, cv2.CC_STAT_AREA],
+                ],
+                axis=1,
+            )
+        )
+        bands.append((y0, y1, base, num))
+        base += num - 1
+
+    total = base + 1
+    box = np.concatenate([np.zeros((1, 5), dtype=np.int64)] + boxes, axis=0)
+    if seam_a:
+        root = label_pairs(total, np.concatenate(seam_a), np.concatenate(seam_b))
+    else:
+        root = np.arange(total, dtype=np.int64)
+
+    x0 = np.full(total, np.iinfo(np.int64).max)
+    y0s = np.full(total, np.iinfo(np.int64).max)
+    x1 = np.zeros(total, dtype=np.int64)
+    y1s = np.zeros(total, dtype=np.int64)
+    np.minimum.at(x0, root, box[:, 0])
+    np.minimum.at(y0s, root, box[:, 1])
+    np.maximum.at(x1, root, box[:, 2])
+    np.maximum.at(y1s, root, box[:, 3])
+    area = np.bincount(root, weights=box[:, 4], minlength=total)
+
+    merged = np.zeros((total, 5), dtype=np.int64)
+    merged[:, cv2.CC_STAT_LEFT] = x0
+    merged[:, cv2.CC_STAT_TOP] = y0s
+    merged[:, cv2.CC_STAT_WIDTH] = x1 - x0
+    merged[:, cv2.CC_STAT_HEIGHT] = y1s - y0s
+    merged[:, cv2.CC_STAT_AREA] = area.astype(np.int64)
+    drop = _component_drop_table(merged, min_area=min_area, thin_px=thin_px, long_px=long_px)[root]
+
+    for y0, y1, base, num in bands:
+        table = np.zeros(num, dtype=bool)
+        table[1:] = drop[base + 1 : base + num]
+        yield y0, y1, table
+
+
+def _remove_small_and_thin_components(mask, *, min_area: int, thin_px: int, long_px: int, band_rows: int = 0):
     import cv2
     import numpy as np
 
@@ -76,22 +371,21 @@ def _remove_small_and_thin_components(mask, *, min_area: int, thin_px: int, long
         return mask
 
     keep = mask.copy()
-    num, labels, stats, _ = cv2.connectedComponentsWithStats(keep, connectivity=8)
-    for i in range(1, num):
-        x = int(stats[i, cv2.CC_STAT_LEFT])
-        y = int(stats[i, cv2.CC_STAT_TOP])
-        w = int(stats[i, cv2.CC_STAT_WIDTH])
-        h = int(stats[i, cv2.CC_STAT_HEIGHT])
-        area = int(stats[i, cv2.CC_STAT_AREA])
-
-        if area < min_area:
-            keep[labels == i] = 0
-            continue
-
-        if min(w, h) <= thin_px and max(w, h) >= long_px:
-            keep[labels == i] = 0
+    if band_rows <= 0 or band_rows >= int(mask.shape[0]):
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(keep, connectivity=8)
+        drop = _component_drop_table(stats, min_area=min_area, thin_px=thin_px, long_px=long_px)
+        if drop.any():
+            keep[drop[labels]] = 0
+        return keep
+
+    tables = _banded_component_drop_tables(
+        mask, band_rows=int(band_rows), min_area=min_area, thin_px=thin_px, long_px=long_px
+    )
+    for y0, y1, drop in tables:
+        if not drop.any():
             continue
-
+        _, labels = cv2.connectedComponents(mask[y0:y1], connectivity=8)
+        keep[y0:y1][drop[labels]] = 0
     return keep
 
 
@@ -292,57 +586,545 @@ def _orthogonalize_lines(segs, *, tol_deg: float):
     return out
 
 
-def _run_canny_hough(gray, *, params: DetectParams):
+def _blur_stage(graph: StageGraph, gray, *, source: tuple, kernel: int):
+    import cv2
+
+    k = _odd_kernel(kernel)
+    key = (source, k)
+    return ("blur", *key), graph.run("blur", key, lambda: cv2.GaussianBlur(gray, (k, k), 0))
+
+
+def _adaptive_threshold_stage(graph: StageGraph, blur_node: tuple, blur, *, scale: int = 1):
+    import cv2
+
+    block = _odd_kernel(max(3, _env_int("IMAGE_DXF_ADAPTIVE_BLOCK", 35) // scale))
+    c = _env_int("IMAGE_DXF_ADAPTIVE_C", 10)
+    key = (blur_node, "adaptive", block, c)
+    mask = graph.run(
+        "threshold",
+        key,
+        lambda: cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, c),
+    )
+    return ("threshold", *key), mask
+
+
+def _otsu_threshold_stage(graph: StageGraph, blur_node: tuple, blur):
     import cv2
+
+    key = (blur_node, "otsu")
+    mask = graph.run(
+        "threshold", key, lambda: cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    )
+    return ("threshold", *key), mask
+
+
+def _morph_close_stage(graph: StageGraph, mask_node: tuple, mask, *, kernel: int):
+    import cv2
+
+    mk = _odd_kernel(kernel)
+    key = (mask_node, mk)
+
+    def _close():
+        k = cv2.getStructuringElement(cv2.MORPH_RECT, (mk, mk))
+        return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, k)
+
+    return ("morph", *key), graph.run("morph", key, _close)
+
+
+def _tile_plan_for(shape) -> TilePlan | None:
+    """``IMAGE_DXF_TILED``: ``1`` forces tiling, ``0`` disables it, ``auto`` tiles above ``IMAGE_DXF_TILED_MIN_MPX``."""
+    h, w = int(shape[0]), int(shape[1])
+    mode = os.getenv("IMAGE_DXF_TILED", "auto").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return None
+    if mode not in ("1", "true", "yes", "on"):
+        min_mpx = _env_float("IMAGE_DXF_TILED_MIN_MPX", 100.0)
+        if min_mpx <= 0 or h * w < min_mpx * 1e6:
+            return None
+    return tile_plan(
+        (h, w),
+        max_mb=_env_float("IMAGE_DXF_TILE_MAX_MB", 512.0),
+        overlap=_env_int("IMAGE_DXF_TILE_OVERLAP", 64),
+        workers=_env_int("IMAGE_DXF_TILE_WORKERS", 0),
+        tile=_env_int("IMAGE_DXF_TILE_SIZE", 0),
+    )
+
+
+def _tiled_filtered_mask(
+    gray,
+    *,
+    blur_kernel: int,
+    adaptive: tuple[int, int] | None,
+    fg_fallback: bool,
+    morph_kernel: int,
+    cc: tuple[int, int, int] | None,
+    plan: TilePlan,
+):
+    """Full-size mask built tile by tile; the same pixels as the whole-image stages.
+
+    Each tile is read with enough halo for blur, adaptive threshold and closing to
+    see their whole neighbourhood. Image-wide decisions (Otsu level, foreground
+    ratio, component stats) are made from per-tile histograms/counts and banded
+    labelling, and the component filter runs in place on the mask.
+    """
+    import cv2
+    import numpy as np
+
+    h, w = int(gray.shape[0]), int(gray.shape[1])
+    cores = list(iter_tiles(h, w, plan.tile))
+    thr_halo = blur_kernel // 2 + (adaptive[0] // 2 if adaptive is not None else 0) + 1
+
+    def jobs(halo: int):
+        for core in cores:
+            (oy0, oy1, ox0, ox1), inner = with_halo(core, halo, h, w)
+            yield gray[oy0:oy1, ox0:ox1], inner
+
+    method = adaptive
+    otsu_t = 0
+    if adaptive is None or fg_fallback:
+        fg = 0
+        hist = np.zeros(256, dtype=np.int64)
+        stats_fn = partial(threshold_stats_tile, blur_kernel=blur_kernel, adaptive=adaptive if fg_fallback else None)
+        for f, hh in map_tiles(stats_fn, jobs(thr_halo), workers=plan.workers):
+            fg += f
+            hist += hh
+        otsu_t = otsu_threshold_from_hist(hist)
+        if adaptive is not None:
+            ratio = fg / float(h * w)
+            if ratio < 0.0005 or ratio > 0.5:
+                ratio2 = float(hist[: otsu_t + 1].sum()) / float(h * w)
+                if 0.0005 <= ratio2 <= 0.5:
+                    method = None
+
+    halo = blur_kernel // 2 + (method[0] // 2 if method is not None else 0) + 2 * (morph_kernel // 2) + 1
+    mask_fn = partial(
+        mask_tile, blur_kernel=blur_kernel, adaptive=method, otsu_thresh=otsu_t, morph_kernel=morph_kernel
+    )
+    plane = np.empty((h, w), dtype=np.uint8)
+    for (y0, y1, x0, x1), m in zip(cores, map_tiles(mask_fn, jobs(halo), workers=plan.workers)):
+        plane[y0:y1, x0:x1] = m
+
+    if cc is not None:
+        tables = _banded_component_drop_tables(
+            plane, band_rows=plan.band_rows, min_area=cc[0], thin_px=cc[1], long_px=cc[2]
+        )
+        for y0, y1, drop in tables:
+            if drop.any():
+                _, labels = cv2.connectedComponents(plane[y0:y1], connectivity=8)
+                plane[y0:y1][drop[labels]] = 0
+                del labels
+    return plane
+
+
+def _tiled_mask_stage(
+    graph: StageGraph,
+    gray,
+    *,
+    source: tuple,
+    blur_kernel: int,
+    morph_close: bool,
+    morph_kernel: int,
+    plan: TilePlan,
+    detection: bool,
+):
+    """Tiled counterpart of blur → threshold → morph (→ components when ``detection``)."""
+    kb = _odd_kernel(blur_kernel)
+    adaptive = (_odd_kernel(_env_int("IMAGE_DXF_ADAPTIVE_BLOCK", 35)), _env_int("IMAGE_DXF_ADAPTIVE_C", 10))
+    if detection and not _env_bool("IMAGE_DXF_BINARIZE", True):
+        adaptive = None
+    mk = _odd_kernel(morph_kernel) if morph_close else 0
+    cc = None
+    if detection and _env_bool("IMAGE_DXF_FILTER_COMPONENTS", True):
+        cc = (
+            _env_int("IMAGE_DXF_CC_MIN_AREA", 50),
+            _env_int("IMAGE_DXF_CC_THIN_PX", 4),
+            _env_int("IMAGE_DXF_CC_LONG_PX", 250),
+        )
+    key = (source, kb, adaptive, detection, mk, cc, plan)
+    mask = graph.run(
+        "tiled_mask",
+        key,
+        lambda: _tiled_filtered_mask(
+            gray, blur_kernel=kb, adaptive=adaptive, fg_fallback=detection, morph_kernel=mk, cc=cc, plan=plan
+        ),
+    )
+    return ("tiled_mask", *key), mask
+
+
+def _tiled_hough(mask, *, params: DetectParams, plan: TilePlan):
+    import numpy as np
+
+    h, w = int(mask.shape[0]), int(mask.shape[1])
+    hough_fn = partial(
+        hough_tile,
+        canny_low=int(params.canny_low),
+        canny_high=int(params.canny_high),
+        threshold=int(params.hough_threshold),
+        min_line=int(params.min_line),
+        max_gap=int(params.max_gap),
+    )
+
+    def jobs():
+        for core in iter_tiles(h, w, plan.tile):
+            (oy0, oy1, ox0, ox1), inner = with_halo(core, plan.overlap, h, w)
+            yield mask[oy0:oy1, ox0:ox1], inner, (oy0, ox0)
+
+    parts = list(map_tiles(hough_fn, jobs(), workers=plan.workers))
+    segs = np.concatenate(parts, axis=0) if parts else np.zeros((0, 4), dtype=np.int32)
+    segs = stitch_seam_segments(segs, tile=plan.tile, overlap=plan.overlap, h=h, w=w)
+    if segs.shape[0] == 0:
+        return None
+    return segs.reshape(-1, 1, 4)
+
+
+def _tiled_canny(mask, *, canny_low: int, canny_high: int, plan: TilePlan):
+    import numpy as np
+
+    h, w = int(mask.shape[0]), int(mask.shape[1])
+    cores = list(iter_tiles(h, w, plan.tile))
+
+    def jobs():
+        for core in cores:
+            (oy0, oy1, ox0, ox1), inner = with_halo(core, 2, h, w)
+            yield mask[oy0:oy1, ox0:ox1], inner
+
+    fn = partial(canny_tile, canny_low=canny_low, canny_high=canny_high)
+    edges = np.empty((h, w), dtype=np.uint8)
+    for (y0, y1, x0, x1), e in zip(cores, map_tiles(fn, jobs(), workers=plan.workers)):
+        edges[y0:y1, x0:x1] = e
+    return edges
+
+
+def _tiled_canny_hough_stages(gray, *, params: DetectParams, graph: StageGraph, source: tuple, plan: TilePlan):
+    """Tiled detection with the same (mask, edges, lines) as the whole-image stages.
+
+    Mask and edges are built per tile and are pixel-identical to the untiled ones;
+    Hough then runs once over the edge plane, so the ladder sees the same raw line
+    counts. ``IMAGE_DXF_TILE_HOUGH=tile`` runs Canny and Hough per tile as well and
+    stitches seam segments instead: less memory and parallel, but the raw segments
+    (and so the ladder's choice on borderline images) can differ.
+    """
+    mask_node, mask = _tiled_mask_stage(
+        graph,
+        gray,
+        source=source,
+        blur_kernel=params.blur_kernel,
+        morph_close=params.morph_close,
+        morph_kernel=params.morph_kernel,
+        plan=plan,
+        detection=True,
+    )
+    if params.line_engine == "rle":
+        lines_node, edges, lines = _rle_hough_stages(
+            graph,
+            mask_node,
+            mask,
+            params=params,
+            canny=lambda m, lo, hi: _tiled_canny(m, canny_low=lo, canny_high=hi, plan=plan),
+        )
+        return lines_node, mask, edges, lines
+    if os.getenv("IMAGE_DXF_TILE_HOUGH", "global").strip().lower() == "tile":
+        hough_key = (
+            mask_node,
+            int(params.canny_low),
+            int(params.canny_high),
+            int(params.hough_threshold),
+            int(params.min_line),
+            int(params.max_gap),
+        )
+        lines = graph.run("tiled_hough", hough_key, lambda: _tiled_hough(mask, params=params, plan=plan))
+        return ("tiled_hough", *hough_key), mask, None, lines
+
+    canny_key = (mask_node, int(params.canny_low), int(params.canny_high))
+    edges = graph.run(
+        "canny", canny_key, lambda: _tiled_canny(mask, canny_low=canny_key[1], canny_high=canny_key[2], plan=plan)
+    )
+    hough_key = (("canny", *canny_key), int(params.hough_threshold), int(params.min_line), int(params.max_gap))
+    lines = graph.run("hough", hough_key, lambda: _hough_lines(edges, *hough_key[1:]))
+    return ("hough", *hough_key), mask, edges, lines
+
+
+def _hough_lines(edges, threshold: int, min_line: int, max_gap: int):
+    import cv2
+    import numpy as np
+
+    return cv2.HoughLinesP(
+        edges, rho=1, theta=np.pi / 180.0, threshold=threshold, minLineLength=min_line, maxLineGap=max_gap
+    )
+
+
+def _rle_hough_stages(graph: StageGraph, mask_node: tuple, mask, *, params: DetectParams, canny):
+    """Run-length wall rectangles on ``mask``, then Canny → Hough only on the pixels they leave.
+
+    Horizontal and vertical strokes become segments straight from the row and
+    column runs (see ``worker.rle_lines``); diagonals, arcs and anything else
+    not claimed by a wall rectangle still go through ``HoughLinesP``. The result
+    has the Hough layout, so the ladder and the merge step treat both engines
+    alike. Returns (lines node, leftover edges, lines).
+    """
     import numpy as np
 
-    blur_k = _odd_kernel(params.blur_kernel)
-    blur = cv2.GaussianBlur(gray, (blur_k, blur_k), 0)
+    from worker.rle_lines import rle_wall_lines
+
+    tol = max(0, _env_int("IMAGE_DXF_RLE_TOL", 2))
+    # A wall must be as long as the Hough vote threshold too, so both engines accept the same strokes.
+    rle_key = (mask_node, max(int(params.min_line), int(params.hough_threshold)), tol)
+    segs, leftover = graph.run("rle", rle_key, lambda: rle_wall_lines(mask, min_len=rle_key[1], tol=tol))
+
+    canny_key = (("rle", *rle_key), int(params.canny_low), int(params.canny_high))
+    edges = graph.run("canny", canny_key, lambda: canny(leftover, canny_key[1], canny_key[2]))
+
+    hough_key = (("canny", *canny_key), int(params.hough_threshold), int(params.min_line), int(params.max_gap))
+
+    def _lines():
+        rest = _hough_lines(edges, *hough_key[1:])
+        if rest is not None:
+            return np.concatenate([segs, rest.astype(np.int32).reshape(-1, 1, 4)], axis=0)
+        return segs if segs.shape[0] else None
+
+    lines = graph.run("hough", hough_key, _lines)
+    return ("hough", *hough_key), edges, lines
+
+
+def _canny_hough_stages(
+    gray,
+    *,
+    params: DetectParams,
+    graph: StageGraph,
+    source: tuple,
+    plan: TilePlan | None = None,
+    pyramid: int = 1,
+):
+    """blur → threshold → morph → components → Canny → Hough, memoized on ``graph``.
+
+    Returns the node key of the Hough output along with (mask, edges, lines).
+    With a tile ``plan`` the same stages run per overlapping tile and edges is None.
+    With ``pyramid`` > 1 they run on the 1/``pyramid`` image instead and the lines
+    are refined at full resolution (see ``_pyramid_canny_hough_stages``).
+    With ``params.line_engine == "rle"`` the Canny/Hough tail is replaced by
+    ``_rle_hough_stages``.
+    """
+    if plan is not None:
+        return _tiled_canny_hough_stages(gray, params=params, graph=graph, source=source, plan=plan)
+    if pyramid > 1:
+        return _pyramid_canny_hough_stages(gray, params=params, graph=graph, source=source, factor=pyramid)
+
+    mask_node, mask = _filtered_mask_stages(gray, params=params, graph=graph, source=source)
+    return _line_stages(graph, mask_node, mask, params=params)
+
+
+def _filtered_mask_stages(gray, *, params: DetectParams, graph: StageGraph, source: tuple, scale: int = 1):
+    """blur → threshold → morph → components; ``scale`` shrinks the pixel-size knobs for a 1/``scale`` image."""
+    blur_node, blur = _blur_stage(graph, gray, source=source, kernel=params.blur_kernel)
 
     use_binarize = _env_bool("IMAGE_DXF_BINARIZE", True)
     if use_binarize:
-        block = _odd_kernel(_env_int("IMAGE_DXF_ADAPTIVE_BLOCK", 35))
-        c = _env_int("IMAGE_DXF_ADAPTIVE_C", 10)
-        mask = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, c)
+        mask_node, mask = _adaptive_threshold_stage(graph, blur_node, blur, scale=scale)
     else:
-        _, mask = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        mask_node, mask = _otsu_threshold_stage(graph, blur_node, blur)
 
-    fg_ratio = float((mask > 0).mean())
+    fg_ratio = graph.run("fg_ratio", (mask_node,), lambda: float((mask > 0).mean()))
     if fg_ratio < 0.0005 or fg_ratio > 0.5:
-        _, mask2 = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        fg_ratio2 = float((mask2 > 0).mean())
+        otsu_node, otsu = _otsu_threshold_stage(graph, blur_node, blur)
+        fg_ratio2 = graph.run("fg_ratio", (otsu_node,), lambda: float((otsu > 0).mean()))
         if 0.0005 <= fg_ratio2 <= 0.5:
-            mask = mask2
+            mask_node, mask = otsu_node, otsu
 
     if params.morph_close:
-        mk = _odd_kernel(params.morph_kernel)
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (mk, mk))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask_node, mask = _morph_close_stage(graph, mask_node, mask, kernel=params.morph_kernel)
 
-    min_area = _env_int("IMAGE_DXF_CC_MIN_AREA", 50)
-    thin_px = _env_int("IMAGE_DXF_CC_THIN_PX", 4)
-    long_px = _env_int("IMAGE_DXF_CC_LONG_PX", 250)
     if _env_bool("IMAGE_DXF_FILTER_COMPONENTS", True):
-        mask = _remove_small_and_thin_components(mask, min_area=min_area, thin_px=thin_px, long_px=long_px)
+        cc = (
+            max(1, _env_int("IMAGE_DXF_CC_MIN_AREA", 50) // (scale * scale)),
+            max(1, _env_int("IMAGE_DXF_CC_THIN_PX", 4) // scale),
+            max(1, _env_int("IMAGE_DXF_CC_LONG_PX", 250) // scale),
+            _env_int("IMAGE_DXF_CC_BAND_ROWS", 0),
+        )
+        src = mask
+        key = (mask_node, *cc)
+        mask = graph.run(
+            "components",
+            key,
+            lambda: _remove_small_and_thin_components(
+                src, min_area=cc[0], thin_px=cc[1], long_px=cc[2], band_rows=cc[3]
+            ),
+        )
+        mask_node = ("components", *key)
+    return mask_node, mask
 
-    edges = cv2.Canny(mask, int(params.canny_low), int(params.canny_high))
-    lines = cv2.HoughLinesP(
-        edges,
-        rho=1,
-        theta=np.pi / 180.0,
-        threshold=int(params.hough_threshold),
-        minLineLength=int(params.min_line),
-        maxLineGap=int(params.max_gap),
-    )
+
+def _line_stages(graph: StageGraph, mask_node: tuple, mask, *, params: DetectParams):
+    """Canny → Hough (or the ``rle`` engine) on a filtered mask; returns (lines node, mask, edges, lines)."""
+    import cv2
+
+    if params.line_engine == "rle":
+        lines_node, edges, lines = _rle_hough_stages(graph, mask_node, mask, params=params, canny=cv2.Canny)
+        return lines_node, mask, edges, lines
+
+    filtered = mask
+    canny_key = (mask_node, int(params.canny_low), int(params.canny_high))
+    edges = graph.run("canny", canny_key, lambda: cv2.Canny(filtered, canny_key[1], canny_key[2]))
+
+    hough_key = (("canny", *canny_key), int(params.hough_threshold), int(params.min_line), int(params.max_gap))
+    lines = graph.run("hough", hough_key, lambda: _hough_lines(edges, *hough_key[1:]))
+    return ("hough", *hough_key), mask, edges, lines
+
+
+def _pyramid_stage(graph: StageGraph, gray, *, source: tuple, factor: int):
+    key = (source, int(factor))
+    return ("pyramid", *key), graph.run("pyramid", key, lambda: downsample(gray, factor))
+
+
+def _pyramid_canny_hough_stages(gray, *, params: DetectParams, graph: StageGraph, source: tuple, factor: int):
+    """Coarse detection: the usual stages on the 1/``factor`` image, lines mapped back to full resolution.
+
+    Every stage up to Hough (or the ``rle`` engine) runs on the downsampled gray
+    with lengths, gaps and votes scaled down, so the ladder's raw line counts
+    mean the same as at full resolution. The lines are only as precise as the
+    coarse grid; ``_merged_segments`` refines the merged walls against the
+    full-resolution gray. Returns full-resolution lines with the
+    low-resolution mask and edges.
+    """
+    small_node, small = _pyramid_stage(graph, gray, source=source, factor=factor)
+    low = _pyramid_detect_params(params, factor)
+    mask_node, mask = _filtered_mask_stages(small, params=low, graph=graph, source=small_node, scale=factor)
+    lines_node, mask, edges, lines = _line_stages(graph, mask_node, mask, params=low)
+    if lines is not None:
+        lines = to_full_resolution(lines, factor).reshape(-1, 1, 4)
+    return lines_node, mask, edges, lines
+
+
+def _run_canny_hough(gray, *, params: DetectParams, graph: StageGraph | None = None, source: tuple = ("gray",)):
+    _, mask, edges, lines = _canny_hough_stages(gray, params=params, graph=graph or StageGraph(), source=source)
     return mask, edges, lines
 
 
-def _save_debug_images(*, out_dir: Path, gray, edges, color, lines) -> None:
+def _run_ladder_variant(
+    gray,
+    *,
+    name: str,
+    params: DetectParams,
+    graph: StageGraph,
+    source: tuple,
+    plan: TilePlan | None = None,
+    pyramid: int = 1,
+) -> LadderRun:
+    t0 = time.perf_counter()
+    lines_node, mask, edges, lines = _canny_hough_stages(
+        gray, params=params, graph=graph, source=source, plan=plan, pyramid=pyramid
+    )
+    raw_count = 0 if lines is None else int(lines.reshape(-1, 4).shape[0])
+    return LadderRun(
+        name=name,
+        params=params,
+        mask=mask,
+        edges=edges,
+        lines=lines,
+        raw_count=raw_count,
+        elapsed_ms=(time.perf_counter() - t0) * 1000.0,
+        lines_node=lines_node,
+        scale=1 if plan is not None else max(1, int(pyramid)),
+    )
+
+
+def _run_detection_ladder(
+    gray,
+    *,
+    params: DetectParams,
+    graph: StageGraph | None = None,
+    source: tuple = ("gray",),
+    plan: TilePlan | None = None,
+    pyramid: int = 1,
+    start: str = "default",
+) -> tuple[LadderRun, list[LadderRun]]:
+    """Run the default → aggressive → strict ladder and return (selected, all runs).
+
+    ``start`` names a rung to try first (the pre-flight router's guess); it is
+    taken when its raw line count is in range, otherwise the ladder runs as usual.
+
+    With ``IMAGE_DXF_PARALLEL_LADDER`` every rung is started up front on a thread
+    pool (OpenCV releases the GIL), so the worst case costs about one pass; the
+    selection rules are the same as the sequential ladder either way. Rungs share
+    their common intermediates (blur/threshold/morph/components) through ``graph``.
+    """
+    graph = graph or StageGraph()
+    min_ok = _env_int("IMAGE_DXF_MIN_RAW_LINES", 5)
+    max_ok = _env_int("IMAGE_DXF_MAX_RAW_LINES", 800)
+    variants = {
+        "default": params,
+        "aggressive": _aggressive_detect_params(params),
+        "strict": _strict_detect_params(params),
+    }
+
+    if _env_bool("IMAGE_DXF_PARALLEL_LADDER", False):
+        workers = max(1, _env_int("IMAGE_DXF_LADDER_WORKERS", len(variants)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dxf-ladder") as pool:
+            # Each rung runs in a copy of the caller's context, so a cancelled caller stops its rungs too.
+            futures = {
+                name: pool.submit(
+                    contextvars.copy_context().run,
+                    _run_ladder_variant,
+                    gray,
+                    name=name,
+                    params=p,
+                    graph=graph,
+                    source=source,
+                    plan=plan,
+                    pyramid=pyramid,
+                )
+                for name, p in variants.items()
+            }
+            runs = {name: f.result() for name, f in futures.items()}
+
+        def get(name: str) -> LadderRun:
+            return runs[name]
+
+    else:
+        runs = {}
+
+        def get(name: str) -> LadderRun:
+            if name not in runs:
+                runs[name] = _run_ladder_variant(
+                    gray, name=name, params=variants[name], graph=graph, source=source, plan=plan, pyramid=pyramid
+                )
+            return runs[name]
+
+    best = None
+    if start != "default" and start in variants:
+        hinted = get(start)
+        if min_ok <= hinted.raw_count <= max_ok:
+            best = hinted
+
+    if best is None:
+        best = get("default")
+        if best.raw_count < min_ok:
+            print("[WARN] Initial detection low. Retrying with aggressive parameters...")
+            aggressive = get("aggressive")
+            if aggressive.raw_count > best.raw_count:
+                best = aggressive
+
+        if best.raw_count > max_ok:
+            print("[WARN] Initial detection too noisy. Retrying with stricter parameters...")
+            strict = get("strict")
+            if 0 < strict.raw_count < best.raw_count:
+                best = strict
+
+    ran = list(runs.values())
+    logger.info(
+        "detection ladder selected=%s %s",
+        best.name,
+        " ".join(f"{r.name}={r.raw_count}lines/{r.elapsed_ms:.1f}ms" for r in ran),
+    )
+    return best, ran
+
+
+def _save_detection_debug_images(*, out_dir: Path, gray, edges, color, lines) -> None:
     import cv2
 
     out_dir.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(str(out_dir / "debug_01_gray.png"), gray)
-    cv2.imwrite(str(out_dir / "debug_02_edges.png"), edges)
+    if edges is not None:
+        cv2.imwrite(str(out_dir / "debug_02_edges.png"), edges)
 
     canvas = color.copy()
     if lines is not None:
@@ -351,89 +1133,99 @@ def _save_debug_images(*, out_dir: Path, gray, edges, color, lines) -> None:
     cv2.imwrite(str(out_dir / "debug_03_lines.png"), canvas)
 
 
-def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
+def _image_context(image_path: str | Path | None, image: ImageContext | None) -> ImageContext:
+    if image is not None:
+        return image
+    if image_path is None:
+        raise ImageToDxfError("缺少输入图片")
+    return ImageContext.from_path(image_path)
+
+
+def image_to_dxf(
+    *, image_path: str | Path | None = None, dxf_path: str | Path, image: ImageContext | None = None
+) -> ConversionResult:
     _ensure_deps()
     import cv2
 
-    img_path = Path(image_path)
+    ctx = _image_context(image_path, image)
     out_path = Path(dxf_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    graph = ctx.graph
 
-    color = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
-    if color is None:
-        raise ImageToDxfError(f"无法读取图片: {img_path}")
-    gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+    gray, source = ctx.gray, ctx.gray_node
     full_h = int(gray.shape[0])
+    pyramid = _pyramid_factor(gray.shape)
+    # The pyramid never builds a full-resolution mask, so there is nothing left to tile.
+    plan = _tile_plan_for(gray.shape) if pyramid == 1 else None
+    if plan is not None:
+        # Only the gray plane is needed from here on; let the decoded color image go.
+        graph.evict(ctx.decode_node)
 
     crop = _env_bool("IMAGE_DXF_CROP_FRAME", True)
     crop_margin = _env_int("IMAGE_DXF_CROP_MARGIN", 24)
+    off_x, off_y = 0, 0
     if crop:
-        blur_k0 = _odd_kernel(_env_int("IMAGE_DXF_BLUR_KERNEL", 3))
-        blur0 = cv2.GaussianBlur(gray, (blur_k0, blur_k0), 0)
-        block0 = _odd_kernel(_env_int("IMAGE_DXF_ADAPTIVE_BLOCK", 35))
-        c0 = _env_int("IMAGE_DXF_ADAPTIVE_C", 10)
-        mask0 = cv2.adaptiveThreshold(blur0, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block0, c0)
-        if _env_bool("IMAGE_DXF_MORPH_CLOSE", True):
-            mk0 = _odd_kernel(_env_int("IMAGE_DXF_MORPH_KERNEL", 3))
-            kernel0 = cv2.getStructuringElement(cv2.MORPH_RECT, (mk0, mk0))
-            mask0 = cv2.morphologyEx(mask0, cv2.MORPH_CLOSE, kernel0)
-        gray2, _, off_x, off_y = _detect_and_crop_frame(gray, mask0, margin_px=crop_margin)
+        if plan is not None:
+            mask_node0, mask0 = _tiled_mask_stage(
+                graph,
+                gray,
+                source=source,
+                blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL", 3),
+                morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE", True),
+                morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL", 3),
+                plan=plan,
+                detection=False,
+            )
+        else:
+            # In pyramid mode the frame is found on the 1/N image and its box scaled back up.
+            frame_gray, frame_source = gray, source
+            if pyramid > 1:
+                frame_source, frame_gray = _pyramid_stage(graph, gray, source=source, factor=pyramid)
+            blur_node0, blur0 = _blur_stage(
+                graph, frame_gray, source=frame_source, kernel=_env_int("IMAGE_DXF_BLUR_KERNEL", 3)
+            )
+            mask_node0, mask0 = _adaptive_threshold_stage(graph, blur_node0, blur0, scale=pyramid)
+            if _env_bool("IMAGE_DXF_MORPH_CLOSE", True):
+                mask_node0, mask0 = _morph_close_stage(
+                    graph, mask_node0, mask0, kernel=_env_int("IMAGE_DXF_MORPH_KERNEL", 3)
+                )
+        frame_mask = mask0
+        if pyramid > 1:
+            margin = -(-crop_margin // pyramid)
+            small2, _, sx0, sy0 = graph.run(
+                "crop",
+                (mask_node0, margin),
+                lambda: _detect_and_crop_frame(frame_gray, frame_mask, margin_px=margin),
+            )
+            off_x, off_y = sx0 * pyramid, sy0 * pyramid
+            if (sx0 or sy0) or (small2.shape != frame_gray.shape):
+                hh, ww = small2.shape[0] * pyramid, small2.shape[1] * pyramid
+                gray2 = gray[off_y : off_y + hh, off_x : off_x + ww]
+            else:
+                gray2 = gray
+        else:
+            gray2, _, off_x, off_y = graph.run(
+                "crop",
+                (mask_node0, crop_margin),
+                lambda: _detect_and_crop_frame(gray, frame_mask, margin_px=crop_margin),
+            )
+        if plan is not None:
+            del frame_mask, mask0
+            graph.evict(mask_node0)
         if (off_x or off_y) or (gray2.shape != gray.shape):
             hh, ww = gray2.shape[:2]
             gray = gray2
-            color = color[off_y : off_y + hh, off_x : off_x + ww]
-    else:
-        off_x, off_y = 0, 0
-
-    params = DetectParams(
-        blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL", 3),
-        morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE", True),
-        morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL", 3),
-        canny_low=_env_int("IMAGE_DXF_CANNY_LOW", 25),
-        canny_high=_env_int("IMAGE_DXF_CANNY_HIGH", 75),
-        hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD", 25),
-        min_line=_env_int("IMAGE_DXF_MIN_LINE", 10),
-        max_gap=_env_int("IMAGE_DXF_MAX_GAP", 25),
+            source = ("crop", source, off_x, off_y, ww, hh)
+            if pyramid > 1:
+                # The crop is block-aligned, so its pyramid is the same crop of the one already built.
+                graph.run("pyramid", (source, pyramid), lambda: small2)
+
+    params = _default_detect_params()
+    start = _preflight(ctx).rung if _preflight_routing() else "default"
+    selected, _ = _run_detection_ladder(
+        gray, params=params, graph=graph, source=source, plan=plan, pyramid=pyramid, start=start
     )
-
-    mask, edges, lines = _run_canny_hough(gray, params=params)
-    raw_count = 0 if lines is None else int(lines.reshape(-1, 4).shape[0])
-
-    min_ok = _env_int("IMAGE_DXF_MIN_RAW_LINES", 5)
-    if raw_count < min_ok:
-        print("[WARN] Initial detection low. Retrying with aggressive parameters...")
-        aggressive = DetectParams(
-            blur_kernel=params.blur_kernel,
-            morph_close=params.morph_close,
-            morph_kernel=params.morph_kernel,
-            canny_low=_env_int("IMAGE_DXF_CANNY_LOW_AGG", 10),
-            canny_high=_env_int("IMAGE_DXF_CANNY_HIGH_AGG", 50),
-            hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD_AGG", 15),
-            min_line=_env_int("IMAGE_DXF_MIN_LINE_AGG", max(6, params.min_line // 2)),
-            max_gap=_env_int("IMAGE_DXF_MAX_GAP_AGG", max(35, params.max_gap)),
-        )
-        mask2, edges2, lines2 = _run_canny_hough(gray, params=aggressive)
-        raw_count2 = 0 if lines2 is None else int(lines2.reshape(-1, 4).shape[0])
-        if raw_count2 > raw_count:
-            mask, edges, lines, raw_count = mask2, edges2, lines2, raw_count2
-
-    max_ok = _env_int("IMAGE_DXF_MAX_RAW_LINES", 800)
-    if raw_count > max_ok:
-        print("[WARN] Initial detection too noisy. Retrying with stricter parameters...")
-        strict = DetectParams(
-            blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL_STRICT", max(5, params.blur_kernel)),
-            morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE_STRICT", params.morph_close),
-            morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL_STRICT", params.morph_kernel),
-            canny_low=_env_int("IMAGE_DXF_CANNY_LOW_STRICT", 40),
-            canny_high=_env_int("IMAGE_DXF_CANNY_HIGH_STRICT", 120),
-            hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD_STRICT", 70),
-            min_line=_env_int("IMAGE_DXF_MIN_LINE_STRICT", 60),
-            max_gap=_env_int("IMAGE_DXF_MAX_GAP_STRICT", 12),
-        )
-        mask3, edges3, lines3 = _run_canny_hough(gray, params=strict)
-        raw_count3 = 0 if lines3 is None else int(lines3.reshape(-1, 4).shape[0])
-        if 0 < raw_count3 < raw_count:
-            mask, edges, lines, raw_count = mask3, edges3, lines3, raw_count3
+    mask, edges, lines, raw_count = selected.mask, selected.edges, selected.lines, selected.raw_count
 
     fallback_contour = _env_bool("IMAGE_DXF_FALLBACK_CONTOUR", True)
     fallback_contours = []
@@ -444,9 +1236,11 @@ def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
         if not fallback_contours:
             inv = cv2.bitwise_not(mask)
             fallback_contours, _ = cv2.findContours(inv, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if fallback_contours and selected.scale > 1:
+            k = selected.scale
+            fallback_contours = [c * k + k // 2 for c in fallback_contours]
         if not fallback_contours:
-            blur_k = _odd_kernel(params.blur_kernel)
-            blur = cv2.GaussianBlur(gray, (blur_k, blur_k), 0)
+            _, blur = _blur_stage(graph, gray, source=source, kernel=params.blur_kernel)
             _, b1 = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             fallback_contours, _ = cv2.findContours(b1, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             if not fallback_contours:
@@ -460,28 +1254,77 @@ def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
     debug = _env_bool("IMAGE_DXF_DEBUG", False)
     if debug:
         debug_dir = os.getenv("IMAGE_DXF_DEBUG_DIR", "").strip()
-        out_dir = Path(debug_dir) if debug_dir else img_path.parent
-        _save_debug_images(out_dir=out_dir, gray=gray, edges=edges, color=color, lines=lines)
+        out_dir = Path(debug_dir) if debug_dir else (ctx.path.parent if ctx.path is not None else out_path.parent)
+        hh, ww = gray.shape[:2]
+        color = ctx.color[off_y : off_y + hh, off_x : off_x + ww]
+        _save_detection_debug_images(out_dir=out_dir, gray=gray, edges=edges, color=color, lines=lines)
 
     h = full_h
     mm_per_px = _env_float("IMAGE_DXF_MM_PER_PX", 10.0)
 
-    import ezdxf
-    doc = ezdxf.new(dxfversion="R2010")
-    doc.header["$INSUNITS"] = 4
-    msp = doc.modelspace()
-    if not doc.layers.has_entry("WALL"):
-        doc.layers.new(name="WALL")
-
+    segs = axes = None
     if lines is not None and raw_count > 0:
-        angle_tol = _env_float("IMAGE_DXF_MERGE_ANGLE_TOL", 5.0)
-        dist_tol = _env_float("IMAGE_DXF_MERGE_DIST_TOL", 10.0)
-        gap_tol = _env_float("IMAGE_DXF_MERGE_GAP_TOL", float(params.max_gap))
-        min_merged = _env_float("IMAGE_DXF_MIN_MERGED_LINE_PX", float(params.min_line))
-        do_merge = _env_bool("IMAGE_DXF_MERGE", True)
+        if _vectorize_mode() == "axis":
+            eps, min_len = _axis_params(float(selected.scale) ** 2)
+            axes = graph.run(
+                "axes",
+                (selected.lines_node, eps, min_len),
+                lambda: trace_wall_axes(mask, eps_px=eps, min_len_px=min_len),
+            )
+        else:
+            segs = _merged_segments(graph, selected, gray)
+    with graph.timed("emit", str(out_path)):
+        doc = _emit_opencv_dxf(
+            out_path=out_path,
+            segs=segs,
+            axes=axes,
+            axes_scale=selected.scale,
+            fallback_contours=fallback_contours,
+            crop_shape=gray.shape,
+            off_x=off_x,
+            off_y=off_y,
+            h=h,
+            mm_per_px=mm_per_px,
+        )
+    logger.info("image_to_dxf stage timings: %s", _format_stage_totals(graph))
+    result = _conversion_result(out_path, doc, graph)
+    result.intermediates = {"mask": mask, "edges": edges}
+    return result
+
+
+def _format_stage_totals(graph: StageGraph) -> str:
+    return " ".join(f"{k}={v:.1f}ms" for k, v in graph.stage_totals().items())
+
+
+def _merged_segments(graph: StageGraph, selected: LadderRun, gray=None):
+    """Merged (and orthogonalized) wall segments of the selected rung.
+
+    Lines found on a pyramid level (``selected.scale`` > 1) are merged in
+    full-resolution coordinates and each merged wall is then refined against
+    ``gray`` within ``IMAGE_DXF_PYRAMID_BAND`` px (default: the scale) of it, so
+    only the few merged walls, not every raw candidate, touch full resolution.
+    """
+    params = selected.params
+    angle_tol = _env_float("IMAGE_DXF_MERGE_ANGLE_TOL", 5.0)
+    dist_tol = _env_float("IMAGE_DXF_MERGE_DIST_TOL", 10.0)
+    gap_tol = _env_float("IMAGE_DXF_MERGE_GAP_TOL", float(params.max_gap))
+    min_merged = _env_float("IMAGE_DXF_MIN_MERGED_LINE_PX", float(params.min_line))
+    do_merge = _env_bool("IMAGE_DXF_MERGE", True)
+    merge_engine = os.getenv("IMAGE_DXF_MERGE_ENGINE", "bucket").strip().lower()
+    do_ortho = _env_bool("IMAGE_DXF_ORTHO", True)
+    ortho_tol = _env_float("IMAGE_DXF_ORTHO_TOL", 5.0)
+    refine = selected.scale > 1 and gray is not None
+    band = max(1, _env_int("IMAGE_DXF_PYRAMID_BAND", selected.scale)) if refine else 0
+    lines = selected.lines
+
+    def _merge():
+        if merge_engine == "pairwise":
+            merge_lines = _merge_lines_pairwise
+        else:
+            from worker.line_merge import merge_lines_bucketed as merge_lines
 
         segs = (
-            _merge_lines_pairwise(
+            merge_lines(
                 lines,
                 angle_tol_deg=angle_tol,
                 dist_tol_px=dist_tol,
@@ -491,12 +1334,106 @@ def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
             if do_merge
             else lines.reshape(-1, 4).astype("float64")
         )
-
-        do_ortho = _env_bool("IMAGE_DXF_ORTHO", True)
-        ortho_tol = _env_float("IMAGE_DXF_ORTHO_TOL", 5.0)
+        if refine and segs.size:
+            segs = refine_segments(
+                gray,
+                segs,
+                band=band,
+                blur_kernel=_odd_kernel(params.blur_kernel),
+                canny_low=params.canny_low,
+                canny_high=params.canny_high,
+            )
         if do_ortho and segs.size:
             segs = _orthogonalize_lines(segs, tol_deg=ortho_tol)
+        return segs
+
+    key = (
+        selected.lines_node,
+        do_merge,
+        merge_engine,
+        angle_tol,
+        dist_tol,
+        gap_tol,
+        min_merged,
+        do_ortho,
+        ortho_tol,
+        band,
+    )
+    return graph.run("merge", key, _merge)
+
+
+def _axis_params(cell_area: float = 1.0) -> tuple[float, float]:
+    """Douglas-Peucker tolerance and minimum axis length for ``trace_wall_axes``, in mask pixels.
+
+    Both are configured in source pixels; ``cell_area`` is source pixels per mask pixel.
+    """
+    cell = float(cell_area) ** 0.5
+    eps = max(1.0, _env_float("IMAGE_DXF_AXIS_EPS_PX", 1.5) / cell)
+    min_len = _env_float("IMAGE_DXF_AXIS_MIN_LEN_PX", 20.0) / cell
+    return eps, min_len
+
+
+def _add_wall_axes(
+    msp,
+    axes,
+    *,
+    h: int,
+    mm_per_px: float,
+    sx: float = 1.0,
+    sy: float = 1.0,
+    off_x: float = 0.0,
+    off_y: float = 0.0,
+) -> None:
+    """One WALL_AXIS LWPOLYLINE per traced axis, each segment as wide as its measured wall.
+
+    Mask pixel (x, y) maps to source pixel ((x + 0.5) * sx - 0.5 + off_x, ...), as
+    for the WALL contours; a segment's thickness is scaled across its direction,
+    which matters when the mask grid is not square in source pixels.
+    """
+    import numpy as np
 
+    for axis in axes:
+        pts = axis.points
+        nxt = np.roll(pts, -1, axis=0)[: axis.segment_count]
+        d = nxt - pts[: axis.segment_count]
+        norm = np.maximum(np.hypot(d[:, 0], d[:, 1]), 1e-9)
+        across = np.hypot(d[:, 1] / norm * sx, d[:, 0] / norm * sy)
+        widths = np.zeros(pts.shape[0])
+        widths[: axis.segment_count] = axis.thickness * across * mm_per_px
+        xs = ((pts[:, 0] + 0.5) * sx - 0.5 + off_x) * mm_per_px
+        ys = (float(h) - ((pts[:, 1] + 0.5) * sy - 0.5 + off_y)) * mm_per_px
+        points = [(x, y, wd, wd, 0.0) for x, y, wd in zip(xs.tolist(), ys.tolist(), widths.tolist())]
+        msp.add_lwpolyline(points, format="xyseb", close=axis.closed, dxfattribs={"layer": "WALL_AXIS"})
+
+
+def _emit_opencv_dxf(
+    *,
+    out_path: Path,
+    segs,
+    fallback_contours,
+    crop_shape,
+    off_x: int,
+    off_y: int,
+    h: int,
+    mm_per_px: float,
+    axes=None,
+    axes_scale: int = 1,
+):
+    import ezdxf
+    doc = ezdxf.new(dxfversion="R2010")
+    doc.header["$INSUNITS"] = 4
+    msp = doc.modelspace()
+    if not doc.layers.has_entry("WALL"):
+        doc.layers.new(name="WALL")
+
+    if axes is not None:
+        if sum(a.segment_count for a in axes) < _env_int("IMAGE_DXF_MIN_MERGED_LINES", 4):
+            raise ImageClarityError("线条数量不足，疑似图片清晰度不足")
+        _ensure_layer(doc, "WALL_AXIS")
+        _add_wall_axes(
+            msp, axes, h=h, mm_per_px=mm_per_px, sx=axes_scale, sy=axes_scale, off_x=off_x, off_y=off_y
+        )
+    elif segs is not None:
         merged_count = int(segs.shape[0])
         min_merged_ok = _env_int("IMAGE_DXF_MIN_MERGED_LINES", 4)
         if merged_count < min_merged_ok:
@@ -515,7 +1452,7 @@ def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
     elif fallback_contours:
         import cv2
 
-        img_area = float(gray.shape[0] * gray.shape[1])
+        img_area = float(crop_shape[0] * crop_shape[1])
         keep = [c for c in fallback_contours if float(cv2.contourArea(c)) >= max(200.0, img_area * 0.002)]
         if not keep:
             raise ImageClarityError("线条数量不足，疑似图片清晰度不足")
@@ -539,7 +1476,63 @@ def image_to_dxf(*, image_path: str | Path, dxf_path: str | Path) -> Path:
     else:
         raise ImageClarityError("未检测到可用线条")
     doc.saveas(str(out_path))
-    return out_path
+    return doc
+
+
+def _summarize_modelspace(doc) -> tuple[dict[str, int], dict[str, int], tuple[float, float, float, float] | None]:
+    """Per-layer entity/segment counts and XY bounds, read from the in-memory modelspace.
+
+    INSERTs are bounded by their insertion point and scale, which is exact for the
+    unit-square opening blocks this module emits.
+    """
+    entities: dict[str, int] = {}
+    segments: dict[str, int] = {}
+    xs: list[float] = []
+    ys: list[float] = []
+    for e in doc.modelspace():
+        layer = str(getattr(e.dxf, "layer", "")).upper()
+        entities[layer] = entities.get(layer, 0) + 1
+        t = e.dxftype()
+        n = 0
+        if t == "LINE":
+            n = 1
+            xs += [float(e.dxf.start.x), float(e.dxf.end.x)]
+            ys += [float(e.dxf.start.y), float(e.dxf.end.y)]
+        elif t == "LWPOLYLINE":
+            pts = list(e.get_points("xy"))
+            if len(pts) >= 2:
+                n = len(pts) - 1
+                if bool(getattr(e, "closed", False)) and len(pts) >= 3:
+                    n += 1
+            xs += [float(p[0]) for p in pts]
+            ys += [float(p[1]) for p in pts]
+        elif t == "POLYLINE":
+            pts = [v.dxf.location for v in e.vertices]
+            if len(pts) >= 2:
+                n = len(pts) - 1
+                if bool(getattr(e, "is_closed", False)) and len(pts) >= 3:
+                    n += 1
+            xs += [float(p.x) for p in pts]
+            ys += [float(p.y) for p in pts]
+        elif t == "INSERT":
+            x0, y0 = float(e.dxf.insert.x), float(e.dxf.insert.y)
+            xs += [x0, x0 + float(e.dxf.xscale)]
+            ys += [y0, y0 + float(e.dxf.yscale)]
+        segments[layer] = segments.get(layer, 0) + n
+    bounds = (min(xs), min(ys), max(xs), max(ys)) if xs else None
+    return entities, segments, bounds
+
+
+def _conversion_result(out_path: Path, doc, graph: StageGraph) -> ConversionResult:
+    entities, segments, bounds = _summarize_modelspace(doc)
+    return ConversionResult(
+        path=out_path,
+        doc=doc,
+        layer_entities=entities,
+        layer_segments=segments,
+        bounds=bounds,
+        timings_ms=graph.stage_totals(),
+    )
 
 
 def _ensure_layer(doc, name: str) -> None:
@@ -564,14 +1557,52 @@ def _add_solid_hatch(msp, points, *, layer: str) -> None:
     hatch.paths.add_polyline_path(points, is_closed=True)
 
 
-def _dxf_from_class_map(*, class_map, h: int, w: int, mm_per_px: float, out_path: Path) -> Path:
+def _dxf_from_class_map(
+    *,
+    class_map,
+    h: int | None = None,
+    w: int | None = None,
+    mm_per_px: float,
+    out_path: Path,
+    image: ImageContext | None = None,
+    analysis: ClassMapAnalysis | None = None,
+) -> ConversionResult:
     _ensure_deps()
+
+    if image is not None and (h is None or w is None):
+        h, w = image.shape
+    graph = image.graph if image is not None else StageGraph()
+    with graph.timed("emit", str(out_path)):
+        doc = _class_map_doc(class_map=class_map, h=h, w=w, mm_per_px=mm_per_px, analysis=analysis)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        doc.saveas(str(out_path))
+    return _conversion_result(out_path, doc, graph)
+
+
+def _class_map_doc(*, class_map, h: int, w: int, mm_per_px: float, analysis: ClassMapAnalysis | None = None):
+    """DXF for a class map of the (h, w) source image.
+
+    ``analysis`` carries masks and contours already computed for this map (e.g.
+    by the usability check), so they are not recomputed here.
+
+    The map may be coarser than the source (the inference grid, see
+    ``IMAGE_DXF_SEG_NATIVE_GRID``): pixel thresholds are then converted to grid
+    cells and grid coordinates are scaled to source pixels (cell centres to cell
+    centres) instead of upsampling the masks, so vertices land within half a grid
+    cell of where the upsampled map would put them.
+
+    With ``IMAGE_DXF_VECTORIZE=axis`` the closed WALL mask is traced into
+    centrelines on WALL_AXIS (see ``_add_wall_axes``) instead of hatched outlines.
+    """
     import cv2
     import numpy as np
     import ezdxf
 
-    if class_map.shape[:2] != (h, w):
+    ch, cw = int(class_map.shape[0]), int(class_map.shape[1])
+    if ch > h or cw > w or ch == 0 or cw == 0:
         raise ImageToDxfError("Segmentation output size mismatch")
+    sx, sy = float(w) / float(cw), float(h) / float(ch)
+    cell_area = sx * sy
 
     doc = ezdxf.new(dxfversion="R2010")
     doc.header["$INSUNITS"] = 4
@@ -583,50 +1614,54 @@ def _dxf_from_class_map(*, class_map, h: int, w: int, mm_per_px: float, out_path
     _ensure_unit_square_block(doc, "WINDOW")
     _ensure_unit_square_block(doc, "DOOR")
 
-    wall_mask = (class_map == 1).astype(np.uint8) * 255
-    if wall_mask.max() == 0:
+    if analysis is None:
+        analysis = ClassMapAnalysis(class_map)
+    if analysis.pixels(1) == 0:
         raise ImageClarityError("Segmentation detected no WALL pixels")
 
-    close_k = _odd_kernel(_env_int("IMAGE_DXF_WALL_CLOSE_KERNEL", 7))
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (close_k, close_k))
-    wall_mask = cv2.morphologyEx(wall_mask, cv2.MORPH_CLOSE, kernel)
-
-    contours, _ = cv2.findContours(wall_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    if not contours:
-        raise ImageClarityError("Segmentation detected no WALL contours")
-
-    min_area_px = float(_env_float("IMAGE_DXF_WALL_MIN_AREA_PX", 800.0))
-    kept = [c for c in contours if float(cv2.contourArea(c)) >= min_area_px]
-    if not kept:
-        raise ImageClarityError("Segmentation WALL contours too small")
-
-    for c in kept:
-        peri = float(cv2.arcLength(c, True))
-        eps = float(_env_float("IMAGE_DXF_WALL_EPS_FRAC", 0.01)) * peri
-        approx = cv2.approxPolyDP(c, epsilon=eps, closed=True)
-        pts_px = [(float(p[0][0]), float(p[0][1])) for p in approx]
-        if len(pts_px) < 3:
-            continue
-        pts_mm = [(x * mm_per_px, (float(h) - y) * mm_per_px) for x, y in pts_px]
-        msp.add_lwpolyline(pts_mm, format="xy", close=True, dxfattribs={"layer": "WALL"})
-        _add_solid_hatch(msp, pts_mm, layer="WALL")
+    close_k = _odd_kernel(round(_env_int("IMAGE_DXF_WALL_CLOSE_KERNEL", 7) / cell_area**0.5))
+    if _vectorize_mode() == "axis":
+        eps, min_len = _axis_params(cell_area)
+        axes = trace_wall_axes(analysis.closed_mask(1, close_kernel=close_k), eps_px=eps, min_len_px=min_len)
+        if not axes:
+            raise ImageClarityError("Segmentation detected no WALL axes")
+        _ensure_layer(doc, "WALL_AXIS")
+        _add_wall_axes(msp, axes, h=h, mm_per_px=mm_per_px, sx=sx, sy=sy)
+    else:
+        contours, areas = analysis.contours(1, close_kernel=close_k)
+        if not contours:
+            raise ImageClarityError("Segmentation detected no WALL contours")
+
+        min_area_px = float(_env_float("IMAGE_DXF_WALL_MIN_AREA_PX", 800.0)) / cell_area
+        kept = [c for c, area in zip(contours, areas) if area >= min_area_px]
+        if not kept:
+            raise ImageClarityError("Segmentation WALL contours too small")
+
+        for c in kept:
+            peri = float(cv2.arcLength(c, True))
+            eps = float(_env_float("IMAGE_DXF_WALL_EPS_FRAC", 0.01)) * peri
+            approx = cv2.approxPolyDP(c, epsilon=eps, closed=True).reshape(-1, 2).astype(np.float64)
+            if len(approx) < 3:
+                continue
+            xs = ((approx[:, 0] + 0.5) * sx - 0.5) * mm_per_px
+            ys = (float(h) - ((approx[:, 1] + 0.5) * sy - 0.5)) * mm_per_px
+            pts_mm = list(zip(xs.tolist(), ys.tolist()))
+            msp.add_lwpolyline(pts_mm, format="xy", close=True, dxfattribs={"layer": "WALL"})
+            _add_solid_hatch(msp, pts_mm, layer="WALL")
 
     def _add_openings_for_class(cls: int, *, layer: str, block_name: str) -> None:
-        mask = (class_map == cls).astype(np.uint8) * 255
-        if mask.max() == 0:
-            return
-        contours2, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        min_area2 = float(_env_float("IMAGE_DXF_OPENING_MIN_AREA_PX", 200.0))
-        for cc in contours2:
-            if float(cv2.contourArea(cc)) < min_area2:
+        contours2, areas2 = analysis.contours(cls)
+        min_area2 = float(_env_float("IMAGE_DXF_OPENING_MIN_AREA_PX", 200.0)) / cell_area
+        for cc, area in zip(contours2, areas2):
+            if area < min_area2:
                 continue
             x, y, bw, bh = cv2.boundingRect(cc)
-            if bw <= 1 or bh <= 1:
+            if bw * sx <= 1.0 or bh * sy <= 1.0:
                 continue
-            x_mm = float(x) * mm_per_px
-            y_mm = (float(h) - float(y + bh)) * mm_per_px
-            w_mm = float(bw) * mm_per_px
-            h_mm = float(bh) * mm_per_px
+            x_mm = float(x) * sx * mm_per_px
+            y_mm = (float(h) - float(y + bh) * sy) * mm_per_px
+            w_mm = float(bw) * sx * mm_per_px
+            h_mm = float(bh) * sy * mm_per_px
             msp.add_blockref(
                 block_name,
                 (x_mm, y_mm),
@@ -635,32 +1670,60 @@ def _dxf_from_class_map(*, class_map, h: int, w: int, mm_per_px: float, out_path
 
     _add_openings_for_class(2, layer="WINDOW", block_name="WINDOW")
     _add_openings_for_class(3, layer="DOOR", block_name="DOOR")
-
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    doc.saveas(str(out_path))
-    return out_path
-
-
-def image_to_dxf_ml(*, image_path: str | Path, dxf_path: str | Path) -> Path:
+    return doc
+
+
+def _native_grid_enabled() -> bool:
+    return _env_bool("IMAGE_DXF_SEG_NATIVE_GRID", False)
+
+
+def _segment(ctx: ImageContext, *, native: bool = False):
+    """Class map for ``ctx`` from the warm per-process model, micro-batched when IMAGE_DXF_SEG_BATCHING is on.
+
+    Maps are persisted per image digest and model version (``worker.class_map_cache``),
+    so re-vectorizing the same image with different parameters skips the network.
+    A cached map is a read-only memory map. ``native=True`` returns the map on the
+    inference grid instead of upsampled to the source size.
+    """
+    from worker.class_map_cache import class_map_key, get_class_map_cache
+    from worker.seg_batching import batching_enabled, get_segmentation_batcher
+    from worker.segmentation import get_segmentation_model, has_random_weights, model_version
+
+    with ctx.graph.timed("segment", ctx.name):
+        batched = batching_enabled()
+        cache = get_class_map_cache()
+        key = None
+        if cache is not None:
+            version = model_version()
+            if batched:
+                version += f":bucket{_env_int('IMAGE_DXF_SEG_BUCKET', 32)}"
+            if native:
+                version += ":native"
+            key = class_map_key(ctx.digest(), version)
+            class_map = cache.get(key)
+            if class_map is not None:
+                return class_map
+        predict = get_segmentation_batcher().predict if batched else get_segmentation_model().predict
+        class_map = predict(ctx, native=True) if native else predict(ctx)
+        # The batcher serves the same default model; a random-init fallback must not fill the cache.
+        if cache is not None and not has_random_weights(get_segmentation_model()):
+            cache.put(key, class_map)
+        return class_map
+
+
+def image_to_dxf_ml(
+    *, image_path: str | Path | None = None, dxf_path: str | Path, image: ImageContext | None = None
+) -> ConversionResult:
     _ensure_deps()
-    import cv2
-
-    from worker.segmentation import LocalSegmentationModel
 
-    img_path = Path(image_path)
+    ctx = _image_context(image_path, image)
     out_path = Path(dxf_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    color = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
-    if color is None:
-        raise ImageToDxfError(f"无法读取图片: {img_path}")
-
-    h, w = int(color.shape[0]), int(color.shape[1])
     mm_per_px = _env_float("IMAGE_DXF_MM_PER_PX", 10.0)
 
-    model = LocalSegmentationModel()
-    class_map = model.predict(img_path)
-    return _dxf_from_class_map(class_map=class_map, h=h, w=w, mm_per_px=mm_per_px, out_path=out_path)
+    class_map = _segment(ctx, native=_native_grid_enabled())
+    return _dxf_from_class_map(class_map=class_map, mm_per_px=mm_per_px, out_path=out_path, image=ctx)
 
 
 def _find_static_root(p: Path) -> Path | None:
@@ -679,111 +1742,200 @@ def _extract_session_id_from_dxf_path(p: Path) -> str | None:
     return None
 
 
-def _save_debug_images(*, image_path: Path, output_dxf_path: Path, enable_ai: bool) -> None:
-    _ensure_deps()
-    import cv2
-    import numpy as np
+_DEBUG_ARTIFACT_NAMES = {
+    "gray": "debug_step1_gray.png",
+    "ai_mask": "debug_step2_ai_mask.png",
+    "edges": "debug_step3_opencv_edges.png",
+}
 
-    color = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-    if color is None:
-        return
-    gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
 
+def _debug_artifacts_enabled(requested: bool | None) -> bool:
+    """Per-request opt-in wins; otherwise IMAGE_DXF_DEBUG_ARTIFACTS, else a sampled fraction of requests."""
+    if requested is not None:
+        return bool(requested)
+    if _env_bool("IMAGE_DXF_DEBUG_ARTIFACTS", False):
+        return True
+    rate = _env_float("IMAGE_DXF_DEBUG_SAMPLE_RATE", 0.0)
+    return rate > 0.0 and random.random() < rate
+
+
+def _debug_dir_for(output_dxf_path: Path) -> Path:
     session_id = _extract_session_id_from_dxf_path(output_dxf_path) or uuid4().hex
     static_root = _find_static_root(output_dxf_path) or (Path(__file__).resolve().parents[1] / "static")
-    debug_dir = static_root / "debug" / session_id
-    debug_dir.mkdir(parents=True, exist_ok=True)
+    return static_root / "debug" / session_id
 
-    cv2.imwrite(str(debug_dir / "debug_step1_gray.png"), gray)
 
-    params = DetectParams(
-        blur_kernel=_env_int("IMAGE_DXF_BLUR_KERNEL", 3),
-        morph_close=_env_bool("IMAGE_DXF_MORPH_CLOSE", True),
-        morph_kernel=_env_int("IMAGE_DXF_MORPH_KERNEL", 3),
-        canny_low=_env_int("IMAGE_DXF_CANNY_LOW", 25),
-        canny_high=_env_int("IMAGE_DXF_CANNY_HIGH", 75),
-        hough_threshold=_env_int("IMAGE_DXF_HOUGH_THRESHOLD", 25),
-        min_line=_env_int("IMAGE_DXF_MIN_LINE", 10),
-        max_gap=_env_int("IMAGE_DXF_MAX_GAP", 25),
-    )
-    try:
-        _, edges, _ = _run_canny_hough(gray, params=params)
-    except Exception:
-        edges = np.zeros_like(gray)
-    cv2.imwrite(str(debug_dir / "debug_step3_opencv_edges.png"), edges)
+def _schedule_debug_images(*, output_dxf_path: Path, frames: dict[str, object]) -> list[Path]:
+    """Queue already-computed intermediates for the background writer; returns the accepted paths."""
+    from worker.debug_artifacts import get_debug_writer
 
-    ai_mask_path = debug_dir / "debug_step2_ai_mask.png"
-    cv2.imwrite(str(ai_mask_path), np.zeros_like(gray))
+    writer = get_debug_writer(max_pending=_env_int("IMAGE_DXF_DEBUG_QUEUE", 8))
+    debug_dir = _debug_dir_for(output_dxf_path)
+    scheduled: list[Path] = []
+    for key, name in _DEBUG_ARTIFACT_NAMES.items():
+        frame = frames.get(key)
+        if frame is None:
+            continue
+        path = debug_dir / name
+        if writer.submit(path, frame):
+            scheduled.append(path)
+    return scheduled
 
 
-def _ai_wall_mask_is_usable(wall_mask) -> bool:
-    import cv2
-    import numpy as np
+def _ai_wall_mask_is_usable(wall_mask, *, cell_area: float = 1.0) -> bool:
+    """Plausibility check of a WALL mask or of a class map's ``ClassMapAnalysis`` (class 1).
 
-    if wall_mask is None or wall_mask.size == 0:
+    ``cell_area`` is source pixels per mask pixel.
+    """
+    if wall_mask is None:
         return False
-    if int(np.max(wall_mask)) == 0:
+    analysis = wall_mask if isinstance(wall_mask, ClassMapAnalysis) else ClassMapAnalysis.from_mask(wall_mask)
+    if analysis.class_map.size == 0 or analysis.pixels(1) == 0:
         return False
-    h, w = int(wall_mask.shape[0]), int(wall_mask.shape[1])
-    nz = int(np.count_nonzero(wall_mask))
-    ratio = float(nz) / float(max(1, h * w))
+    ratio = analysis.ratio(1)
     min_ratio = float(_env_float("IMAGE_DXF_AI_MIN_RATIO", 0.002))
     max_ratio = float(_env_float("IMAGE_DXF_AI_MAX_RATIO", 0.7))
     if ratio < min_ratio or ratio > max_ratio:
         return False
-    contours, _ = cv2.findContours(wall_mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours, areas = analysis.contours(1)
     if not contours:
         return False
     max_contours = int(_env_int("IMAGE_DXF_AI_MAX_CONTOURS", 250))
-    min_large_area = float(_env_float("IMAGE_DXF_AI_MIN_LARGE_AREA_PX", 600.0))
-    large = [c for c in contours if float(cv2.contourArea(c)) >= min_large_area]
-    if not large:
+    min_large_area = float(_env_float("IMAGE_DXF_AI_MIN_LARGE_AREA_PX", 600.0)) / float(cell_area)
+    if not bool((areas >= min_large_area).any()):
         return False
     if len(contours) > max_contours and ratio < 0.2:
         return False
     return True
 
 
-def convert_image_to_dxf(image_path: str | Path, output_dxf_path: str | Path) -> Path:
+def _debug_frames(ctx: ImageContext, frames: dict[str, object], result: ConversionResult | None) -> dict[str, object]:
+    import numpy as np
+
     try:
-        use_ml = _env_bool("IMAGE_DXF_USE_LOCAL_SEG", True)
-        img_path = Path(image_path)
-        out_path = Path(output_dxf_path)
-        _save_debug_images(image_path=img_path, output_dxf_path=out_path, enable_ai=use_ml)
+        gray = ctx.gray
+    except ImageToDxfError:
+        return {}
+    out = {"gray": gray, "ai_mask": frames.get("ai_mask")}
+    if out["ai_mask"] is None:
+        out["ai_mask"] = np.zeros_like(gray)
+    elif out["ai_mask"].shape[:2] != gray.shape[:2]:
+        import cv2
+
+        # Native-grid masks are only upsampled here, for the debug image.
+        h, w = gray.shape[:2]
+        out["ai_mask"] = cv2.resize(out["ai_mask"], (w, h), interpolation=cv2.INTER_NEAREST)
+    if result is not None:
+        out["edges"] = result.intermediates.get("edges")
+    return out
+
+
+_ML_FALLBACK_ERRORS = (ImportError, ModuleNotFoundError, RuntimeError, ImageClarityError)
+
+
+def _speculative_enabled() -> bool:
+    """``IMAGE_DXF_SPECULATIVE``: run the OpenCV path alongside segmentation instead of after it (default off)."""
+    return _env_bool("IMAGE_DXF_SPECULATIVE", False)
+
+
+def _ml_convert(ctx: ImageContext, out_path: Path, frames: dict[str, object], *, accept=None) -> ConversionResult:
+    """The segmentation path; raises ``ImageClarityError`` when the wall mask fails the usability check.
+
+    ``accept`` is called once the mask has passed, before the DXF is built.
+    """
+    mm_per_px = _env_float("IMAGE_DXF_MM_PER_PX", 10.0)
+
+    class_map = _segment(ctx, native=_native_grid_enabled())
+    analysis = ClassMapAnalysis(class_map)
+    frames["ai_mask"] = analysis.mask(1)
+    cell_area = float(ctx.shape[0] * ctx.shape[1]) / float(max(1, class_map.shape[0] * class_map.shape[1]))
+    if not _ai_wall_mask_is_usable(analysis, cell_area=cell_area):
+        raise ImageClarityError("AI mask unusable, falling back to OpenCV")
+    if accept is not None:
+        accept()
+    out = _dxf_from_class_map(class_map=class_map, mm_per_px=mm_per_px, out_path=out_path, image=ctx, analysis=analysis)
+    out.image_shape = (int(ctx.shape[0]), int(ctx.shape[1]))
+    out.method = "ml"
+    return out
+
+
+def _opencv_convert(ctx: ImageContext, out_path: Path) -> ConversionResult:
+    out = image_to_dxf(dxf_path=out_path, image=ctx)
+    out.image_shape = (int(ctx.gray.shape[0]), int(ctx.gray.shape[1]))
+    out.method = "opencv"
+    return out
+
+
+def _mark_fallback(out: ConversionResult, error: BaseException) -> ConversionResult:
+    """Record on the OpenCV result ``out`` why the ML path was left."""
+    out.fallback = "unusable" if isinstance(error, ImageClarityError) else "failed"
+    out.fallback_error = f"{type(error).__name__}: {error}"
+    if out.fallback == "failed":
+        logger.warning("segmentation failed, converted with OpenCV instead: %s", out.fallback_error)
+    return out
 
-        if use_ml:
+
+def _speculative_convert(ctx: ImageContext, out_path: Path, frames: dict[str, object]) -> ConversionResult:
+    """Segmentation and OpenCV raced on the same ``ctx``: the ML result when its mask is usable, else OpenCV's.
+
+    Both paths share the request's stage graph, so the decode is done once. The
+    OpenCV side writes to a sibling file, moved over ``out_path`` only when it
+    wins and removed otherwise; it is cancelled as soon as the ML mask passes.
+    """
+    from worker.speculative import get_speculation_stats, speculate
+
+    side_path = out_path.with_name(f"{out_path.stem}.opencv{out_path.suffix}")
+
+    def _discard(_future) -> None:
+        side_path.unlink(missing_ok=True)
+
+    out, outcome = speculate(
+        lambda accept: _ml_convert(ctx, out_path, frames, accept=accept),
+        lambda: _opencv_convert(ctx, side_path),
+        rejected=_ML_FALLBACK_ERRORS,
+        stats=get_speculation_stats(),
+        on_abandoned=_discard,
+    )
+    if outcome.winner == "fallback" and Path(out.path) == side_path:
+        os.replace(side_path, out_path)
+        out.path = out_path
+    if outcome.preferred_error is not None:
+        _mark_fallback(out, outcome.preferred_error)
+    out.speculation = {
+        "winner": "ml" if outcome.winner == "preferred" else "opencv",
+        "ml_ms": round(outcome.preferred_ms, 3),
+        "opencv_ms": round(outcome.fallback_ms, 3) if outcome.fallback_ms is not None else None,
+        "total_ms": round(outcome.total_ms, 3),
+        "opencv_rerun": outcome.fallback_rerun,
+    }
+    logger.info("speculative conversion %s", out.speculation)
+    return out
+
+
+def _convert(ctx: ImageContext, out_path: Path, frames: dict[str, object]) -> ConversionResult:
+    try:
+        report = None
+        if _preflight_enabled():
+            report = _preflight(ctx)
+            logger.info("preflight %s", report.as_dict())
+            if report.rejected:
+                raise ImageRejectedError(report)
+        use_ml = _env_bool("IMAGE_DXF_USE_LOCAL_SEG", True)
+        if use_ml and report is not None and _preflight_routing():
+            use_ml = report.path == "ml"
+        if use_ml and _speculative_enabled():
+            out = _speculative_convert(ctx, out_path, frames)
+        elif use_ml:
             try:
-                import cv2
-                import numpy as np
-
-                color = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
-                if color is None:
-                    raise ImageToDxfError(f"无法读取图片: {img_path}")
-                h, w = int(color.shape[0]), int(color.shape[1])
-                mm_per_px = _env_float("IMAGE_DXF_MM_PER_PX", 10.0)
-
-                from worker.segmentation import LocalSegmentationModel
-
-                model = LocalSegmentationModel()
-                class_map = model.predict(img_path)
-                wall_mask = (class_map == 1).astype(np.uint8) * 255
-                try:
-                    session_id = _extract_session_id_from_dxf_path(out_path) or uuid4().hex
-                    static_root = _find_static_root(out_path) or (Path(__file__).resolve().parents[1] / "static")
-                    debug_dir = static_root / "debug" / session_id
-                    debug_dir.mkdir(parents=True, exist_ok=True)
-                    import cv2
-
-                    cv2.imwrite(str(debug_dir / "debug_step2_ai_mask.png"), wall_mask)
-                except Exception:
-                    pass
-                if not _ai_wall_mask_is_usable(wall_mask):
-                    raise ImageClarityError("AI mask unusable, falling back to OpenCV")
-                out = _dxf_from_class_map(class_map=class_map, h=h, w=w, mm_per_px=mm_per_px, out_path=out_path)
-            except (ImportError, ModuleNotFoundError, RuntimeError, ImageClarityError):
-                out = image_to_dxf(image_path=img_path, dxf_path=out_path)
+                out = _ml_convert(ctx, out_path, frames)
+            except _ML_FALLBACK_ERRORS as e:
+                out = _mark_fallback(_opencv_convert(ctx, out_path), e)
         else:
-            out = image_to_dxf(image_path=img_path, dxf_path=out_path)
+            out = _opencv_convert(ctx, out_path)
+        out.timings_ms = ctx.graph.stage_totals()
+        out.preflight = report.as_dict() if report is not None else None
+        logger.info("convert_image_to_dxf stage timings: %s", _format_stage_totals(ctx.graph))
+        return out
     except ImageClarityError:
         raise
     except ImageToDxfError:
@@ -791,36 +1943,35 @@ def convert_image_to_dxf(image_path: str | Path, output_dxf_path: str | Path) ->
     except Exception as e:
         raise ImageToDxfError(str(e))
 
-    try:
-        import ezdxf
 
-        doc = ezdxf.readfile(str(out))
-        msp = doc.modelspace()
-        wall_entities = [e for e in msp if str(getattr(e.dxf, "layer", "")).upper() == "WALL"]
-
-        seg_count = 0
-        for e in wall_entities:
-            t = e.dxftype()
-            if t == "LINE":
-                seg_count += 1
-            elif t == "LWPOLYLINE":
-                pts = list(e.get_points("xy"))  # type: ignore[attr-defined]
-                if len(pts) >= 2:
-                    seg_count += len(pts) - 1
-                    if bool(getattr(e, "closed", False)) and len(pts) >= 3:
-                        seg_count += 1
-            elif t == "POLYLINE":
-                pts = list(e.vertices())  # type: ignore[attr-defined]
-                if len(pts) >= 2:
-                    seg_count += len(pts) - 1
-                    if bool(getattr(e, "is_closed", False)) and len(pts) >= 3:
-                        seg_count += 1
-
-        if seg_count < 4:
-            raise ImageClarityError("DXF 线条过少，疑似图片清晰度不足")
-    except ImageClarityError:
-        raise
-    except Exception as e:
-        raise ImageToDxfError(f"DXF 校验失败: {e}")
+def convert_image_to_dxf(
+    image_path: str | Path | None,
+    output_dxf_path: str | Path,
+    *,
+    debug: bool | None = None,
+    image: ImageContext | None = None,
+) -> ConversionResult:
+    """Convert one image; ``debug`` forces debug artifacts on/off (``None`` defers to env/sampling).
+
+    ``image`` is an already built context (e.g. ``ImageContext.from_bytes`` over an
+    upload held in memory) used instead of reading ``image_path``. Debug PNGs are
+    written by a background thread after conversion, so the paths in
+    ``result.debug_artifacts`` may not exist yet when this returns.
+    """
+    ctx = _image_context(image_path, image)
+    out_path = Path(output_dxf_path)
+    frames: dict[str, object] = {}
+    out: ConversionResult | None = None
+    try:
+        out = _convert(ctx, out_path, frames)
+    finally:
+        if _debug_artifacts_enabled(debug):
+            scheduled = _schedule_debug_images(output_dxf_path=out_path, frames=_debug_frames(ctx, frames, out))
+            if out is not None:
+                out.debug_artifacts = scheduled
+    if out.debug_artifacts is None:
+        out.debug_artifacts = []
+
+    if out.wall_segments() < 4:
+        raise ImageClarityError("DXF 线条过少，疑似图片清晰度不足")
     return out
-
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+_PAIR_CHUNK = 1_000_000
+
+
+def label_pairs(n: int, a, b) -> np.ndarray:
+    """Connected-component labels for ``n`` nodes joined by edges ``(a[k], b[k])``.
+
+    Every node ends up labelled with the smallest node index of its component,
+    i.e. the same grouping (and group order) as a union-find walked from 0..n-1.
+    """
+    parent = np.arange(int(n), dtype=np.int64)
+    a = np.asarray(a, dtype=np.int64).ravel()
+    b = np.asarray(b, dtype=np.int64).ravel()
+    if a.size == 0:
+        return parent
+
+    while True:
+        ra = parent[a]
+        rb = parent[b]
+        diff = ra != rb
+        if not bool(diff.any()):
+            return parent
+        hi = np.maximum(ra[diff], rb[diff])
+        lo = np.minimum(ra[diff], rb[diff])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            nxt = parent[parent]
+            if np.array_equal(nxt, parent):
+                break
+            parent = nxt
+
+
+def _interval_gap(lo_a, hi_a, lo_b, hi_b):
+    return np.maximum(0.0, np.maximum(lo_a, lo_b) - np.minimum(hi_a, hi_b))
+
+
+def _pair_reach(len_max, *, angle_tol_deg: float, dist_tol_px: float, gap_tol_px: float):
+    # Upper bound on the distance between two segments that pass the merge test:
+    # one endpoint lies within dist_tol of the other infinite line, so the lines
+    # drift apart by at most L*sin(tol) along the longer segment, and the
+    # projected gap on the bisector adds gap_tol (widened by the half angle).
+    t = math.radians(min(max(0.0, float(angle_tol_deg)), 89.0))
+    side = float(dist_tol_px) + len_max * math.sin(t)
+    along = (float(gap_tol_px) + side * math.sin(t * 0.5)) / math.cos(t * 0.5)
+    return (side + along) * (1.0 + 1e-9) + 1e-6
+
+
+def _sweep_candidates(perp_lo, perp_hi, along_lo, along_hi, lens, *, reach_kw: dict):
+    """Yield candidate index pairs whose rotated bounding boxes lie within reach."""
+    m = perp_lo.shape[0]
+    if m < 2:
+        return
+    order = np.argsort(perp_lo, kind="stable")
+    plo = perp_lo[order]
+    phi = perp_hi[order]
+    alo = along_lo[order]
+    ahi = along_hi[order]
+    ln = lens[order]
+
+    window = float(_pair_reach(float(ln.max()), **reach_kw))
+    end = np.searchsorted(plo, phi + window, side="right")
+    start = np.arange(1, m + 1)
+    counts = np.maximum(0, end - start)
+    if int(counts.sum()) == 0:
+        return
+
+    cum = np.cumsum(counts)
+    k0 = 0
+    while k0 < m:
+        base = int(cum[k0 - 1]) if k0 > 0 else 0
+        k1 = int(np.searchsorted(cum, base + _PAIR_CHUNK, side="right"))
+        k1 = min(m, max(k0 + 1, k1))
+        c = counts[k0:k1]
+        total = int(c.sum())
+        if total:
+            ii = np.repeat(np.arange(k0, k1), c)
+            offs = np.arange(total) - np.repeat(np.cumsum(c) - c, c)
+            jj = ii + 1 + offs
+
+            reach = _pair_reach(np.maximum(ln[ii], ln[jj]), **reach_kw)
+            near = (_interval_gap(plo[ii], phi[ii], plo[jj], phi[jj]) <= reach) & (
+                _interval_gap(alo[ii], ahi[ii], alo[jj], ahi[jj]) <= reach
+            )
+            if bool(near.any()):
+                yield order[ii[near]], order[jj[near]]
+        k0 = k1
+
+
+def _pair_passes(i, j, p1, p2, u, ang, *, angle_tol_deg: float, dist_tol_px: float, gap_tol_px: float):
+    """Vectorised form of the pairwise merge test; returns a boolean mask over (i, j)."""
+    d = np.abs(ang[i] - ang[j])
+    ok = np.minimum(d, 180.0 - d) <= angle_tol_deg
+    idx = np.nonzero(ok)[0]
+    if idx.size == 0:
+        return ok
+    i = i[idx]
+    j = j[idx]
+
+    def pt_line_dist(pt, a, b):
+        ab = b - a
+        denom = np.sqrt(ab[:, 0] * ab[:, 0] + ab[:, 1] * ab[:, 1])
+        ap = pt - a
+        cross = ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0]
+        safe = np.where(denom < 1e-6, 1.0, denom)
+        fallback = np.sqrt(ap[:, 0] * ap[:, 0] + ap[:, 1] * ap[:, 1])
+        return np.where(denom < 1e-6, fallback, np.abs(cross) / safe)
+
+    p1i, p2i, p1j, p2j = p1[i], p2[i], p1[j], p2[j]
+    min_d = np.minimum(
+        np.minimum(pt_line_dist(p1i, p1j, p2j), pt_line_dist(p2i, p1j, p2j)),
+        np.minimum(pt_line_dist(p1j, p1i, p2i), pt_line_dist(p2j, p1i, p2i)),
+    )
+    near = min_d <= dist_tol_px
+
+    ui = u[i]
+    uj = u[j]
+    flip = (ui[:, 0] * uj[:, 0] + ui[:, 1] * uj[:, 1]) < 0
+    uj = np.where(flip[:, None], -uj, uj)
+    u_mean = ui + uj
+    nrm = np.sqrt(u_mean[:, 0] * u_mean[:, 0] + u_mean[:, 1] * u_mean[:, 1])
+    u_mean = np.where((nrm < 1e-6)[:, None], ui, u_mean / np.where(nrm < 1e-6, 1.0, nrm)[:, None])
+
+    def proj(p):
+        return p[:, 0] * u_mean[:, 0] + p[:, 1] * u_mean[:, 1]
+
+    ti1, ti2, tj1, tj2 = proj(p1i), proj(p2i), proj(p1j), proj(p2j)
+    gap = _interval_gap(np.minimum(ti1, ti2), np.maximum(ti1, ti2), np.minimum(tj1, tj2), np.maximum(tj1, tj2))
+    ok[idx] = near & (gap <= gap_tol_px)
+    return ok
+
+
+def _candidate_groups(ang, *, angle_tol_deg: float):
+    """Split segments into overlapping angle buckets, each with its own rotated frame.
+
+    Bucket width is at least the angle tolerance, so every mergeable pair lives in
+    the same or in neighbouring buckets. Each group holds buckets ``b`` and ``b+1``
+    and reports which members belong to ``b+1`` so pairs are only emitted once.
+    """
+    n = ang.shape[0]
+    tol = max(0.0, float(angle_tol_deg))
+    nb = int(180.0 // (tol * (1.0 + 1e-9) + 1e-9))
+    nb = max(1, min(180, nb))
+    if nb < 3:
+        yield np.arange(n), np.zeros(n, dtype=bool), 0.0
+        return
+
+    width = 180.0 / float(nb)
+    bins = np.clip(np.floor(ang / width).astype(np.int64), 0, nb - 1)
+    members = [np.nonzero(bins == b)[0] for b in range(nb)]
+    for b in range(nb):
+        nxt = (b + 1) % nb
+        if members[b].size == 0:
+            continue
+        idx = np.concatenate([members[b], members[nxt]])
+        upper = np.zeros(idx.shape[0], dtype=bool)
+        upper[members[b].size :] = True
+        yield idx, upper, math.radians(float(b + 1) * width)
+
+
+def _fit_groups(p1, p2, u, labels, *, min_len_px: float):
+    roots, inv = np.unique(labels, return_inverse=True)
+    g = int(roots.shape[0])
+    count = np.bincount(inv, minlength=g).astype(np.float64)
+
+    u_ref = u[roots]
+    dots = u[:, 0] * u_ref[inv, 0] + u[:, 1] * u_ref[inv, 1]
+    flip = dots < 0
+    # Near-perpendicular members (only reachable with wide angle tolerances) would
+    # pick their flip by rounding noise; use the same matrix product as the
+    # pairwise fit so both engines orient them identically.
+    for gid in np.unique(inv[np.abs(dots) < 1e-9]):
+        members = np.nonzero(inv == gid)[0]
+        flip[members] = (u[members] @ u_ref[gid]) < 0
+    aligned = np.where(flip[:, None], -u, u)
+    u_mean = np.stack(
+        [np.bincount(inv, weights=aligned[:, 0], minlength=g), np.bincount(inv, weights=aligned[:, 1], minlength=g)],
+        axis=1,
+    ) / count[:, None]
+    nrm = np.sqrt(u_mean[:, 0] * u_mean[:, 0] + u_mean[:, 1] * u_mean[:, 1])
+    degenerate = nrm < 1e-6
+    u_mean = np.where(degenerate[:, None], u_ref, u_mean / np.where(degenerate, 1.0, nrm)[:, None])
+
+    normal = np.stack([-u_mean[:, 1], u_mean[:, 0]], axis=1)
+    mids = (p1 + p2) * 0.5
+    rho = np.bincount(inv, weights=(mids * normal[inv]).sum(axis=1), minlength=g) / count
+    p0 = normal * rho[:, None]
+
+    t1 = ((p1 - p0[inv]) * u_mean[inv]).sum(axis=1)
+    t2 = ((p2 - p0[inv]) * u_mean[inv]).sum(axis=1)
+    tmin = np.full(g, np.inf)
+    tmax = np.full(g, -np.inf)
+    np.minimum.at(tmin, inv, np.minimum(t1, t2))
+    np.maximum.at(tmax, inv, np.maximum(t1, t2))
+
+    keep = (tmax - tmin) >= min_len_px
+    if not bool(keep.any()):
+        return np.zeros((0, 4), dtype=np.float64)
+    s = p0[keep] + u_mean[keep] * tmin[keep, None]
+    e = p0[keep] + u_mean[keep] * tmax[keep, None]
+    out = np.concatenate([s, e], axis=1)
+    key = np.round(out / 2.0).astype(int)
+    _, uniq_idx = np.unique(key, axis=0, return_index=True)
+    return out[np.sort(uniq_idx)]
+
+
+def merge_lines_bucketed(
+    lines,
+    *,
+    angle_tol_deg: float,
+    dist_tol_px: float,
+    gap_tol_px: float,
+    min_len_px: float,
+):
+    """Drop-in replacement for ``_merge_lines_pairwise`` without the O(n²) pair loop.
+
+    Segments are bucketed by angle, swept by their normal offset (rho) inside each
+    bucket's rotated frame, and only pairs whose boxes are within the provable merge
+    reach are tested, with the same angle/distance/gap rules, in NumPy. The union-find
+    groups, and therefore the merged segments, are the same as the pairwise version.
+    """
+    segs = np.asarray(lines).reshape(-1, 4).astype(np.float64)
+    p1 = segs[:, 0:2]
+    p2 = segs[:, 2:4]
+    d = p2 - p1
+    lens = np.linalg.norm(d, axis=1)
+    keep = lens > max(1e-6, min_len_px * 0.25)
+    p1 = p1[keep]
+    p2 = p2[keep]
+    lens = lens[keep]
+    if p1.size == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+
+    u = (p2 - p1) / lens[:, None]
+    ang = np.degrees(np.arctan2(u[:, 1], u[:, 0]))
+    ang = (ang + 180.0) % 180.0
+
+    n = p1.shape[0]
+    tol_kw = {"angle_tol_deg": angle_tol_deg, "dist_tol_px": dist_tol_px, "gap_tol_px": gap_tol_px}
+
+    pair_a: list[np.ndarray] = []
+    pair_b: list[np.ndarray] = []
+    for idx, upper, theta in _candidate_groups(ang, angle_tol_deg=angle_tol_deg):
+        e = np.array([math.cos(theta), math.sin(theta)])
+        nv = np.array([-e[1], e[0]])
+        a1, a2 = p1[idx] @ e, p2[idx] @ e
+        r1, r2 = p1[idx] @ nv, p2[idx] @ nv
+        for ci, cj in _sweep_candidates(
+            np.minimum(r1, r2),
+            np.maximum(r1, r2),
+            np.minimum(a1, a2),
+            np.maximum(a1, a2),
+            lens[idx],
+            reach_kw=tol_kw,
+        ):
+            own = ~(upper[ci] & upper[cj])
+            i = idx[ci[own]]
+            j = idx[cj[own]]
+            ok = _pair_passes(i, j, p1, p2, u, ang, **tol_kw)
+            if bool(ok.any()):
+                pair_a.append(i[ok])
+                pair_b.append(j[ok])
+
+    if pair_a:
+        labels = label_pairs(n, np.concatenate(pair_a), np.concatenate(pair_b))
+    else:
+        labels = np.arange(n, dtype=np.int64)
+    return _fit_groups(p1, p2, u, labels, min_len_px=min_len_px)
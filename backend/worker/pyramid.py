@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def downsample(gray: np.ndarray, factor: int) -> np.ndarray:
+    """``gray`` averaged over ``factor`` x ``factor`` blocks (``INTER_AREA``).
+
+    The last ``h % factor`` rows and ``w % factor`` columns are left out, so
+    every low-resolution pixel covers exactly one block: pixel (x, y) of the
+    result is centred on ``(x + 0.5) * factor - 0.5`` at full resolution, and
+    the pyramid of a block-aligned crop is the same crop of the pyramid.
+    """
+    import cv2
+
+    f = int(factor)
+    h, w = int(gray.shape[0]) // f, int(gray.shape[1]) // f
+    return cv2.resize(gray[: h * f, : w * f], (w, h), interpolation=cv2.INTER_AREA)
+
+
+def to_full_resolution(segs: np.ndarray, factor: int) -> np.ndarray:
+    """(N, 4) low-resolution segment coordinates mapped to full-resolution pixel centres."""
+    return (np.asarray(segs, dtype=np.float64).reshape(-1, 4) + 0.5) * float(factor) - 0.5
+
+
+def _band_edge_points(gray, a, b, *, band: int, blur_kernel: int, canny_low: int, canny_high: int, chunk: int):
+    """x and y (float32) of the Canny edge pixels of ``gray`` near segment a→b, from small crops along it.
+
+    The segment is cut into pieces whose bounding boxes are at most ``chunk``
+    px across its minor axis, so a diagonal costs strips rather than its whole
+    bounding box. Each crop gets a halo for the blur and the Sobel kernel,
+    which is dropped again before edge pixels are read.
+    """
+    import cv2
+
+    h, w = int(gray.shape[0]), int(gray.shape[1])
+    halo = blur_kernel // 2 + 2
+    d = b - a
+    dd = max(1e-9, float(d @ d))
+    pieces = int(min(abs(d[0]), abs(d[1])) // chunk) + 1
+    xs_out, ys_out = [], []
+    for k in range(pieces):
+        p = a + d * (k / pieces)
+        q = a + d * ((k + 1) / pieces)
+        x0 = max(0, int(np.floor(min(p[0], q[0]))) - band)
+        x1 = min(w, int(np.ceil(max(p[0], q[0]))) + band + 1)
+        y0 = max(0, int(np.floor(min(p[1], q[1]))) - band)
+        y1 = min(h, int(np.ceil(max(p[1], q[1]))) + band + 1)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        cx0, cy0 = max(0, x0 - halo), max(0, y0 - halo)
+        crop = gray[cy0 : min(h, y1 + halo), cx0 : min(w, x1 + halo)]
+        if blur_kernel > 1:
+            crop = cv2.GaussianBlur(crop, (blur_kernel, blur_kernel), 0)
+        edges = cv2.Canny(crop, canny_low, canny_high)[y0 - cy0 : y1 - cy0, x0 - cx0 : x1 - cx0]
+        ys, xs = np.nonzero(edges)
+        xs = xs.astype(np.float32) + x0
+        ys = ys.astype(np.float32) + y0
+        if pieces > 1:
+            # Neighbouring crops overlap by the band: each keeps only its own stretch of the segment.
+            t = ((xs - a[0]) * d[0] + (ys - a[1]) * d[1]) / dd
+            keep = (t >= (-np.inf if k == 0 else k / pieces)) & (t < (np.inf if k == pieces - 1 else (k + 1) / pieces))
+            xs, ys = xs[keep], ys[keep]
+        xs_out.append(xs)
+        ys_out.append(ys)
+    if not xs_out:
+        return np.zeros(0, np.float32), np.zeros(0, np.float32)
+    return np.concatenate(xs_out), np.concatenate(ys_out)
+
+
+def refine_segment(
+    gray: np.ndarray,
+    seg: np.ndarray,
+    *,
+    band: int,
+    blur_kernel: int,
+    canny_low: int,
+    canny_high: int,
+    chunk: int = 32,
+) -> np.ndarray:
+    """Full-resolution (x1, y1, x2, y2) of an upscaled candidate, from the edges within ``band`` px of it.
+
+    Edge pixels across the band are binned by their offset from the candidate;
+    the bin with the most pixels, nearer ones weighted up, is the wall face the
+    candidate stands for (the other face of a thin wall may lie in the band
+    too). A line is fitted to that face and the candidate's ends are replaced
+    by the extreme face pixels along it, up to two bands past the candidate's
+    own and leaving out islands shorter than ``2 * band + 1`` px at either end.
+    A candidate with too little edge support at full resolution (fewer pixels
+    than a fifth of its length) is returned unchanged.
+    """
+    import cv2
+
+    seg = np.asarray(seg, dtype=np.float64)
+    a, b = seg[:2], seg[2:]
+    d = b - a
+    length = float(np.hypot(*d))
+    if length < 1.0:
+        return seg
+    ux, uy = d / length
+    min_support = max(3.0, 0.2 * length)
+    reach = 2 * band
+    xs, ys = _band_edge_points(
+        gray,
+        a - d / length * band,
+        b + d / length * band,
+        band=band,
+        blur_kernel=blur_kernel,
+        canny_low=canny_low,
+        canny_high=canny_high,
+        chunk=chunk,
+    )
+    rx, ry = xs - a[0], ys - a[1]
+    off = ry * ux - rx * uy
+    t = rx * ux + ry * uy
+    near = (np.abs(off) <= band) & (t >= -reach) & (t <= length + reach)
+    if np.count_nonzero(near) < min_support:
+        return seg
+    xs, ys, off = xs[near], ys[near], off[near]
+    counts = np.bincount(np.rint(off).astype(np.int64) + band, minlength=2 * band + 1)
+    weight = (band + 1.0) - np.abs(np.arange(2 * band + 1) - band)
+    face = float(np.argmax(counts * weight) - band)
+    on_face = np.abs(off - face) <= 1.0
+    # A candidate a coarse pixel out of true crosses the face: pick the face pixels again off the fitted line.
+    for _ in range(2):
+        if np.count_nonzero(on_face) < min_support:
+            return seg
+        pts = np.stack([xs[on_face], ys[on_face]], axis=1)
+        vx, vy, x0, y0 = (float(v) for v in cv2.fitLine(pts, cv2.DIST_L2, 0, 0.01, 0.01).reshape(-1))
+        on_face = np.abs((ys - y0) * vx - (xs - x0) * vy) <= 1.0
+    if np.count_nonzero(on_face) < min_support:
+        return seg
+    if vx * ux + vy * uy < 0.0:
+        vx, vy = -vx, -vy
+
+    # Ends: the extreme face pixels, ignoring short islands past a gap (where other walls' faces cross).
+    s = np.sort((xs[on_face] - x0) * vx + (ys[on_face] - y0) * vy)
+    cuts = np.flatnonzero(np.diff(s) > 2.0)
+    lo = np.r_[0, cuts + 1]
+    hi = np.r_[cuts, s.size - 1]
+    solid = np.flatnonzero(s[hi] - s[lo] >= 2 * band + 1)
+    if solid.size:
+        s = s[lo[solid[0]] : hi[solid[-1]] + 1]
+    s0, s1 = float(s[0]), float(s[-1])
+    return np.array([x0 + s0 * vx, y0 + s0 * vy, x0 + s1 * vx, y0 + s1 * vy])
+
+
+def refine_segments(
+    gray: np.ndarray,
+    segs: np.ndarray,
+    *,
+    band: int,
+    blur_kernel: int,
+    canny_low: int,
+    canny_high: int,
+) -> np.ndarray:
+    """``refine_segment`` over (N, 4) full-resolution segments; float64 (N, 4) in the same order.
+
+    Only the bands around the segments are read at full resolution, so the cost
+    follows the total segment length, not the page.
+    """
+    segs = np.asarray(segs, dtype=np.float64).reshape(-1, 4)
+    out = np.empty_like(segs)
+    for i, seg in enumerate(segs):
+        out[i] = refine_segment(
+            gray, seg, band=int(band), blur_kernel=int(blur_kernel), canny_low=canny_low, canny_high=canny_high
+        )
+    return out
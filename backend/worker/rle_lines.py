@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import numpy as np
+
+from worker.line_merge import label_pairs
+
+
+def row_runs(mask: np.ndarray, *, min_len: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Foreground runs of every row of ``mask`` as (row, x0, x1) with ``x1`` exclusive.
+
+    Runs shorter than ``min_len`` are dropped. The result is sorted by (row, x0).
+    Only the foreground pixels are touched after one ``flatnonzero`` pass, so the
+    cost follows the ink, not the page.
+    """
+    mask = np.asarray(mask)
+    h, w = int(mask.shape[0]), int(mask.shape[1])
+    # One spare background column per row: runs then end at a row's end without a separate check.
+    fg = np.zeros((h, w + 1), dtype=bool)
+    np.greater(mask, 0, out=fg[:, :w])
+    flat = np.flatnonzero(fg)
+    if flat.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    starts = np.flatnonzero(np.r_[True, np.diff(flat) != 1])
+    lengths = np.diff(np.r_[starts, flat.size])
+    keep = lengths >= max(1, int(min_len))
+    rows, x0 = np.divmod(flat[starts[keep]], w + 1)
+    return rows, x0, x0 + lengths[keep]
+
+
+def _transposed(mask: np.ndarray) -> np.ndarray:
+    if mask.dtype == np.uint8 and mask.ndim == 2:
+        import cv2
+
+        return cv2.transpose(mask)
+    return np.ascontiguousarray(mask.T)
+
+
+def _group_runs(rows, x0, x1, *, width: int, tol: int):
+    """Stack runs of consecutive rows into rectangles (x0, x1, y0, y1), ``x1``/``y1`` exclusive.
+
+    A run continues the run just above it when both ends agree within ``tol``.
+    Overlapping neighbour runs whose ends are both shifted the same way by more
+    than ``tol`` are the stair steps of a slanted stroke; those runs are left
+    out and stay with the leftover pixels.
+    """
+    n = int(rows.shape[0])
+    if n == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    key = rows * (width + 1) + x0
+    # The only run above that can line up: the last one in row - 1 starting at or before x1 - 1.
+    j = np.searchsorted(key, (rows - 1) * (width + 1) + (x1 - 1), side="right") - 1
+    jj = np.maximum(j, 0)
+    above = (j >= 0) & (rows[jj] == rows - 1) & (x0[jj] < x1) & (x1[jj] > x0)
+    d0 = x0[jj] - x0
+    d1 = x1[jj] - x1
+    linked = above & (np.abs(d0) <= tol) & (np.abs(d1) <= tol)
+    sheared = above & ~linked & (np.sign(d0) == np.sign(d1)) & (np.abs(d0) > tol) & (np.abs(d1) > tol)
+
+    slanted = np.zeros(n, dtype=bool)
+    slanted[sheared] = True
+    slanted[jj[sheared]] = True
+    linked &= ~slanted & ~slanted[jj]
+
+    idx = np.flatnonzero(linked)
+    labels = label_pairs(n, idx, jj[idx])
+    kept = np.flatnonzero(~slanted)
+    if kept.size == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    order = kept[np.argsort(labels[kept], kind="stable")]
+    lab = labels[order]
+    starts = np.flatnonzero(np.r_[True, lab[1:] != lab[:-1]])
+    return np.stack(
+        [
+            np.minimum.reduceat(x0[order], starts),
+            np.maximum.reduceat(x1[order], starts),
+            np.minimum.reduceat(rows[order], starts),
+            np.maximum.reduceat(rows[order], starts) + 1,
+        ],
+        axis=1,
+    )
+
+
+def _drop_fringes(rects: np.ndarray, *, width: int, tol: int) -> np.ndarray:
+    """Drop thin rectangles that are only the ragged edge rows of a thicker one next to them.
+
+    A rectangle at most ``tol`` thick whose span lies within a thicker
+    rectangle's span (± ``tol``) and which sits within ``tol`` rows of it would
+    otherwise come out as a duplicate outline a pixel off the wall's own.
+    """
+    thick = rects[:, 3] - rects[:, 2]
+    thin = np.flatnonzero(thick <= tol)
+    solid = rects[thick > tol]
+    if thin.size == 0 or solid.shape[0] == 0:
+        return rects
+    t = rects[thin]
+    fringe = np.zeros(thin.size, dtype=bool)
+    for edge, row_of in ((2, lambda d: t[:, 3] + d), (3, lambda d: t[:, 2] - d)):
+        order = np.lexsort((solid[:, 0], solid[:, edge]))
+        s = solid[order]
+        key = s[:, edge] * (width + 1) + s[:, 0]
+        for d in range(tol + 1):
+            row = row_of(d)
+            j = np.searchsorted(key, row * (width + 1) + t[:, 0] + tol, side="right") - 1
+            jj = np.maximum(j, 0)
+            fringe |= (j >= 0) & (s[jj, edge] == row) & (s[jj, 1] + tol >= t[:, 1])
+    keep = np.ones(rects.shape[0], dtype=bool)
+    keep[thin[fringe]] = False
+    return rects[keep]
+
+
+def axis_wall_rects(mask: np.ndarray, *, min_len: int, tol: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """Horizontal and vertical wall rectangles of a binary mask, each as (x0, x1, y0, y1) rows.
+
+    Horizontal rectangles come from row runs, vertical ones from column runs; a
+    rectangle is kept only when it is at least as long along its runs as it is
+    thick, so a wall is claimed by one direction (ties go to horizontal). Thin
+    fringe rectangles along a wall's edges are folded into the wall.
+    """
+    mask = np.asarray(mask)
+    h, w = int(mask.shape[0]), int(mask.shape[1])
+    hr = _drop_fringes(_group_runs(*row_runs(mask, min_len=min_len), width=w, tol=tol), width=w, tol=tol)
+    hr = hr[(hr[:, 1] - hr[:, 0]) >= (hr[:, 3] - hr[:, 2])]
+    vt = _group_runs(*row_runs(_transposed(mask), min_len=min_len), width=h, tol=tol)
+    vt = _drop_fringes(vt, width=h, tol=tol)
+    vt = vt[(vt[:, 1] - vt[:, 0]) > (vt[:, 3] - vt[:, 2])]
+    # Column runs were scanned on the transpose: swap back to image axes.
+    return hr, vt[:, [2, 3, 0, 1]]
+
+
+def rect_outline_segments(horizontal: np.ndarray, vertical: np.ndarray, *, min_len: int) -> np.ndarray:
+    """Outline segments of wall rectangles in the ``HoughLinesP`` layout ``(N, 1, 4)`` int32.
+
+    Each rectangle gives its two long sides (one when it is a single pixel
+    thick) and its two ends when those are at least ``min_len`` long, i.e. the
+    edges Canny + Hough would have found on the same stroke.
+    """
+    parts = []
+    for rects, vertical_axis in ((horizontal, False), (vertical, True)):
+        if rects.shape[0] == 0:
+            continue
+        x0, x1, y0, y1 = (rects[:, k] for k in range(4))
+        x1 = x1 - 1
+        y1 = y1 - 1
+        if vertical_axis:
+            sides = [np.stack([x0, y0, x0, y1], axis=1)]
+            thick = x1 > x0
+            sides.append(np.stack([x1, y0, x1, y1], axis=1)[thick])
+            caps = (x1 - x0 + 1) >= min_len
+            sides.append(np.stack([x0, y0, x1, y0], axis=1)[caps])
+            sides.append(np.stack([x0, y1, x1, y1], axis=1)[caps])
+        else:
+            sides = [np.stack([x0, y0, x1, y0], axis=1)]
+            thick = y1 > y0
+            sides.append(np.stack([x0, y1, x1, y1], axis=1)[thick])
+            caps = (y1 - y0 + 1) >= min_len
+            sides.append(np.stack([x0, y0, x0, y1], axis=1)[caps])
+            sides.append(np.stack([x1, y0, x1, y1], axis=1)[caps])
+        parts.extend(sides)
+    if not parts:
+        return np.zeros((0, 1, 4), dtype=np.int32)
+    return np.concatenate(parts, axis=0).astype(np.int32).reshape(-1, 1, 4)
+
+
+def leftover_mask(mask: np.ndarray, horizontal: np.ndarray, vertical: np.ndarray, *, pad: int = 0) -> np.ndarray:
+    """Copy of ``mask`` with every wall rectangle cleared: what is left for Hough.
+
+    Rectangles are cleared ``pad`` px beyond their long sides as well, so the
+    ragged fringe of a wall (runs too short to be walls themselves) does not
+    come back from Hough as dashed lines along its edges.
+    """
+    out = np.array(mask, dtype=np.uint8, copy=True)
+    for x0, x1, y0, y1 in horizontal.tolist():
+        out[max(0, y0 - pad) : y1 + pad, x0:x1] = 0
+    for x0, x1, y0, y1 in vertical.tolist():
+        out[y0:y1, max(0, x0 - pad) : x1 + pad] = 0
+    return out
+
+
+def rle_wall_lines(mask: np.ndarray, *, min_len: int, tol: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """Axis-aligned wall segments of ``mask`` from row/column run lengths, plus the leftover mask.
+
+    The segments are in the ``HoughLinesP`` layout so they can go through the
+    same merge/orthogonalize steps; the leftover holds the pixels not claimed
+    by any wall rectangle (diagonals, arcs, text) for a Hough pass of its own.
+    """
+    horizontal, vertical = axis_wall_rects(mask, min_len=min_len, tol=tol)
+    segs = rect_outline_segments(horizontal, vertical, min_len=min_len)
+    return segs, leftover_mask(mask, horizontal, vertical, pad=tol)
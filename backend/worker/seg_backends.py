@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "onnx")
+QUANTIZE_MODES = ("dynamic", "static")
+_ONNX_OPSET = 17
+_CALIB_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def trace_torchscript(model, *, example):
+    """Trace, freeze and optimize ``model`` for CPU inference; input sizes stay dynamic."""
+    import torch
+
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+        frozen = torch.jit.freeze(traced)
+        return torch.jit.optimize_for_inference(frozen)
+
+
+def onnx_session(
+    model,
+    *,
+    example,
+    threads: int = 0,
+    quantize: str | None = None,
+    calibration: Callable[[], list[np.ndarray]] | None = None,
+):
+    """Export ``model`` to ONNX (dynamic N/H/W) and open an ONNX Runtime CPU session.
+
+    ``quantize`` selects int8 weights: ``dynamic`` quantizes weights only, ``static``
+    also quantizes activations in QDQ form using the tensors from ``calibration``.
+    The exported files live in a temporary directory that is removed once the
+    session has loaded them.
+    """
+    try:
+        import onnxruntime as ort
+        import torch
+    except Exception as e:
+        raise RuntimeError("Missing dependency: onnxruntime") from e
+
+    work = Path(tempfile.mkdtemp(prefix="seg_onnx_"))
+    try:
+        path = work / "model.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                example,
+                str(path),
+                input_names=["input"],
+                output_names=["logits"],
+                dynamic_axes={"input": {0: "n", 2: "h", 3: "w"}, "logits": {0: "n", 2: "h", 3: "w"}},
+                opset_version=_ONNX_OPSET,
+                dynamo=False,
+            )
+        if quantize == "dynamic":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            qpath = work / "model.int8.onnx"
+            quantize_dynamic(str(path), str(qpath), weight_type=QuantType.QUInt8)
+            path = qpath
+        elif quantize == "static":
+            path = _quantize_static(path, work, calibration)
+        elif quantize is not None:
+            raise ValueError(f"unknown quantize mode: {quantize}")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = int(threads)
+            opts.inter_op_num_threads = 1
+        return ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _quantize_static(path: Path, work: Path, calibration: Callable[[], list[np.ndarray]] | None) -> Path:
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    batches = calibration() if calibration is not None else []
+    if not batches:
+        raise RuntimeError("static int8 quantization needs calibration images")
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self) -> None:
+            self._it = iter(batches)
+
+        def get_next(self):
+            x = next(self._it, None)
+            return None if x is None else {"input": x}
+
+    prepped = work / "model.pre.onnx"
+    quant_pre_process(str(path), str(prepped), skip_symbolic_shape=True)
+    out = work / "model.qdq.onnx"
+    quantize_static(str(prepped), str(out), _Reader(), quant_format=QuantFormat.QDQ, per_channel=True)
+    return out
+
+
+def calibration_images(limit: int = 8) -> list[np.ndarray]:
+    """BGR images for static quantization: ``IMAGE_DXF_SEG_CALIB_DIR`` if set, else synthetic plans."""
+    import cv2
+
+    root = os.getenv("IMAGE_DXF_SEG_CALIB_DIR", "").strip()
+    images: list[np.ndarray] = []
+    if root:
+        for p in sorted(Path(root).glob("*")):
+            if p.suffix.lower() in _CALIB_SUFFIXES:
+                img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+                if img is not None:
+                    images.append(img)
+            if len(images) >= limit:
+                break
+        if not images:
+            logger.warning("no calibration images in %s, using synthetic plans", root)
+    if images:
+        return images
+
+    rng = np.random.default_rng(0)
+    for _ in range(limit):
+        img = np.full((384, 512, 3), 255, np.uint8)
+        x0, y0 = (int(v) for v in rng.integers(10, 80, 2))
+        x1, y1 = 512 - int(rng.integers(10, 80)), 384 - int(rng.integers(10, 80))
+        cv2.rectangle(img, (x0, y0), (x1, y1), (0, 0, 0), int(rng.integers(3, 9)))
+        for _ in range(int(rng.integers(2, 6))):
+            if rng.random() < 0.5:
+                x = int(rng.integers(x0, x1))
+                cv2.line(img, (x, y0), (x, y1), (0, 0, 0), int(rng.integers(2, 6)))
+            else:
+                y = int(rng.integers(y0, y1))
+                cv2.line(img, (x0, y), (x1, y), (0, 0, 0), int(rng.integers(2, 6)))
+        images.append(img)
+    return images
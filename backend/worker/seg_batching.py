@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentationQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class _Request:
+    x: object
+    size: tuple[int, int]
+    bucket: tuple[int, int]
+    enqueued: float
+    native: bool = False
+    future: Future = field(default_factory=Future)
+
+
+class SegmentationBatcher:
+    """Groups concurrent ``predict`` calls into one forward pass per batch.
+
+    Callers preprocess on their own thread, then queue the tensor under a size
+    bucket (inference-resolution height/width rounded up to ``bucket`` pixels). A
+    single dispatcher thread takes the oldest request, waits up to ``max_wait_ms``
+    for more of the same bucket, zero-pads them to the bucket size (zero is the
+    normalized mean), runs the model once and scatters the cropped class maps back.
+    Requests whose size already matches the bucket go through unpadded.
+
+    At most ``max_queue`` requests wait at a time; further callers block for up to
+    ``queue_timeout_s`` and then get ``SegmentationQueueFull``, which the conversion
+    pipeline treats like any other segmentation failure (OpenCV fallback).
+    """
+
+    def __init__(
+        self,
+        model,
+        *,
+        max_batch: int = 4,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 32,
+        bucket: int = 32,
+        queue_timeout_s: float = 0.0,
+    ) -> None:
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.bucket = max(1, int(bucket))
+        self.queue_timeout_s = max(0.0, float(queue_timeout_s))
+        self._queue: deque[_Request] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self._batch_sizes: deque[int] = deque(maxlen=512)
+        self._queue_wait_ms: deque[float] = deque(maxlen=512)
+        self._latency_ms: deque[float] = deque(maxlen=512)
+
+    def _bucket_for(self, h: int, w: int) -> tuple[int, int]:
+        b = self.bucket
+        return int(math.ceil(h / b) * b), int(math.ceil(w / b) * b)
+
+    def submit(self, image, *, native: bool = False) -> Future:
+        uses_windows = getattr(self.model, "uses_windows", None)
+        if uses_windows is not None:
+            from worker.image_context import ImageContext
+
+            image = ImageContext.coerce(image)
+            if uses_windows(image.shape):
+                # Sliding-window inference already batches its own tiles; run it on the caller's thread.
+                fut: Future = Future()
+                fut.set_result(self.model.predict(image, native=native) if native else self.model.predict(image))
+                return fut
+        x, size = self.model.prepare(image)
+        h, w = int(x.shape[-2]), int(x.shape[-1])
+        req = _Request(x=x, size=size, bucket=self._bucket_for(h, w), enqueued=time.perf_counter(), native=native)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("segmentation batcher is closed")
+            if len(self._queue) >= self.max_queue:
+                has_room = lambda: self._closed or len(self._queue) < self.max_queue  # noqa: E731
+                if not self._cond.wait_for(has_room, timeout=self.queue_timeout_s) or self._closed:
+                    self.rejected += 1
+                    raise SegmentationQueueFull(f"segmentation queue full ({self.max_queue} pending)")
+            self._start_locked()
+            self._queue.append(req)
+            self._cond.notify_all()
+        return req.future
+
+    def predict(self, image, *, native: bool = False, timeout: float | None = None) -> np.ndarray:
+        """Class map as ``model.predict`` would return it (on the inference grid with ``native=True``)."""
+        return self.submit(image, native=native).result(timeout=timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        with self._cond:
+            sizes = list(self._batch_sizes)
+            waits = sorted(self._queue_wait_ms)
+            lats = sorted(self._latency_ms)
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "requests": self.requests,
+                "batches": self.batches,
+                "rejected": self.rejected,
+                "failed_batches": self.failed_batches,
+                "mean_batch_size": (sum(sizes) / len(sizes)) if sizes else 0.0,
+                "queue_wait_ms_p50": _percentile(waits, 0.5),
+                "latency_ms_p50": _percentile(lats, 0.5),
+                "latency_ms_p95": _percentile(lats, 0.95),
+            }
+
+    def _start_locked(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="segmentation-batcher", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> list[_Request] | None:
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            head = self._queue[0]
+            deadline = head.enqueued + self.max_wait_s
+
+            def same_bucket() -> int:
+                return sum(1 for r in self._queue if r.bucket == head.bucket)
+
+            while not self._closed and same_bucket() < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch: list[_Request] = []
+            rest: deque[_Request] = deque()
+            for r in self._queue:
+                if r.bucket == head.bucket and len(batch) < self.max_batch:
+                    batch.append(r)
+                else:
+                    rest.append(r)
+            self._queue = rest
+            self._cond.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                maps = self.model.infer(self._stack(batch))
+            except Exception as e:
+                logger.warning("segmentation batch of %s failed: %s", len(batch), e)
+                with self._cond:
+                    self.failed_batches += 1
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            for r, m in zip(batch, maps):
+                h, w = int(r.x.shape[-2]), int(r.x.shape[-1])
+                try:
+                    crop = m[:h, :w]
+                    r.future.set_result(crop.astype(np.uint8) if r.native else self.model.restore(crop, r.size))
+                except Exception as e:
+                    r.future.set_exception(e)
+            done = time.perf_counter()
+            with self._cond:
+                self.batches += 1
+                self.requests += len(batch)
+                self._batch_sizes.append(len(batch))
+                for r in batch:
+                    self._queue_wait_ms.append((started - r.enqueued) * 1000.0)
+                    self._latency_ms.append((done - r.enqueued) * 1000.0)
+
+    def _stack(self, batch: list[_Request]):
+        import torch
+        import torch.nn.functional as F
+
+        bh, bw = batch[0].bucket
+        parts = []
+        for r in batch:
+            h, w = int(r.x.shape[-2]), int(r.x.shape[-1])
+            parts.append(r.x if (h, w) == (bh, bw) else F.pad(r.x, (0, bw - w, 0, bh - h)))
+        return parts[0] if len(parts) == 1 else torch.cat(parts, dim=0)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return float(sorted_values[idx])
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return float(default)
+    try:
+        return float(raw)
+    except ValueError:
+        return float(default)
+
+
+def batching_enabled() -> bool:
+    return os.getenv("IMAGE_DXF_SEG_BATCHING", "0").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+_batcher: SegmentationBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_segmentation_batcher() -> SegmentationBatcher:
+    """Process-wide batcher around the registry's default model, configured from ``IMAGE_DXF_SEG_*``."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            from worker.segmentation import get_segmentation_model
+
+            _batcher = SegmentationBatcher(
+                get_segmentation_model(),
+                max_batch=int(_env_number("IMAGE_DXF_SEG_BATCH_MAX", 4)),
+                max_wait_ms=_env_number("IMAGE_DXF_SEG_BATCH_WAIT_MS", 10.0),
+                max_queue=int(_env_number("IMAGE_DXF_SEG_QUEUE", 32)),
+                bucket=int(_env_number("IMAGE_DXF_SEG_BUCKET", 32)),
+                queue_timeout_s=_env_number("IMAGE_DXF_SEG_QUEUE_TIMEOUT_MS", 0.0) / 1000.0,
+            )
+        return _batcher
+
+
+def current_batcher() -> SegmentationBatcher | None:
+    return _batcher
+
+
+def _after_fork_in_child() -> None:
+    # The dispatcher thread does not survive fork(); the child builds its own batcher.
+    global _batcher, _batcher_lock
+    _batcher = None
+    _batcher_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
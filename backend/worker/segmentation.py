@@ -1,14 +1,33 @@
 from __future__ import annotations
 
 import logging
+import os
+import sys
+import threading
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
 
 import numpy as np
 
+from worker.image_context import ImageContext
+
 logger = logging.getLogger(__name__)
 
+# Encoder / inference-resolution trade-offs, selected with IMAGE_DXF_SEG_PROFILE.
+# Compare them on your own plans with scripts/bench_seg_profiles.py.
+SEGMENTATION_PROFILES: dict[str, tuple[str, int]] = {
+    "resnet34-1024": ("resnet34", 1024),
+    "resnet34-768": ("resnet34", 768),
+    "mobilenet-512": ("mobilenet_v2", 512),
+    "mobilenet-768": ("mobilenet_v2", 768),
+    "mobilenet-1024": ("mobilenet_v2", 1024),
+    "effnet-lite-512": ("timm-tf_efficientnet_lite0", 512),
+    "effnet-lite-768": ("timm-tf_efficientnet_lite0", 768),
+    "effnet-lite-1024": ("timm-tf_efficientnet_lite0", 1024),
+}
+DEFAULT_PROFILE = "resnet34-1024"
+
 
 @dataclass(frozen=True)
 class SegmentationConfig:
@@ -16,78 +35,286 @@ class SegmentationConfig:
     num_classes: int = 4
     encoder_name: str = "resnet34"
     encoder_weights: str | None = "imagenet"
+    backend: str = "eager"
+    quantize: str | None = None
+    threads: int = 0
+    window: int = 0
+    window_overlap: int = 64
+    window_batch: int = 4
+    window_max_side: int = 8192
+    weights: str | None = None
+
+    @classmethod
+    def from_env(cls) -> SegmentationConfig:
+        """Defaults overridden by the ``IMAGE_DXF_SEG_*`` profile, backend, thread and sliding-window settings."""
+        profile = os.getenv("IMAGE_DXF_SEG_PROFILE", "").strip().lower() or DEFAULT_PROFILE
+        if profile not in SEGMENTATION_PROFILES:
+            logger.warning("unknown IMAGE_DXF_SEG_PROFILE %r; using %s", profile, DEFAULT_PROFILE)
+            profile = DEFAULT_PROFILE
+        encoder_name, max_side = SEGMENTATION_PROFILES[profile]
+        backend = os.getenv("IMAGE_DXF_SEG_BACKEND", "").strip().lower() or "eager"
+        quantize = os.getenv("IMAGE_DXF_SEG_QUANTIZE", "").strip().lower()
+        return cls(
+            max_side=max_side,
+            encoder_name=encoder_name,
+            backend=backend,
+            quantize=None if quantize in ("", "0", "none", "off", "false") else quantize,
+            threads=max(0, _env_int("IMAGE_DXF_SEG_THREADS", 0)),
+            window=max(0, _env_int("IMAGE_DXF_SEG_WINDOW", 0)),
+            window_overlap=max(0, _env_int("IMAGE_DXF_SEG_WINDOW_OVERLAP", 64)),
+            window_batch=max(1, _env_int("IMAGE_DXF_SEG_WINDOW_BATCH", 4)),
+            window_max_side=max(0, _env_int("IMAGE_DXF_SEG_WINDOW_MAX_SIDE", 8192)),
+            weights=os.getenv("IMAGE_DXF_SEG_WEIGHTS", "").strip() or None,
+        )
+
+    def with_profile(self, profile: str) -> SegmentationConfig:
+        """This config with the encoder and ``max_side`` of a named profile."""
+        try:
+            encoder_name, max_side = SEGMENTATION_PROFILES[profile]
+        except KeyError:
+            raise ValueError(f"unknown segmentation profile: {profile}") from None
+        return replace(self, encoder_name=encoder_name, max_side=max_side)
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    try:
+        return int(raw) if raw else int(default)
+    except ValueError:
+        return int(default)
+
+
+def model_version(config: SegmentationConfig | None = None) -> str:
+    """Identifies what the segmentation model would produce; part of the conversion cache key."""
+    c = config or SegmentationConfig.from_env()
+    version = f"deeplabv3plus:{c.encoder_name}:{c.encoder_weights}:{c.num_classes}:{c.max_side}"
+    if c.backend != "eager":
+        version += f":{c.backend}"
+    if c.quantize:
+        version += f":int8-{c.quantize}"
+    if c.window > 0:
+        version += f":win{c.window}-{c.window_overlap}-{c.window_max_side}"
+    if c.weights:
+        from worker.weight_store import WeightStoreError, get_weight_store
+
+        try:
+            entry = get_weight_store().entries().get(c.weights)
+        except WeightStoreError:
+            entry = None
+        version += f":w={c.weights}@{entry.sha256[:12] if entry is not None else 'missing'}"
+    return version
 
 
 class LocalSegmentationModel:
+    """DeepLabV3+ semantic segmentation on one device.
+
+    ``config.backend`` selects how the network runs: ``eager`` PyTorch, or a
+    CPU-only ``torchscript`` (traced, frozen) or ``onnx`` (ONNX Runtime) export of
+    the same weights. ``config.quantize`` (``dynamic``/``static``, ONNX only)
+    switches to int8, and ``config.threads`` caps intra-op threads.
+    """
+
     def __init__(self, *, device: str | None = None, config: SegmentationConfig | None = None) -> None:
+        from worker.seg_backends import BACKENDS, QUANTIZE_MODES
+
         self.config = config or SegmentationConfig()
+        backend, quantize = self.config.backend, self.config.quantize
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown segmentation backend: {backend}")
+        if quantize is not None and (quantize not in QUANTIZE_MODES or backend != "onnx"):
+            raise ValueError(f"int8 quantization '{quantize}' needs IMAGE_DXF_SEG_BACKEND=onnx")
 
         torch = self._torch()
+        if not _preloading:
+            _mark_threads_started()
+            if self.config.threads > 0:
+                torch.set_num_threads(int(self.config.threads))
+        if backend != "eager":
+            if device is not None and device != "cpu":
+                logger.warning("%s backend is CPU-only; ignoring device=%s", backend, device)
+            device = "cpu"
         self.device = self._resolve_device(torch, device)
-        self.model = self._build_model_with_retries()
+        self.weights_source: str | None = None
+        if self.config.weights:
+            self.model = self._load_stored_model(torch)
+        else:
+            self.model = self._build_model_with_retries()
         self.model.eval()
         self.model.to(self.device)
+        self._runner = None
+        self._session = None
+        if backend != "eager":
+            self._build_backend(torch)
 
-    def predict(self, image_path: str | Path) -> np.ndarray:
-        cv2 = self._cv2()
-        torch = self._torch()
+    def _build_backend(self, torch) -> None:
+        from worker.seg_backends import calibration_images, onnx_session, trace_torchscript
 
-        image_path = Path(image_path)
-        bgr = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-        if bgr is None:
-            raise FileNotFoundError(f"Cannot read image: {image_path}")
+        example = torch.zeros((1, 3, 64, 64), dtype=torch.float32)
+        if self.config.backend == "torchscript":
+            self._runner = trace_torchscript(self.model, example=example)
+            return
+
+        def _calibration() -> list[np.ndarray]:
+            return [self.prepare(img)[0].numpy() for img in calibration_images()]
+
+        self._session = onnx_session(
+            self.model,
+            example=example,
+            threads=self.config.threads,
+            quantize=self.config.quantize,
+            calibration=_calibration,
+        )
+
+    def predict(self, image: str | Path | np.ndarray | ImageContext, *, native: bool = False) -> np.ndarray:
+        """Class map at the input resolution, or on the inference grid with ``native=True``.
+
+        ``image`` is a path, a BGR (or gray) ndarray, or an ``ImageContext`` whose
+        decoded pixels are reused. The BGR image is downscaled first and its channels
+        are reversed as a view, so no full-resolution RGB copy is made. A native map
+        is the uint8 map of the downscaled image (or of the sliding-window grid) and
+        is never upsampled; its scale to the source is ``source size / map size``.
+        """
+        if self.config.window > 0:
+            image = self._load_bgr(image)
+            if self.uses_windows(image.shape):
+                return self._predict_windows(image, native=native)
+        x, size = self.prepare(image)
+        class_map = self.infer(x)[0]
+        return class_map.astype(np.uint8) if native else self.restore(class_map, size)
 
+    def uses_windows(self, shape) -> bool:
+        """Whether an image of ``shape`` is segmented in sliding windows rather than downscaled."""
+        return self.config.window > 0 and max(int(shape[0]), int(shape[1])) > self.config.max_side
+
+    def _predict_windows(self, bgr: np.ndarray, *, native: bool = False) -> np.ndarray:
+        """Class map from overlapping windows at (up to ``window_max_side``) native resolution.
+
+        Windows are run ``window_batch`` at a time, one window row after another. Their
+        logits are weighted by a ramp that fades out across the overlap and summed into
+        an accumulator one window tall; rows no later window can reach are reduced to
+        class ids straight away, so besides the source image and the uint8 class map,
+        peak memory is one window row of logits plus one batch of tiles.
+        """
+        import torch.nn.functional as F
+
+        from worker.tiling import window_starts
+
+        cfg = self.config
         h0, w0 = int(bgr.shape[0]), int(bgr.shape[1])
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        src = bgr
+        if cfg.window_max_side > 0:
+            src, _ = self._resize_max_side(bgr, max_side=cfg.window_max_side)
+        h, w = int(src.shape[0]), int(src.shape[1])
+
+        win = max(16, _round_up(cfg.window, 16))
+        th, tw = min(win, _round_up(h, 16)), min(win, _round_up(w, 16))
+        ys = window_starts(h, th, max(16, th - cfg.window_overlap))
+        xs = window_starts(w, tw, max(16, tw - cfg.window_overlap))
+        weight = np.outer(_blend_ramp(th, cfg.window_overlap), _blend_ramp(tw, cfg.window_overlap)).astype(np.float32)
+
+        out = np.empty((h, w), dtype=np.uint8)
+        acc = np.zeros((cfg.num_classes, th, w), dtype=np.float32)
+        top = ys[0]
+        for y in ys:
+            shift = y - top
+            if shift > 0:
+                out[top:y] = np.argmax(acc[:, :shift], axis=0)
+                acc[:, : th - shift] = acc[:, shift:]
+                acc[:, th - shift :] = 0.0
+                top = y
+            vh = min(th, h - y)
+            for i in range(0, len(xs), max(1, cfg.window_batch)):
+                group = xs[i : i + max(1, cfg.window_batch)]
+                tiles = []
+                for x in group:
+                    t = self._preprocess_to_tensor(src[y : y + th, x : x + tw][..., ::-1])
+                    pad_h, pad_w = th - int(t.shape[-2]), tw - int(t.shape[-1])
+                    tiles.append(F.pad(t, (0, pad_w, 0, pad_h)) if pad_h or pad_w else t)
+                logits = self.infer(tiles[0] if len(tiles) == 1 else _cat(tiles), logits=True)
+                for k, x in enumerate(group):
+                    vw = min(tw, w - x)
+                    acc[:, :vh, x : x + vw] += logits[k, :, :vh, :vw] * weight[:vh, :vw]
+        out[top:h] = np.argmax(acc[:, : h - top], axis=0)
+        if native or (h, w) == (h0, w0):
+            return out
+        return self.restore(out, (h0, w0))
 
-        resized, _ = self._resize_max_side(rgb, max_side=self.config.max_side)
-        x = self._preprocess_to_tensor(resized).to(self.device, dtype=torch.float32)
+    def prepare(self, image: str | Path | np.ndarray | ImageContext):
+        """Normalized ``(1, 3, h, w)`` float32 CPU tensor at inference resolution, plus the source (h, w)."""
+        bgr = self._load_bgr(image)
+        h0, w0 = int(bgr.shape[0]), int(bgr.shape[1])
+        resized, _ = self._resize_max_side(bgr, max_side=self.config.max_side)
+        return self._preprocess_to_tensor(resized[..., ::-1]), (h0, w0)
 
+    def infer(self, x, *, logits: bool = False) -> np.ndarray:
+        """Class maps ``(N, h, w)`` (or float32 ``(N, C, h, w)`` logits) for a batch, falling back to CPU on CUDA failures."""
+        torch = self._torch()
+        _mark_threads_started()
+        x = x.to(self.device, dtype=torch.float32)
+        run = self._infer_logits if logits else self._infer_class_map
         try:
-            class_map_small = self._infer_class_map(x)
+            return run(x)
         except RuntimeError as e:
             msg = str(e).lower()
             if self.device.type == "cuda" and "out of memory" in msg:
                 logger.warning("GPU OOM, switching to CPU...")
-                torch.cuda.empty_cache()
-                self.model.to("cpu")
-                self.device = torch.device("cpu")
-                x_cpu = x.to("cpu", dtype=torch.float32)
-                class_map_small = self._infer_class_map(x_cpu)
             elif self.device.type == "cuda" and (
                 "no kernel image is available" in msg
                 or "not compiled with cuda enabled" in msg
                 or "cuda error" in msg
             ):
                 logger.warning("GPU inference failed, switching to CPU...")
-                torch.cuda.empty_cache()
-                self.model.to("cpu")
-                self.device = torch.device("cpu")
-                x_cpu = x.to("cpu", dtype=torch.float32)
-                class_map_small = self._infer_class_map(x_cpu)
             else:
                 raise
+            torch.cuda.empty_cache()
+            self.model.to("cpu")
+            self.device = torch.device("cpu")
+            return run(x.to("cpu", dtype=torch.float32))
         finally:
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
 
-        class_map = cv2.resize(
-            class_map_small.astype(np.uint8),
-            (w0, h0),
-            interpolation=cv2.INTER_NEAREST,
-        )
-        return class_map
+    def restore(self, class_map_small: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+        """Nearest-neighbour upscale of an inference-resolution class map back to the source (h, w)."""
+        cv2 = self._cv2()
+        h0, w0 = size
+        return cv2.resize(class_map_small.astype(np.uint8), (w0, h0), interpolation=cv2.INTER_NEAREST)
 
     def _infer_class_map(self, x):
+        # argmax over raw logits: softmax is monotonic, so it cannot change the winner.
+        if self._session is not None:
+            logits = self._session.run(None, {"input": x.detach().cpu().numpy()})[0]
+            return np.argmax(logits, axis=1)
         torch = self._torch()
-        with torch.no_grad():
-            logits = self.model(x)
+        runner = self._runner if self._runner is not None else self.model
+        with torch.inference_mode():
+            logits = runner(x)
             if isinstance(logits, (tuple, list)):
                 logits = logits[0]
-            logits = logits.float()
-            probs = torch.softmax(logits, dim=1)
-            class_map = torch.argmax(probs, dim=1).squeeze(0).detach().cpu().numpy()
-            return class_map
+            return torch.argmax(logits, dim=1).cpu().numpy()
+
+    def _infer_logits(self, x) -> np.ndarray:
+        if self._session is not None:
+            return self._session.run(None, {"input": x.detach().cpu().numpy()})[0].astype(np.float32, copy=False)
+        torch = self._torch()
+        runner = self._runner if self._runner is not None else self.model
+        with torch.inference_mode():
+            logits = runner(x)
+            if isinstance(logits, (tuple, list)):
+                logits = logits[0]
+            return logits.float().cpu().numpy()
+
+    def _load_bgr(self, image: str | Path | np.ndarray | ImageContext) -> np.ndarray:
+        if isinstance(image, ImageContext):
+            return image.color
+        if isinstance(image, np.ndarray):
+            return ImageContext.from_array(image).color
+        cv2 = self._cv2()
+        image_path = Path(image)
+        bgr = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise FileNotFoundError(f"Cannot read image: {image_path}")
+        return bgr
 
     def _preprocess_to_tensor(self, rgb: np.ndarray):
         torch = self._torch()
@@ -99,28 +326,54 @@ class LocalSegmentationModel:
         x = np.expand_dims(x, axis=0)
         return torch.from_numpy(x).contiguous()
 
-    def _resize_max_side(self, rgb: np.ndarray, *, max_side: int) -> tuple[np.ndarray, float]:
-        h, w = int(rgb.shape[0]), int(rgb.shape[1])
+    def _resize_max_side(self, img: np.ndarray, *, max_side: int) -> tuple[np.ndarray, float]:
+        h, w = int(img.shape[0]), int(img.shape[1])
         scale = min(1.0, float(max_side) / float(max(h, w)))
         if scale >= 1.0:
-            return rgb, 1.0
+            return img, 1.0
         new_w = max(1, int(round(w * scale)))
         new_h = max(1, int(round(h * scale)))
         cv2 = self._cv2()
-        out = cv2.resize(rgb, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        out = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
         return out, scale
 
+    def _load_stored_model(self, torch):
+        """Build from the local weight store; any missing or corrupt file raises instead of degrading."""
+        from worker.weight_store import WeightStoreError, get_weight_store
+
+        smp = self._smp()
+        cfg = self.config
+        entry, state = get_weight_store().load(cfg.weights)
+        if entry.encoder_name != cfg.encoder_name or entry.num_classes != cfg.num_classes:
+            raise WeightStoreError(
+                f"权重 '{entry.name}' 为 {entry.encoder_name}/{entry.num_classes} 类，"
+                f"与配置 {cfg.encoder_name}/{cfg.num_classes} 类不符"
+            )
+        kwargs = dict(encoder_name=cfg.encoder_name, encoder_weights=None, classes=cfg.num_classes, activation=None)
+        if entry.scope == "full":
+            # Parameters are allocated on the meta device and replaced by the file's tensors: no init, no copy.
+            with torch.device("meta"):
+                model = smp.DeepLabV3Plus(**kwargs)
+            model.load_state_dict(state, strict=True, assign=True)
+        else:
+            model = smp.DeepLabV3Plus(**kwargs)
+            model.encoder.load_state_dict(state, strict=True)
+        self.weights_source = f"store:{entry.name}@{entry.sha256[:12]}"
+        return model
+
     def _build_model_with_retries(self):
         smp = self._smp()
         last_exc: Exception | None = None
         for attempt in range(1, 4):
             try:
-                return smp.DeepLabV3Plus(
+                model = smp.DeepLabV3Plus(
                     encoder_name=self.config.encoder_name,
                     encoder_weights=self.config.encoder_weights,
                     classes=self.config.num_classes,
                     activation=None,
                 )
+                self.weights_source = self.config.encoder_weights or "random-init"
+                return model
             except Exception as e:
                 last_exc = e
                 sleep_s = 2.0 * float(attempt)
@@ -128,7 +381,12 @@ class LocalSegmentationModel:
                 time.sleep(sleep_s)
 
         if self.config.encoder_weights is not None:
-            logger.warning("Falling back to encoder_weights=None due to init failures: %s", last_exc)
+            logger.error(
+                "Falling back to random encoder weights after init failures (%s); "
+                "register offline weights and set IMAGE_DXF_SEG_WEIGHTS to avoid this",
+                last_exc,
+            )
+            self.weights_source = "random-init"
             return smp.DeepLabV3Plus(
                 encoder_name=self.config.encoder_name,
                 encoder_weights=None,
@@ -166,3 +424,241 @@ class LocalSegmentationModel:
             raise RuntimeError("Missing dependency: opencv-python-headless") from e
         return cv2
 
+
+def _round_up(v: int, m: int) -> int:
+    return ((int(v) + m - 1) // m) * m
+
+
+def _blend_ramp(n: int, overlap: int) -> np.ndarray:
+    """Per-axis window weights: linear fade over ``overlap`` pixels at both ends, never zero."""
+    w = np.ones(n, dtype=np.float32)
+    ov = min(int(overlap), n // 2)
+    if ov > 0:
+        r = (np.arange(ov, dtype=np.float32) + 1.0) / float(ov + 1)
+        w[:ov] = r
+        w[n - ov :] = r[::-1]
+    return w
+
+
+def _cat(tiles):
+    import torch
+
+    return torch.cat(tiles, dim=0)
+
+
+@dataclass
+class ModelStatus:
+    state: str = "cold"  # cold | loading | ready | failed
+    device: str | None = None
+    load_ms: float | None = None
+    warmup_ms: float | None = None
+    weights: str | None = None
+    error: str | None = None
+    updated_at: float | None = None
+
+
+class SegmentationModelRegistry:
+    """Per-process models keyed by (device, config), built once and shared by all threads.
+
+    Lookups of a ready model take no lock. The first caller for a key builds it under
+    that key's lock while other keys stay available. A failed build is remembered for
+    ``retry_after_s``; until then callers get a ``RuntimeError`` at once instead of
+    sitting through the constructor's retry sleeps again, so the pipeline's OpenCV
+    fallback kicks in immediately.
+    """
+
+    def __init__(self, *, retry_after_s: float = 60.0) -> None:
+        self.retry_after_s = float(retry_after_s)
+        self._models: dict[tuple, LocalSegmentationModel] = {}
+        self._status: dict[tuple, ModelStatus] = {}
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(device: str | None, config: SegmentationConfig | None) -> tuple:
+        return (device, config or SegmentationConfig.from_env())
+
+    def get(self, *, device: str | None = None, config: SegmentationConfig | None = None) -> LocalSegmentationModel:
+        key = self._key(device, config)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+            status = self._status.setdefault(key, ModelStatus())
+        with key_lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+            if status.state == "failed" and time.time() - (status.updated_at or 0.0) < self.retry_after_s:
+                raise RuntimeError(f"segmentation model unavailable: {status.error}")
+            status.state, status.updated_at = "loading", time.time()
+            t0 = time.perf_counter()
+            try:
+                model = LocalSegmentationModel(device=device, config=key[1])
+            except Exception as e:
+                status.state, status.error, status.updated_at = "failed", str(e), time.time()
+                logger.error("segmentation model load failed (%s): %s", model_version(key[1]), e)
+                raise RuntimeError(f"segmentation model unavailable: {e}") from e
+            status.load_ms = (time.perf_counter() - t0) * 1000.0
+            status.device = str(model.device)
+            status.weights = getattr(model, "weights_source", None)
+            status.state, status.error, status.updated_at = "ready", None, time.time()
+            self._models[key] = model
+            return model
+
+    def weights(self, *, device: str | None = None, config: SegmentationConfig | None = None) -> str | None:
+        """Where the loaded model's weights came from (``ModelStatus.weights``), ``None`` while it is not built."""
+        st = self._status.get(self._key(device, config))
+        return st.weights if st is not None and st.state == "ready" else None
+
+    def warm_up(self, *, device: str | None = None, config: SegmentationConfig | None = None) -> ModelStatus:
+        """Build the model if needed and run one small forward pass so first-request latency is inference only."""
+        key = self._key(device, config)
+        model = self.get(device=device, config=config)
+        t0 = time.perf_counter()
+        model.predict(np.zeros((64, 64, 3), dtype=np.uint8))
+        status = self._status[key]
+        status.warmup_ms = (time.perf_counter() - t0) * 1000.0
+        return status
+
+    def warm_up_in_background(
+        self, *, device: str | None = None, config: SegmentationConfig | None = None
+    ) -> threading.Thread:
+        def _run() -> None:
+            try:
+                self.warm_up(device=device, config=config)
+            except Exception as e:
+                logger.warning("segmentation model warm-up failed: %s", e)
+
+        t = threading.Thread(target=_run, name="segmentation-warmup", daemon=True)
+        t.start()
+        return t
+
+    def status(self) -> list[dict]:
+        with self._lock:
+            items = list(self._status.items())
+        return [
+            {"model": model_version(config), "requested_device": device, **asdict(st)}
+            for (device, config), st in items
+        ]
+
+    def _reset_after_fork(self) -> None:
+        # Locks may have been held by threads that do not exist in the child; a build
+        # that was in flight there never finishes, so it becomes a cold start again.
+        self._lock = threading.Lock()
+        self._locks = {}
+        for key, st in self._status.items():
+            if st.state == "loading" and key not in self._models:
+                st.state, st.updated_at = "cold", time.time()
+
+
+_registry: SegmentationModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> SegmentationModelRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            raw = os.getenv("IMAGE_DXF_SEG_RETRY_S", "").strip()
+            try:
+                retry = float(raw) if raw else 60.0
+            except ValueError:
+                retry = 60.0
+            _registry = SegmentationModelRegistry(retry_after_s=retry)
+        return _registry
+
+
+def get_segmentation_model(
+    *, device: str | None = None, config: SegmentationConfig | None = None
+) -> LocalSegmentationModel:
+    """Process-wide model per (device, config), built on first use and kept warm afterwards."""
+    return get_model_registry().get(device=device, config=config)
+
+
+def has_random_weights(model) -> bool:
+    """Whether ``model`` runs on randomly initialised weights, e.g. after failing to fetch pretrained ones.
+
+    Its output differs from one process to the next and says nothing about the
+    configured model, so nothing it produced may be cached under ``model_version``.
+    """
+    return getattr(model, "weights_source", None) == "random-init"
+
+
+# Set once this process has run torch work at its normal thread count. GNU OpenMP
+# cannot rebuild a thread team that existed before fork(), so children of such a
+# process must stay single-threaded or their first parallel region hangs.
+_threads_started = False
+_preloading = False
+
+
+def _mark_threads_started() -> None:
+    global _threads_started
+    _threads_started = True
+
+
+def preload_for_fork(
+    *, device: str | None = None, config: SegmentationConfig | None = None
+) -> LocalSegmentationModel | None:
+    """Build the default model in a parent process so pre-forked workers share its weights.
+
+    Call it once before the server or pool forks (gunicorn ``--preload``, Celery's
+    prefork pool, ``batch.run_batch``). The model is built single-threaded and
+    without a forward pass, so no OpenMP team exists at fork time and every child
+    can still use ``IMAGE_DXF_SEG_THREADS`` threads. Parameters and buffers are
+    moved into shared memory: children map the same pages instead of each holding
+    a copy-on-write duplicate. Only the eager CPU model is preloaded; TorchScript
+    and ONNX Runtime keep per-process runtimes, and CUDA does not survive fork,
+    so those are left to build lazily in each worker.
+    """
+    global _preloading
+    cfg = config or SegmentationConfig.from_env()
+    if cfg.backend != "eager":
+        logger.info("fork preload skipped: %s backend builds per worker", cfg.backend)
+        return None
+    try:
+        import torch
+    except Exception as e:
+        raise RuntimeError("Missing dependency: torch") from e
+    if device is None and torch.cuda.is_available():
+        logger.info("fork preload skipped: CUDA cannot be shared across fork()")
+        return None
+    if device is not None and torch.device(device).type != "cpu":
+        logger.info("fork preload skipped: device %s cannot be shared across fork()", device)
+        return None
+
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    _preloading = True
+    try:
+        model = get_model_registry().get(device=device, config=cfg)
+        model.model.share_memory()
+    finally:
+        _preloading = False
+        torch.set_num_threads(threads)
+    logger.info("segmentation model preloaded for fork: %s", model_version(cfg))
+    return model
+
+
+def _after_fork_in_child() -> None:
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    if _registry is not None:
+        _registry._reset_after_fork()
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    if _threads_started:
+        if torch.get_num_threads() > 1:
+            logger.warning("forked after torch work in the parent; pinning intra-op threads to 1 to avoid an OpenMP hang")
+            torch.set_num_threads(1)
+        return
+    # Preloaded models skipped their thread cap in the parent; apply it here instead.
+    for _device, cfg in list(_registry._models if _registry is not None else ()):
+        if cfg.threads > 0:
+            torch.set_num_threads(int(cfg.threads))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from worker.seg_batching import _percentile
+from worker.stages import StageCancelled, cancel_scope
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class SpeculationOutcome:
+    """How one race went. ``fallback_ms`` is ``None`` when the fallback was still winding down at the decision.
+
+    ``preferred_error`` is the ``rejected`` error that handed the race to the fallback.
+    """
+
+    winner: str
+    preferred_ms: float
+    fallback_ms: float | None
+    total_ms: float
+    fallback_rerun: bool = False
+    preferred_error: BaseException | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "winner": self.winner,
+            "preferred_ms": round(self.preferred_ms, 3),
+            "fallback_ms": round(self.fallback_ms, 3) if self.fallback_ms is not None else None,
+            "total_ms": round(self.total_ms, 3),
+            "fallback_rerun": self.fallback_rerun,
+        }
+
+
+class SpeculationStats:
+    """Process-wide win counts and latencies of speculative conversions, labelled ``preferred``/``fallback``."""
+
+    def __init__(self, *, preferred: str, fallback: str, window: int = 512) -> None:
+        self.preferred = preferred
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.wins = {preferred: 0, fallback: 0}
+        self.reruns = 0
+        self.fallback_cancelled = 0
+        self.fallback_completed = 0
+        self._preferred_ms: deque[float] = deque(maxlen=window)
+        self._fallback_ms: deque[float] = deque(maxlen=window)
+        self._total_ms: deque[float] = deque(maxlen=window)
+
+    def record(self, outcome: SpeculationOutcome) -> None:
+        with self._lock:
+            self.requests += 1
+            self.wins[self.preferred if outcome.winner == "preferred" else self.fallback] += 1
+            self.reruns += int(outcome.fallback_rerun)
+            self._preferred_ms.append(outcome.preferred_ms)
+            self._total_ms.append(outcome.total_ms)
+
+    def record_fallback(self, elapsed_ms: float, *, cancelled: bool) -> None:
+        """One speculative fallback run that ended, stopped early by cancellation or run to the end."""
+        with self._lock:
+            if cancelled:
+                self.fallback_cancelled += 1
+            else:
+                self.fallback_completed += 1
+                self._fallback_ms.append(elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self.requests
+            # Completed fallbacks whose result was not used: the preferred path won after they had finished.
+            used = self.wins[self.fallback] - self.reruns
+            return {
+                "requests": n,
+                "wins": dict(self.wins),
+                f"{self.preferred}_win_rate": (self.wins[self.preferred] / n) if n else 0.0,
+                "fallback_reruns": self.reruns,
+                f"{self.fallback}_cancelled": self.fallback_cancelled,
+                f"{self.fallback}_wasted": max(0, self.fallback_completed - used),
+                f"{self.preferred}_ms_p50": _percentile(sorted(self._preferred_ms), 0.5),
+                f"{self.fallback}_ms_p50": _percentile(sorted(self._fallback_ms), 0.5),
+                "total_ms_p50": _percentile(sorted(self._total_ms), 0.5),
+                "total_ms_p95": _percentile(sorted(self._total_ms), 0.95),
+            }
+
+
+def speculate(
+    preferred: Callable[[Callable[[], None]], T],
+    fallback: Callable[[], T],
+    *,
+    rejected: tuple[type[BaseException], ...],
+    stats: SpeculationStats | None = None,
+    on_abandoned: Callable[[Future], None] | None = None,
+) -> tuple[T, SpeculationOutcome]:
+    """Run ``fallback`` on a worker thread while ``preferred`` runs on this one; return the winner's result.
+
+    ``preferred`` gets an ``accept`` callback to call as soon as it knows its
+    result will be used: that cancels the fallback at its next stage boundary
+    (``worker.stages.cancel_scope``), so the loser stops while the winner
+    finishes. ``preferred`` raising one of ``rejected`` hands the race to the
+    fallback; if it does so after accepting, the cancelled fallback is waited
+    for and run again here, picking up the stages it had already cached (one
+    that finished before noticing the cancel is used as it is). Any other error
+    cancels the fallback and propagates. ``on_abandoned`` gets the fallback's
+    future when the preferred result wins, for cleaning up after it.
+    """
+    cancel = threading.Event()
+    t0 = time.perf_counter()
+    finished: dict[str, float] = {}
+
+    def run_fallback() -> T:
+        t = time.perf_counter()
+        cancelled = False
+        try:
+            with cancel_scope(cancel):
+                return fallback()
+        except StageCancelled:
+            cancelled = True
+            raise
+        finally:
+            finished["ms"] = (time.perf_counter() - t) * 1000.0
+            if stats is not None:
+                stats.record_fallback(finished["ms"], cancelled=cancelled)
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dxf-speculate")
+    future = pool.submit(run_fallback)
+    # The worker thread exits by itself once the fallback returns or is cancelled.
+    pool.shutdown(wait=False)
+
+    try:
+        result = preferred(cancel.set)
+    except rejected as e:
+        preferred_ms = (time.perf_counter() - t0) * 1000.0
+        # Wait for the first fallback even when it was cancelled: until it has unwound it may
+        # still be inside a stage writing the same outputs the re-run would write.
+        rerun = cancel.is_set() and isinstance(future.exception(), StageCancelled)
+        if rerun:
+            logger.info("speculative preferred path failed after accepting (%s); running the fallback again", e)
+            result = fallback()
+        else:
+            result = future.result()
+        outcome = SpeculationOutcome(
+            winner="fallback",
+            preferred_ms=preferred_ms,
+            fallback_ms=None if rerun else finished.get("ms"),
+            total_ms=(time.perf_counter() - t0) * 1000.0,
+            fallback_rerun=rerun,
+            preferred_error=e,
+        )
+    except BaseException:
+        cancel.set()
+        raise
+    else:
+        cancel.set()
+        preferred_ms = (time.perf_counter() - t0) * 1000.0
+        outcome = SpeculationOutcome(
+            winner="preferred",
+            preferred_ms=preferred_ms,
+            fallback_ms=finished.get("ms"),
+            total_ms=preferred_ms,
+        )
+        if on_abandoned is not None:
+            future.add_done_callback(on_abandoned)
+    if stats is not None:
+        stats.record(outcome)
+    return result, outcome
+
+
+_stats: SpeculationStats | None = None
+_stats_lock = threading.Lock()
+
+
+def get_speculation_stats() -> SpeculationStats:
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = SpeculationStats(preferred="ml", fallback="opencv")
+        return _stats
+
+
+def current_speculation_stats() -> SpeculationStats | None:
+    return _stats
+
+
+def _after_fork_in_child() -> None:
+    global _stats, _stats_lock
+    _stats = None
+    _stats_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
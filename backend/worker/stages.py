@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+_cancel_event: ContextVar[threading.Event | None] = ContextVar("stage_cancel_event", default=None)
+
+
+class StageCancelled(RuntimeError):
+    """Raised at a stage boundary once the enclosing ``cancel_scope`` event is set."""
+
+
+@contextmanager
+def cancel_scope(event: threading.Event):
+    """Make stages entered in this context (and contexts copied from it) stop once ``event`` is set.
+
+    Cancellation is cooperative: a stage that has started runs to the end and
+    its value is cached for everyone else; the next ``StageGraph.run`` or
+    ``timed`` of the cancelled caller raises ``StageCancelled`` instead.
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def check_cancelled() -> None:
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise StageCancelled("cancelled")
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    key: tuple
+    elapsed_ms: float
+    hits: int = 0
+
+
+class StageGraph:
+    """Per-request memo of pipeline intermediates.
+
+    Every intermediate is addressed by ``(stage, *params)``, where params usually
+    include the key of the node it was derived from, so each distinct intermediate
+    is computed once even when several ladder variants (or the debug output) ask
+    for it, possibly from different threads. Cached arrays are shared: callers
+    must treat them as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[tuple, Any] = {}
+        self._inflight: dict[tuple, threading.Event] = {}
+        self._errors: dict[tuple, BaseException] = {}
+        self._records: dict[tuple, StageRecord] = {}
+        self._order: list[tuple] = []
+
+    def run(self, stage: str, key: tuple, fn: Callable[[], Any]) -> Any:
+        node = (stage, *key)
+        while True:
+            check_cancelled()
+            with self._lock:
+                if node in self._values:
+                    self._records[node].hits += 1
+                    return self._values[node]
+                event = self._inflight.get(node)
+                owner = event is None
+                if owner:
+                    event = threading.Event()
+                    self._inflight[node] = event
+                    self._errors.pop(node, None)
+            if owner:
+                break
+            event.wait()
+            with self._lock:
+                if node in self._values:
+                    self._records[node].hits += 1
+                    return self._values[node]
+                if node in self._errors:
+                    raise self._errors[node]
+            # The owner was cancelled; only it sees StageCancelled, the next caller computes the node.
+
+        t0 = time.perf_counter()
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                if not isinstance(e, StageCancelled):
+                    self._errors[node] = e
+                self._inflight.pop(node, None)
+            event.set()
+            raise
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self._values[node] = value
+            self._errors.pop(node, None)
+            rec = self._records.get(node)
+            if rec is None:
+                self._records[node] = StageRecord(stage=stage, key=tuple(key), elapsed_ms=elapsed)
+                self._order.append(node)
+            else:
+                rec.elapsed_ms += elapsed
+            self._inflight.pop(node, None)
+        event.set()
+        return value
+
+    def evict(self, node: tuple) -> None:
+        """Forget a cached value so a large intermediate can be freed; it is recomputed if asked for again."""
+        with self._lock:
+            self._values.pop(tuple(node), None)
+
+    @contextmanager
+    def timed(self, stage: str, *key: Hashable):
+        """Record the duration of a step that produces nothing worth caching (e.g. emit)."""
+        check_cancelled()
+        node = (stage, *key)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            with self._lock:
+                rec = self._records.get(node)
+                if rec is None:
+                    self._records[node] = StageRecord(stage=stage, key=tuple(key), elapsed_ms=elapsed)
+                    self._order.append(node)
+                else:
+                    rec.elapsed_ms += elapsed
+
+    def records(self) -> list[StageRecord]:
+        with self._lock:
+            return [self._records[n] for n in self._order]
+
+    def stage_totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for rec in self.records():
+            totals[rec.stage] = totals.get(rec.stage, 0.0) + rec.elapsed_ms
+        return totals
+
+    def report(self) -> list[dict]:
+        return [
+            {"stage": r.stage, "key": repr(r.key), "elapsed_ms": round(r.elapsed_ms, 3), "hits": r.hits}
+            for r in self.records()
+        ]
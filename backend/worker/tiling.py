@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+# Rough working set of one tile in flight, in bytes per pixel: the input copy,
+# blur, threshold and morph buffers, and Canny's int16 gradients and magnitude.
+_TILE_BYTES_PER_PX = 16
+# Banded connected components keep one int32 label band plus OpenCV's scratch.
+_BAND_BYTES_PER_PX = 12
+
+
+@dataclass(frozen=True)
+class TilePlan:
+    tile: int
+    overlap: int
+    band_rows: int
+    workers: int = 0
+
+
+def tile_plan(shape: tuple[int, int], *, max_mb: float, overlap: int, workers: int = 0, tile: int = 0) -> TilePlan:
+    """Size tiles and component bands so the per-job working set stays under ``max_mb``.
+
+    The full-resolution gray image and the one mask plane that tiles are written
+    into are not part of the budget (about 2 bytes per source pixel). A positive
+    ``tile`` overrides the derived tile side.
+    """
+    h, w = int(shape[0]), int(shape[1])
+    budget = max(1.0, float(max_mb)) * 1024.0 * 1024.0
+    in_flight = max(1, int(workers)) * 2
+    side = int(math.sqrt(budget / (_TILE_BYTES_PER_PX * in_flight))) - 2 * int(overlap)
+    tile = int(tile) if int(tile) > 0 else max(256, min(max(h, w), side))
+    band_rows = max(64, min(h, int(budget / (_BAND_BYTES_PER_PX * max(1, w)))))
+    return TilePlan(tile=tile, overlap=max(0, int(overlap)), band_rows=band_rows, workers=max(0, int(workers)))
+
+
+def iter_tiles(h: int, w: int, tile: int) -> Iterator[tuple[int, int, int, int]]:
+    """Core rectangles ``(y0, y1, x0, x1)`` covering an ``h``×``w`` image, row-major."""
+    for y0 in range(0, h, tile):
+        for x0 in range(0, w, tile):
+            yield y0, min(h, y0 + tile), x0, min(w, x0 + tile)
+
+
+def window_starts(length: int, window: int, stride: int) -> list[int]:
+    """Start offsets of ``window``-long windows every ``stride`` covering ``length``; the last one ends flush."""
+    if length <= window:
+        return [0]
+    starts = list(range(0, length - window, max(1, int(stride))))
+    starts.append(length - window)
+    return starts
+
+
+def with_halo(core: tuple[int, int, int, int], halo: int, h: int, w: int):
+    """Expand a core rectangle by ``halo`` (clipped) and return (outer, core-within-outer)."""
+    y0, y1, x0, x1 = core
+    oy0, oy1 = max(0, y0 - halo), min(h, y1 + halo)
+    ox0, ox1 = max(0, x0 - halo), min(w, x1 + halo)
+    return (oy0, oy1, ox0, ox1), (y0 - oy0, y1 - oy0, x0 - ox0, x1 - ox0)
+
+
+def map_tiles(fn: Callable, jobs: Iterable[tuple], *, workers: int) -> Iterator:
+    """``fn(*job)`` for every job, in order.
+
+    With ``workers`` > 1 jobs run on a process pool, and at most two per worker
+    are submitted ahead so pickled tile copies never pile up in memory.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield fn(*job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for job in jobs:
+            pending.append(pool.submit(fn, *job))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def otsu_threshold_from_hist(hist) -> int:
+    """Otsu's threshold from a 256-bin histogram, matching ``cv2.THRESH_OTSU`` on 8-bit input."""
+    h = np.asarray(hist, dtype=np.float64).ravel()
+    total = float(h.sum())
+    if total <= 0:
+        return 0
+    scale = 1.0 / total
+    mu = float((np.arange(256) * h).sum()) * scale
+    eps = float(np.finfo(np.float32).eps)
+    mu1 = q1 = 0.0
+    max_sigma = 0.0
+    max_val = 0
+    for i in range(256):
+        p_i = float(h[i]) * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < eps or max(q1, q2) > 1.0 - eps:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+
+def threshold_stats_tile(gray_tile, core, *, blur_kernel: int, adaptive: tuple[int, int] | None):
+    """(foreground pixels of the adaptive mask, blur histogram) over the tile core."""
+    import cv2
+
+    y0, y1, x0, x1 = core
+    blur = cv2.GaussianBlur(gray_tile, (blur_kernel, blur_kernel), 0)
+    hist = np.bincount(blur[y0:y1, x0:x1].ravel(), minlength=256)
+    fg = 0
+    if adaptive is not None:
+        block, c = adaptive
+        mask = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, c)
+        fg = int(np.count_nonzero(mask[y0:y1, x0:x1]))
+    return fg, hist
+
+
+def mask_tile(
+    gray_tile,
+    core,
+    *,
+    blur_kernel: int,
+    adaptive: tuple[int, int] | None,
+    otsu_thresh: int,
+    morph_kernel: int,
+):
+    """blur → threshold (adaptive, or binary-inverse at a global Otsu level) → morph close; core only."""
+    import cv2
+
+    y0, y1, x0, x1 = core
+    blur = cv2.GaussianBlur(gray_tile, (blur_kernel, blur_kernel), 0)
+    if adaptive is not None:
+        block, c = adaptive
+        mask = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, c)
+    else:
+        mask = cv2.threshold(blur, otsu_thresh, 255, cv2.THRESH_BINARY_INV)[1]
+    if morph_kernel > 0:
+        k = cv2.getStructuringElement(cv2.MORPH_RECT, (morph_kernel, morph_kernel))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, k)
+    return mask[y0:y1, x0:x1]
+
+
+def canny_tile(mask_tile_, core, *, canny_low: int, canny_high: int):
+    """Canny on one tile, core only.
+
+    On a 0/255 mask every gradient maximum clears both thresholds, so hysteresis
+    never reaches beyond the 3×3 Sobel/NMS neighbourhood and a halo of 2 pixels
+    reproduces the whole-image result exactly.
+    """
+    import cv2
+
+    y0, y1, x0, x1 = core
+    return cv2.Canny(mask_tile_, canny_low, canny_high)[y0:y1, x0:x1]
+
+
+def hough_tile(
+    mask_tile_,
+    core,
+    origin: tuple[int, int],
+    *,
+    canny_low: int,
+    canny_high: int,
+    threshold: int,
+    min_line: int,
+    max_gap: int,
+):
+    """Canny + probabilistic Hough on one tile; keeps segments whose midpoint is in the core.
+
+    Returned segments are in image coordinates as an ``(N, 4)`` int32 array.
+    """
+    import cv2
+
+    edges = cv2.Canny(mask_tile_, canny_low, canny_high)
+    lines = cv2.HoughLinesP(
+        edges, rho=1, theta=np.pi / 180.0, threshold=threshold, minLineLength=min_line, maxLineGap=max_gap
+    )
+    if lines is None:
+        return np.zeros((0, 4), dtype=np.int32)
+    segs = lines.reshape(-1, 4)
+    y0, y1, x0, x1 = core
+    mx2 = segs[:, 0].astype(np.int64) + segs[:, 2]
+    my2 = segs[:, 1].astype(np.int64) + segs[:, 3]
+    own = (mx2 >= 2 * x0) & (mx2 < 2 * x1) & (my2 >= 2 * y0) & (my2 < 2 * y1)
+    oy, ox = origin
+    out = segs[own].astype(np.int32)
+    out[:, [0, 2]] += ox
+    out[:, [1, 3]] += oy
+    return out
+
+
+def stitch_seam_segments(segs, *, tile: int, overlap: int, h: int, w: int, angle_tol_deg: float = 3.0, dist_px: float = 3.0):
+    """Join collinear pieces of the same line that were cut at tile borders.
+
+    Only segments with an endpoint within ``overlap`` of an internal tile border are
+    touched; they are merged with tight tolerances so seam duplicates collapse into
+    one raw segment, and everything else is passed through unchanged.
+    """
+    from worker.line_merge import merge_lines_bucketed
+
+    segs = np.asarray(segs, dtype=np.int32).reshape(-1, 4)
+    if segs.shape[0] < 2:
+        return segs
+    reach = max(1, int(overlap))
+
+    def near(coord, limit):
+        borders = np.arange(tile, limit, tile)
+        if borders.size == 0:
+            return np.zeros(coord.shape, dtype=bool)
+        pos = np.searchsorted(borders, coord)
+        lo = borders[np.clip(pos - 1, 0, borders.size - 1)]
+        hi = borders[np.clip(pos, 0, borders.size - 1)]
+        return np.minimum(np.abs(coord - lo), np.abs(coord - hi)) <= reach
+
+    seam = near(segs[:, 0], w) | near(segs[:, 2], w) | near(segs[:, 1], h) | near(segs[:, 3], h)
+    if int(seam.sum()) < 2:
+        return segs
+    joined = merge_lines_bucketed(
+        segs[seam].reshape(-1, 1, 4),
+        angle_tol_deg=angle_tol_deg,
+        dist_tol_px=dist_px,
+        gap_tol_px=dist_px,
+        min_len_px=0.0,
+    )
+    joined = np.rint(joined).astype(np.int32).reshape(-1, 4)
+    return np.concatenate([segs[~seam], joined], axis=0)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SCOPES = ("full", "encoder")
+
+
+class WeightStoreError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class WeightEntry:
+    name: str
+    file: str
+    sha256: str
+    size: int
+    scope: str = "full"
+    encoder_name: str = "resnet34"
+    num_classes: int = 4
+    note: str = ""
+    created: float = 0.0
+
+
+class WeightStore:
+    """Local, versioned segmentation weights: safetensors files plus a checksummed manifest.
+
+    ``<root>/manifest.json`` maps a weight name (e.g. ``floorplan-v3``) to its file,
+    SHA-256, size and what it covers: ``full`` (the whole DeepLabV3+ state dict)
+    or ``encoder`` (backbone only). Files are verified against the manifest once
+    per process and then loaded with memory-mapped ``safetensors`` reads, so a
+    warm page cache makes loading nearly free. Any missing or mismatching file
+    raises ``WeightStoreError``; nothing falls back to random weights.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._verified: dict[str, tuple[int, int, str]] = {}
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    def entries(self) -> dict[str, WeightEntry]:
+        try:
+            raw = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise WeightStoreError(f"权重清单损坏: {self.manifest_path}: {e}") from e
+        return {name: WeightEntry(name=name, **meta) for name, meta in raw.get("weights", {}).items()}
+
+    def resolve(self, name: str) -> WeightEntry:
+        entry = self.entries().get(name)
+        if entry is None:
+            raise WeightStoreError(f"权重 '{name}' 未登记: {self.manifest_path}")
+        return entry
+
+    def path_for(self, entry: WeightEntry) -> Path:
+        return self.root / entry.file
+
+    def verify(self, entry: WeightEntry) -> Path:
+        path = self.path_for(entry)
+        try:
+            st = path.stat()
+        except FileNotFoundError as e:
+            raise WeightStoreError(f"权重文件缺失: {path}（'{entry.name}'）") from e
+        if st.st_size != entry.size:
+            raise WeightStoreError(f"权重文件大小不符: {path}（{st.st_size} != {entry.size}）")
+        stamp = (st.st_size, st.st_mtime_ns, entry.sha256)
+        with self._lock:
+            if self._verified.get(str(path)) == stamp:
+                return path
+        digest = _sha256_file(path)
+        if digest != entry.sha256:
+            raise WeightStoreError(f"权重文件校验失败: {path}（sha256 {digest[:12]} != {entry.sha256[:12]}）")
+        with self._lock:
+            self._verified[str(path)] = stamp
+        return path
+
+    def load(self, name: str):
+        """(entry, state dict) for ``name``; tensors are backed by the memory-mapped file."""
+        try:
+            from safetensors.torch import load_file
+        except Exception as e:
+            raise RuntimeError("Missing dependency: safetensors") from e
+
+        entry = self.resolve(name)
+        path = self.verify(entry)
+        return entry, load_file(str(path))
+
+    def register(
+        self,
+        name: str,
+        state_dict: dict,
+        *,
+        scope: str = "full",
+        encoder_name: str = "resnet34",
+        num_classes: int = 4,
+        note: str = "",
+    ) -> WeightEntry:
+        """Write ``state_dict`` as ``<name>.safetensors`` and record it in the manifest (atomically)."""
+        from safetensors.torch import save_file
+
+        if scope not in SCOPES:
+            raise ValueError(f"unknown weight scope: {scope}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        file = f"{name}.safetensors"
+        tmp = self.root / f".{file}.{uuid4().hex}.tmp"
+        tensors = {k: v.detach().cpu().contiguous() for k, v in state_dict.items()}
+        save_file(tensors, str(tmp), metadata={"name": name, "scope": scope, "encoder": encoder_name})
+        os.replace(tmp, self.root / file)
+        path = self.root / file
+        entry = WeightEntry(
+            name=name,
+            file=file,
+            sha256=_sha256_file(path),
+            size=path.stat().st_size,
+            scope=scope,
+            encoder_name=encoder_name,
+            num_classes=int(num_classes),
+            note=note,
+            created=time.time(),
+        )
+        with self._lock:
+            entries = {n: _manifest_meta(e) for n, e in self.entries().items()}
+            entries[name] = _manifest_meta(entry)
+            tmp_manifest = self.root / f".{MANIFEST_NAME}.{uuid4().hex}.tmp"
+            tmp_manifest.write_text(json.dumps({"weights": entries}, indent=2, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_manifest, self.manifest_path)
+        return entry
+
+
+def _manifest_meta(entry: WeightEntry) -> dict:
+    meta = asdict(entry)
+    meta.pop("name")
+    return meta
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_root() -> Path:
+    raw = os.getenv("IMAGE_DXF_SEG_WEIGHTS_DIR", "").strip()
+    return Path(raw) if raw else Path(__file__).resolve().parents[1] / "var" / "seg_weights"
+
+
+_stores: dict[str, WeightStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_weight_store(root: Path | None = None) -> WeightStore:
+    root = Path(root or default_root()).resolve()
+    with _stores_lock:
+        store = _stores.get(str(root))
+        if store is None:
+            store = WeightStore(root)
+            _stores[str(root)] = store
+        return store